@@ -1,13 +1,34 @@
 import os
 import json
-import subprocess
+import shutil
+import sys
+import threading
 from datetime import datetime, timedelta
+import instantanea
+import sincronizacion
+from instrumentacion import contar, medido, tramo
+from cambios import asignar, liberar, recargado, suscribir
+from escritura_diferida import BufferEscritura
+from analitica import ANALITICA
+from cuotas import CUOTAS
+from indice_usuarios import INDICE
+from listados import INDICE_RESERVAS, paginas
+from cierres import Calendario, cierre
+from columnar import COLUMNAS
+from mapa_calor import ver_mapa
+from tabla import MotorTabla, Precargador
+from pantalla import Pantalla, BORRAR_TODO, INICIO
+from lista_espera import agregar_en_espera, profundidad, promover
 
 # Configuración
 SALAS = ["Sala Piso 4", "Sala Piso 5"]
 HORAS = ["08:00", "09:00", "10:00", "11:00", "12:00", "13:00", "14:00", "15:00", "16:00"]
 DIAS_SEMANA = ["Lu", "Ma", "Mi", "Ju", "Vi"]
 ARCHIVO_DATOS = "reservas6.json"
+ARCHIVO_DIARIO = "reservas6.diario.jsonl"  # Operaciones que aún no se publicaron en GitHub
+# Instantánea binaria de ARCHIVO_DATOS para el primer cuadro (instantanea.py);
+# RESERVAS_INSTANTANEA= (vacío) la desactiva
+ARCHIVO_INSTANTANEA = os.environ.get("RESERVAS_INSTANTANEA", "reservas6.bin")
 
 # Caracteres ASCII para la interfaz
 BORDE_H = "═"
@@ -28,39 +49,93 @@ COLOR_ERROR = "\033[1;31m"
 COLOR_EXITO = "\033[1;32m"
 COLOR_RESET = "\033[0m"
 
+# Feriados y cierres (cierres.json), compilados en máscaras por sala y día
+CIERRES = Calendario(HORAS)
+
+# Motor de tablas semanales (plantillas precalculadas y caché por semana)
+TABLA = MotorTabla(HORAS, DIAS_SEMANA, COLOR_TITULO, COLOR_ERROR, COLOR_RESET, cierres=CIERRES)
+
+# Con RESERVAS_COLUMNAR=1 las tablas y el listado por usuario salen del
+# almacén por columnas (columnar.py) en vez de los diccionarios anidados
+COLUMNAR = os.environ.get("RESERVAS_COLUMNAR") == "1"
+
+# Reservas de una sala para las fechas de la tabla
+def datos_tabla(reservas, sala, fechas):
+    if not COLUMNAR or not isinstance(reservas, dict):  # La instantánea se lee directamente
+        return reservas
+    COLUMNAS.asegurar(reservas, SALAS, HORAS)
+    return COLUMNAS.cuadricula(sala, fechas)
+
+# Índice para los listados (mismas consultas en los dos)
+def indice_listados(reservas):
+    if COLUMNAR:
+        COLUMNAS.asegurar(reservas, SALAS, HORAS)
+        return COLUMNAS
+    INDICE_RESERVAS.asegurar(reservas, SALAS)
+    return INDICE_RESERVAS
+
 # Cargar datos
+@medido("cargar_datos")
 def cargar_datos():
     try:  # Bloque try correctamente colocado
         if os.path.exists(ARCHIVO_DATOS):
             with open(ARCHIVO_DATOS, 'r') as f:
                 data = json.load(f)
+                contar("bytes_leidos", f.tell())
                 if isinstance(data, dict):
                     return data
     except (json.JSONDecodeError, AttributeError):  # Coincide con el try
         print(f"{COLOR_ERROR}Error leyendo el archivo. Se creará uno nuevo.{COLOR_RESET}")
     return {sala: {} for sala in SALAS}  # Estructura por defecto
     
-# Guardar datos
+# Guardar datos (reservas y lista de espera en una sola escritura atómica)
+@medido("guardar_datos")
 def guardar_datos(reservas):
     if isinstance(reservas, dict):  # Solo guardar si es diccionario
-        with open(ARCHIVO_DATOS, 'w') as f:
+        temporal = ARCHIVO_DATOS + ".tmp"
+        with open(temporal, 'w') as f:
             json.dump(reservas, f, indent=2)  # indent=2 para formato legible
+            contar("bytes_serializados", f.tell())
+            f.flush()
+            os.fsync(f.fileno())  # En disco antes de reemplazar (y de borrar el diario)
+        os.replace(temporal, ARCHIVO_DATOS)  # Reemplazo atómico: nunca queda a medio escribir
             
-# Limpiar pantalla
+# Reescribir la instantánea a partir de las reservas que están en ARCHIVO_DATOS
+@medido("guardar_instantanea")
+def guardar_instantanea(reservas):
+    if ARCHIVO_INSTANTANEA:
+        instantanea.escribir(reservas, ARCHIVO_INSTANTANEA, HORAS, origen=ARCHIVO_DATOS)
+
+# Para recuperar(): una reserva del diario en un horario que se cerró o que ya
+# no entra en la cuota se rechaza, igual que al reservar
+def validar_reserva(sala, fecha, hora, usuario):
+    if CIERRES.cerrado(sala, fecha, hora):
+        return f"{sala} {fecha} {hora} está cerrado ({CIERRES.motivo(sala, fecha, hora)})"
+    CUOTAS.asegurar(ESCRITURA.reservas, SALAS)
+    return CUOTAS.verificar(usuario, sala, fecha)
+
+# Los cambios se guardan juntos, un momento después de la última edición.
+# El diario se conserva hasta que sincronizar_con_github() los publica.
+ESCRITURA = BufferEscritura(guardar_datos, ARCHIVO_DIARIO, confirmar_al_guardar=False, validar=validar_reserva)
+suscribir(ESCRITURA.registrar)
+
+# Limpiar pantalla (secuencia ANSI, sin lanzar un proceso)
 def limpiar_pantalla():
-    os.system('cls' if os.name == 'nt' else 'clear')
+    sys.stdout.write(INICIO + BORRAR_TODO)
+    sys.stdout.flush()
 
 # Dibujar marco
 def dibujar_marco(ancho=80):
     print(f"{COLOR_TITULO}{ESQUINA_TL}{BORDE_H*(ancho-2)}{ESQUINA_TR}{COLOR_RESET}")
 
 # Menú principal
+# (la pantalla la prepara el renderer de main, que solo redibuja lo que cambió)
 def mostrar_menu():
-    limpiar_pantalla()
     dibujar_marco()
     print(f"{COLOR_TITULO}{BORDE_V}{COLOR_MENU}{' SISTEMA DE RESERVAS '.center(78)}{COLOR_TITULO}{BORDE_V}{COLOR_RESET}")
     dibujar_marco()
     print(f"{COLOR_TITULO}{BORDE_V} {COLOR_MENU}[S]ala  [R]eservar  [U]suarios  [M]odificar  [E]liminar  [V]er  [Q]uit {COLOR_TITULO}{BORDE_V:>7}{COLOR_RESET}")
+    print(f"{COLOR_TITULO}{BORDE_V} {COLOR_MENU}{'[<] Semana ant.  [>] Semana sig.  [F]echa  [T]ablero  [C]alor  [X] Cierres'.ljust(77)}{COLOR_TITULO}{BORDE_V}{COLOR_RESET}")
     dibujar_marco()
 
 # Convertir día abreviado a fecha
@@ -73,34 +148,41 @@ def dia_a_fecha(dia_abrev, semana=0):
     diferencia = (dia_num - hoy.weekday() + 7) % 7
     fecha = hoy + timedelta(days=diferencia + semana * 7)
     
-    # Si la fecha calculada es anterior a hoy, sumamos 1 semana (por seguridad)
-    if fecha.date() < hoy.date():
+    # Si la fecha calculada es anterior a hoy, sumamos 1 semana (por seguridad).
+    # Las semanas anteriores (semana < 0) sí pueden quedar en el pasado.
+    if semana >= 0 and fecha.date() < hoy.date():
         fecha += timedelta(days=7)
     
     return fecha.strftime("%Y-%m-%d")
 
+# Fechas de cada día de la semana mostrada
+def fechas_semana(semana=0):
+    return [dia_a_fecha(dia, semana) for dia in DIAS_SEMANA]
+
+# Semana (relativa a la actual) que contiene una fecha
+def semana_de_fecha(fecha):
+    return (fecha.date() - datetime.now().date()).days // 7
+
 def mostrar_horarios(sala, reservas, semana=0):
+    fechas = fechas_semana(semana)
+    desde = datetime.strptime(min(fechas), "%Y-%m-%d").strftime("%d/%m")
+    hasta = datetime.strptime(max(fechas), "%Y-%m-%d").strftime("%d/%m")
     print(f"\n{COLOR_RESALTADO}{sala.center(30)}{COLOR_RESET}")
-    
-    # Cabecera de la tabla
-    print(f"{COLOR_TITULO}┌────────┬───┬───┬───┬───┬───┐{COLOR_RESET}")
-    print(f"{COLOR_TITULO}│ Hora   │{DIAS_SEMANA[0]} │{DIAS_SEMANA[1]} │{DIAS_SEMANA[2]} │{DIAS_SEMANA[3]} │{DIAS_SEMANA[4]} │{COLOR_RESET}")
-    print(f"{COLOR_TITULO}├────────┼───┼───┼───┼───┼───┤{COLOR_RESET}")  # Corregido: eliminé el "┼─────" extra
-    
-    for hora in HORAS:  # Ahora está correctamente indentado
-        fila = f"{COLOR_TITULO}│ {COLOR_RESET}{hora.ljust(6)}{COLOR_TITULO} │{COLOR_RESET}"
-        for dia in DIAS_SEMANA:
-            fecha = dia_a_fecha(dia)
-            if reservas.get(sala, {}).get(fecha, {}).get(hora):
-                usuario = reservas[sala][fecha][hora]
-                fila += f" {COLOR_ERROR}{usuario[:1]}{COLOR_RESET} {COLOR_TITULO}│{COLOR_RESET}"
-            else:
-                fila += f"   {COLOR_TITULO}│{COLOR_RESET}"
-        print(fila)
-    print(f"{COLOR_TITULO}└────────┴───┴───┴───┴───┴───┘{COLOR_RESET}")
+    print(f"{f'{desde} - {hasta}'.center(30)}")
+    print(TABLA.dibujar(datos_tabla(reservas, sala, fechas), sala, fechas, "horarios"))
+
+# Pedir una fecha y devolver la semana que la contiene
+def seleccionar_semana():
+    texto = input("Ir a la fecha (DD/MM/AAAA): ").strip()
+    try:
+        return semana_de_fecha(datetime.strptime(texto, "%d/%m/%Y"))
+    except ValueError:
+        print(f"{COLOR_ERROR}Fecha inválida.{COLOR_RESET}")
+        return None
 
 # Módulo de reserva
-def reservar_horario(reservas, sala_actual):
+@ESCRITURA.mutacion
+def reservar_horario(reservas, sala_actual, semana=0):
     #sala = seleccionar_sala()
     #if not sala:
     #    return
@@ -111,10 +193,14 @@ def reservar_horario(reservas, sala_actual):
     dia = seleccionar_dia()
     if not dia:
         return
-    fecha = dia_a_fecha(dia)
+    fecha = dia_a_fecha(dia, semana)  # Día de la semana que se está mostrando
+    if fecha < datetime.now().strftime("%Y-%m-%d"):
+        print(f"{COLOR_ERROR}No se puede reservar en una fecha pasada.{COLOR_RESET}")
+        return
     horas_ocupadas = set(reservas.get(sala_actual, {}).get(fecha, {}).keys())  # Obtiene las horas ocupadas
+    cerradas = CIERRES.bloqueadas(sala_actual, fecha)  # Feriados y cierres: no se ofrecen
     
-    hora = seleccionar_hora(horas_ocupadas)
+    hora = seleccionar_hora(horas_ocupadas, mostrar_ocupadas=True, cerradas=cerradas)
     if not hora:
         return
     
@@ -122,40 +208,81 @@ def reservar_horario(reservas, sala_actual):
     if not usuario:
         print(f"{COLOR_ERROR}Debe ingresar un nombre.{COLOR_RESET}")
         return
+    
+    # Cuotas: horas por semana, por sala y semana, y reservas pendientes
+    CUOTAS.asegurar(reservas, SALAS)
+    motivo = CUOTAS.verificar(usuario, sala_actual, fecha)
+    if motivo:
+        print(f"{COLOR_ERROR}Límite alcanzado: {motivo}.{COLOR_RESET}")
+        return
+        
+    if CIERRES.cerrado(sala_actual, fecha, hora):
+        print(f"{COLOR_ERROR}La sala está cerrada en ese horario ({CIERRES.motivo(sala_actual, fecha, hora)}).{COLOR_RESET}")
+        return
         
-    if hora in horas_ocupadas:  # Validación adicional por seguridad
+    if hora in horas_ocupadas:  # Horario tomado: ofrecer la lista de espera
         print(f"{COLOR_ERROR}¡Este horario ya está reservado!{COLOR_RESET}")
+        en_espera = profundidad(reservas, sala_actual, fecha, hora)
+        confirmacion = input(f"¿Entrar en la lista de espera? ({en_espera} esperando) (S/N): ").lower()
+        if confirmacion == 's':
+            if agregar_en_espera(reservas, sala_actual, fecha, hora, usuario):
+                print(f"{COLOR_EXITO}Quedó en la lista de espera. Se le asignará si el horario se libera.{COLOR_RESET}")
+            else:
+                print(f"{COLOR_ERROR}Ya está en la lista de espera de este horario.{COLOR_RESET}")
         return
 
     if reservas[sala_actual].get(fecha, {}).get(hora):
         print(f"{COLOR_ERROR}¡Este horario ya está reservado!{COLOR_RESET}")
         return
     
-    reservas[sala_actual].setdefault(fecha, {})[hora] = usuario
-    guardar_datos(reservas)
+    asignar(reservas, sala_actual, fecha, hora, usuario)
     print(f"{COLOR_EXITO}¡Reserva realizada con éxito!{COLOR_RESET}")
 
-# Módulo de visualización por usuario
+# Para promover(): quien espera solo toma el horario si sigue dentro de su cuota
+def en_cuota(reservas, sala, fecha):
+    CUOTAS.asegurar(reservas, SALAS)
+    return lambda usuario: CUOTAS.permite(usuario, sala, fecha)
+
+# Módulo de visualización por usuario: se recorre el índice de a una página,
+# con los filtros de fecha y sala aplicados en la consulta
 def mostrar_por_usuario(reservas):
-    usuarios = {}
-    for sala in SALAS:
-        for fecha in reservas[sala]:
-            for hora, usuario in reservas[sala][fecha].items():
-                usuarios.setdefault(usuario, []).append((sala, fecha, hora))
-    
-    if not usuarios:
+    indice = indice_listados(reservas)
+    if not indice.por_usuario:
         print(f"{COLOR_ERROR}No hay reservas registradas.{COLOR_RESET}")
+        input("\nPresione Enter para continuar...")
         return
     
+    texto = input("\nDesde la fecha (DD/MM/AAAA, Enter para toda la historia): ").strip()
+    try:
+        desde = datetime.strptime(texto, "%d/%m/%Y").strftime("%Y-%m-%d") if texto else None
+    except ValueError:
+        print(f"{COLOR_ERROR}Fecha inválida.{COLOR_RESET}")
+        input("\nPresione Enter para continuar...")
+        return
+    opciones = "  ".join(f"{i}. {sala}" for i, sala in enumerate(SALAS, 1))
+    texto = input(f"Sala ({opciones}; Enter para todas): ").strip()
+    salas = [SALAS[int(texto) - 1]] if texto.isdigit() and 1 <= int(texto) <= len(SALAS) else None
+    
+    por_pagina = max(5, shutil.get_terminal_size().lines - 8)
+    filas = indice.por_usuarios(salas=salas, desde=desde)
+    usuario_actual = None
     print(f"\n{COLOR_RESALTADO}{' RESERVAS POR USUARIO '.center(30)}{COLOR_RESET}")
-    for usuario, reservas_usuario in usuarios.items():
-        print(f"\n{COLOR_MENU}Usuario: {usuario}{COLOR_RESET}")
-        for sala, fecha, hora in reservas_usuario:
+    for numero, pagina in enumerate(paginas(filas, por_pagina), 1):
+        for fecha, hora, sala, usuario in pagina:
+            if usuario != usuario_actual:
+                print(f"\n{COLOR_MENU}Usuario: {usuario}{COLOR_RESET}")
+                usuario_actual = usuario
             fecha_formato = datetime.strptime(fecha, "%Y-%m-%d").strftime("%d/%m/%Y")
             dia_semana = DIAS_SEMANA[datetime.strptime(fecha, "%Y-%m-%d").weekday()]
             print(f" - {sala}: {dia_semana} {fecha_formato} a las {hora}")
+        if input(f"\nPágina {numero}. Enter para seguir, [Q] para volver: ").strip().lower() == 'q':
+            return
+    if usuario_actual is None:
+        print(f"{COLOR_ERROR}No hay reservas con esos filtros.{COLOR_RESET}")
+        input("\nPresione Enter para continuar...")
 
 # Módulo de modificación
+@ESCRITURA.mutacion
 def modificar_reserva(reservas):
    # usuario = input("Ingrese su nombre: ").strip()
    # Paso 1: Seleccionar usuario
@@ -164,12 +291,9 @@ def modificar_reserva(reservas):
         print(f"{COLOR_ERROR}Debe ingresar un nombre.{COLOR_RESET}")
         return
     
-    reservas_usuario = []
-    for sala in SALAS:
-        for fecha in reservas[sala]:
-            for hora, usuario_reserva in reservas[sala][fecha].items():
-                if usuario_reserva == usuario:
-                    reservas_usuario.append((sala, fecha, hora))
+    # Sus reservas salen del índice por usuario, sin recorrer todas las salas
+    reservas_usuario = [(sala, fecha, hora)
+                        for fecha, hora, sala, _ in indice_listados(reservas).por_usuarios([usuario])]
     
     if not reservas_usuario:
         print(f"{COLOR_ERROR}No se encontraron reservas para este usuario.{COLOR_RESET}")
@@ -196,7 +320,7 @@ def modificar_reserva(reservas):
         h for h in reservas[sala][fecha].keys() 
         if h != hora_antigua  # Excluimos la hora que se está modificando
     }
-    nueva_hora = seleccionar_hora(horas_ocupadas)
+    nueva_hora = seleccionar_hora(horas_ocupadas, cerradas=CIERRES.bloqueadas(sala, fecha))
     if not nueva_hora:
         return
     
@@ -204,19 +328,31 @@ def modificar_reserva(reservas):
     if nueva_hora in reservas[sala][fecha]:
         print(f"{COLOR_ERROR}La hora {nueva_hora} ya está ocupada.{COLOR_RESET}")
         return
+    if CIERRES.cerrado(sala, fecha, nueva_hora):
+        print(f"{COLOR_ERROR}La sala está cerrada a las {nueva_hora} ({CIERRES.motivo(sala, fecha, nueva_hora)}).{COLOR_RESET}")
+        return
     
     # Realizar la modificación
     try:
         # Eliminar la reserva antigua
-        del reservas[sala][fecha][hora_antigua]
+        liberar(reservas, sala, fecha, hora_antigua)
         
         # Crear la nueva reserva
-        reservas[sala][fecha][nueva_hora] = usuario
+        asignar(reservas, sala, fecha, nueva_hora, usuario)
+        
+        # Asignar la hora liberada al primero en espera (misma escritura),
+        # salvo que el horario esté cerrado
+        promovido = None
+        if not CIERRES.cerrado(sala, fecha, hora_antigua):
+            promovido = promover(reservas, sala, fecha, hora_antigua, en_cuota(reservas, sala, fecha))
         print(f"{COLOR_EXITO}Reserva modificada exitosamente.{COLOR_RESET}")
+        if promovido:
+            print(f"{COLOR_EXITO}{hora_antigua} asignada a {promovido} (lista de espera).{COLOR_RESET}")
     except Exception as e:
         print(f"{COLOR_ERROR}Error al modificar la reserva: {e}{COLOR_RESET}")
 
 # Módulo de eliminación
+@ESCRITURA.mutacion
 def eliminar_reserva(reservas):
     # Paso 1: Seleccionar usuario
     usuario = seleccionar_usuario(reservas)  # <- Usa la nueva función
@@ -224,12 +360,9 @@ def eliminar_reserva(reservas):
         return
     
     # Paso 2: Mostrar reservas del usuario seleccionado
-    reservas_usuario = []
-    for sala in SALAS:
-        for fecha in reservas[sala]:
-            for hora, usuario_reserva in reservas[sala][fecha].items():
-                if usuario_reserva == usuario:
-                    reservas_usuario.append((sala, fecha, hora))
+    # Sus reservas salen del índice por usuario, sin recorrer todas las salas
+    reservas_usuario = [(sala, fecha, hora)
+                        for fecha, hora, sala, _ in indice_listados(reservas).por_usuarios([usuario])]
     
     if not reservas_usuario:
         print(f"{COLOR_ERROR}No se encontraron reservas para este usuario.{COLOR_RESET}")
@@ -253,12 +386,15 @@ def eliminar_reserva(reservas):
     # Confirmar eliminación
     confirmacion = input(f"¿Eliminar esta reserva? (S/N): ").lower()
     if confirmacion == 's':
-        del reservas[sala][fecha][hora]
-        # Eliminar fecha si no hay más reservas
-        if not reservas[sala][fecha]:
-            del reservas[sala][fecha]
-        guardar_datos(reservas)
+        liberar(reservas, sala, fecha, hora)  # Elimina también la fecha si queda vacía
+        # Asignar el horario liberado al primero en espera (misma escritura),
+        # salvo que el horario esté cerrado
+        promovido = None
+        if not CIERRES.cerrado(sala, fecha, hora):
+            promovido = promover(reservas, sala, fecha, hora, en_cuota(reservas, sala, fecha))
         print(f"{COLOR_EXITO}¡Reserva eliminada con éxito!{COLOR_RESET}")
+        if promovido:
+            print(f"{COLOR_EXITO}Horario asignado a {promovido} (lista de espera).{COLOR_RESET}")
     else:
         print("Operación cancelada.")
 
@@ -266,76 +402,259 @@ def eliminar_reserva(reservas):
 def mostrar_resumen(reservas):
     print(f"\n{COLOR_RESALTADO}{' RESUMEN DE RESERVAS '.center(30)}{COLOR_RESET}")
     
+    fechas = fechas_semana()
     for sala in SALAS:
         print(f"\n{COLOR_MENU}{sala.center(0)}{COLOR_RESET}")
+        print(TABLA.dibujar(datos_tabla(reservas, sala, fechas), sala, fechas, "resumen"))
+    
+    ANALITICA.asegurar(reservas, SALAS, HORAS)
+    print(f"\n{COLOR_RESALTADO}{' OCUPACIÓN '.center(30)}{COLOR_RESET}")
+    print(ANALITICA.resumen(SALAS))
+
+# Exportar el análisis de ocupación (Enter para seguir sin exportar)
+def exportar_analisis():
+    ruta = input("\nExportar el análisis a un archivo .csv o .json (Enter para continuar): ").strip()
+    if not ruta:
+        return
+    try:
+        filas = ANALITICA.exportar(ruta, SALAS)
+    except (OSError, ValueError) as e:
+        print(f"{COLOR_ERROR}No se pudo exportar: {e}{COLOR_RESET}")
+    else:
+        print(f"{COLOR_EXITO}{filas} filas exportadas a {ruta}{COLOR_RESET}")
+    input("\nPresione Enter para continuar...")
+
+# Texto breve de un cierre
+def describir_cierre(datos):
+    desde = datetime.strptime(datos["desde"], "%Y-%m-%d").strftime("%d/%m/%Y")
+    hasta = datetime.strptime(datos["hasta"], "%Y-%m-%d").strftime("%d/%m/%Y")
+    fechas = desde if desde == hasta else f"{desde} a {hasta}"
+    if datos["hora_desde"] or datos["hora_hasta"]:
+        horas = f"{datos['hora_desde'] or HORAS[0]} a {datos['hora_hasta'] or 'cierre'}"
+    else:
+        horas = "todo el día"
+    return f"{fechas}, {datos['sala'] or 'todas las salas'}, {horas}: {datos['motivo'] or '-'}"
+
+# Calendario de cierres: ver los vigentes, agregar uno o quitarlo
+def gestionar_cierres(reservas):
+    print(f"\n{COLOR_RESALTADO}{' CIERRES '.center(30)}{COLOR_RESET}")
+    vigentes = CIERRES.vigentes()
+    if not vigentes:
+        print("No hay cierres vigentes.")
+    for numero, (_, datos) in enumerate(vigentes, 1):
+        print(f"{numero}. {describir_cierre(datos)}")
+    
+    opcion = input("\n[A]gregar, número para quitar, Enter para volver: ").strip().lower()
+    if opcion == 'a':
+        agregar_cierre(reservas)
+    elif opcion.isdigit() and 1 <= int(opcion) <= len(vigentes):
+        quitado = CIERRES.quitar(vigentes[int(opcion) - 1][0])
+        print(f"{COLOR_EXITO}Cierre quitado: {describir_cierre(quitado)}{COLOR_RESET}")
+    else:
+        return
+    input("\nPresione Enter para continuar...")
+
+# Pedir los datos de un cierre nuevo e informar, todas juntas, las reservas
+# que quedan dentro (no se borran: se avisa para reubicarlas). Las colas de
+# espera de los horarios cerrados sí se quitan, y se guardan como un cambio.
+@ESCRITURA.mutacion
+def agregar_cierre(reservas):
+    try:
+        desde = datetime.strptime(input("Desde (DD/MM/AAAA): ").strip(), "%d/%m/%Y")
+        texto = input("Hasta (DD/MM/AAAA, Enter para un solo día): ").strip()
+        hasta = datetime.strptime(texto, "%d/%m/%Y") if texto else desde
+    except ValueError:
+        print(f"{COLOR_ERROR}Fecha inválida.{COLOR_RESET}")
+        return
+    if hasta < desde:
+        print(f"{COLOR_ERROR}La fecha final es anterior a la inicial.{COLOR_RESET}")
+        return
+    opciones = "  ".join(f"{i}. {sala}" for i, sala in enumerate(SALAS, 1))
+    texto = input(f"Sala ({opciones}; Enter para todas): ").strip()
+    sala = SALAS[int(texto) - 1] if texto.isdigit() and 1 <= int(texto) <= len(SALAS) else None
+    texto = input("Horas (HH:MM-HH:MM, Enter para todo el día): ").strip()
+    hora_desde = hora_hasta = None
+    if texto:
+        try:
+            hora_desde, hora_hasta = (datetime.strptime(parte.strip(), "%H:%M").strftime("%H:%M")
+                                      for parte in texto.split("-"))
+        except ValueError:
+            print(f"{COLOR_ERROR}Horas inválidas.{COLOR_RESET}")
+            return
+    motivo = input("Motivo: ").strip()
+    
+    nuevo = cierre(desde.strftime("%Y-%m-%d"), hasta.strftime("%Y-%m-%d"), sala, hora_desde, hora_hasta, motivo)
+    afectadas = CIERRES.agregar(nuevo, reservas, SALAS)
+    print(f"{COLOR_EXITO}Cierre agregado: {describir_cierre(nuevo)}{COLOR_RESET}")
+    if afectadas:
+        print(f"{COLOR_ERROR}{len(afectadas)} reservas quedan dentro del cierre:{COLOR_RESET}")
+        for sala, fecha, hora, usuario in afectadas:
+            fecha_formato = datetime.strptime(fecha, "%Y-%m-%d").strftime("%d/%m/%Y")
+            dia_semana = DIAS_SEMANA[datetime.strptime(fecha, "%Y-%m-%d").weekday()]
+            print(f" - {sala}: {dia_semana} {fecha_formato} a las {hora} ({usuario})")
+
+# Función para sincronizar con GitHub.
+# En vez de mezclar (merge) con lo que haya en el remoto, se parte del archivo
+# de origin/main, se vuelven a aplicar encima las operaciones del diario
+# (rechazando las que chocan con cambios ajenos) y se publica un commit nuevo.
+# El commit se arma con comandos de bajo nivel (sincronizacion.py), sin tocar
+# el resto del directorio de trabajo, y si el archivo resultante es igual al
+# remoto no se publica nada. El primer intento parte de la rama remota que ya
+# se trajo (al arrancar o en la sincronización anterior): si otro cliente
+# publicó en el medio, el push se rechaza y se repite después de traerla.
+# Sin diario (RESERVAS_DURABILIDAD=ninguna) no hay operaciones que volver a
+# aplicar: se publica el archivo local tal como está, como antes, y publicar()
+# no hace nada si es igual al remoto.
+@medido("sincronizar_con_github")
+def sincronizar_con_github(reservas, intentos=3):
+    sin_diario = not ESCRITURA.diario
+    if sin_diario:
+        ESCRITURA.vaciar()
+        if not os.path.exists(ARCHIVO_DATOS):
+            return True
+    elif not ESCRITURA.en_cola():
+        return True
+    for intento in range(intentos):
+        try:
+            remoto = sincronizacion.leer_remoto(ARCHIVO_DATOS)
+            if intento or remoto.commit is None:
+                # Traer solo la rama de datos, sin tocar el directorio de trabajo
+                if sincronizacion.traer().returncode != 0:
+                    print(f"{COLOR_ERROR}Sin conexión con GitHub: {ESCRITURA.en_cola()} operaciones quedan en cola "
+                          f"y se publicarán en la próxima sesión.{COLOR_RESET}")
+                    return False
+                remoto = sincronizacion.leer_remoto(ARCHIVO_DATOS)
+        except sincronizacion.ErrorGit as e:
+            print(f"{COLOR_ERROR}Error leyendo GitHub: {e}{COLOR_RESET}")
+            break
+        if not sin_diario:
+            aplicar_sobre_remoto(reservas, remoto)
         
-        # Cabecera de la tabla
-        print(f"{COLOR_TITULO}┌───────┬───┬───┬───┬───┬───┐{COLOR_RESET}")
-        print(f"{COLOR_TITULO}│ Hora  │{DIAS_SEMANA[0]} │{DIAS_SEMANA[1]} │{DIAS_SEMANA[2]} │{DIAS_SEMANA[3]} │{DIAS_SEMANA[4]} │{COLOR_RESET}")
-        print(f"{COLOR_TITULO}├───────┼───┼───┼───┼───┼───┤{COLOR_RESET}")
-        
-        for hora in HORAS:
-            fila = f"{COLOR_TITULO}│{COLOR_RESET}{hora.ljust(6)}{COLOR_TITULO} │{COLOR_RESET}"
-            for dia in DIAS_SEMANA:
-                fecha = dia_a_fecha(dia)
-                if reservas.get(sala, {}).get(fecha, {}).get(hora):
-                    usuario = reservas[sala][fecha][hora]
-                    fila += f" {COLOR_ERROR}{usuario[:1]}{COLOR_RESET} {COLOR_TITULO}│{COLOR_RESET}"
-                else:
-                    fila += f"   {COLOR_TITULO}│{COLOR_RESET}"
-            print(fila)
-        print(f"{COLOR_TITULO}└───────┴───┴───┴───┴───┴───┘{COLOR_RESET}")
-
-# Función para sincronizar con GitHub
-def sincronizar_con_github():
-    # Agregar el archivo a la zona de preparación
-    subprocess.run(['git', 'add', ARCHIVO_DATOS])
-    
-    # Confirmar los cambios
-    subprocess.run(['git', 'commit', '-m', 'Actualización de reservas6.json'])
-    
-    # Enviar los cambios a GitHub
-    subprocess.run(['git', 'push', 'origin', 'main'])  # Cambia 'main' si es necesario
-
-# Función para verificar y actualizar desde GitHub
+        # Un commit sobre origin/main con el archivo resultante (si cambió)
+        with open(ARCHIVO_DATOS, 'rb') as f:
+            contenido = f.read()
+        try:
+            publicado = sincronizacion.publicar(ARCHIVO_DATOS, contenido, remoto, 'Actualización de reservas6.json')
+        except sincronizacion.ErrorGit as e:  # No se pudo armar el commit
+            print(f"{COLOR_ERROR}{e}{COLOR_RESET}")
+            break
+        if publicado:
+            ESCRITURA.confirmar()
+            return True
+    print(f"{COLOR_ERROR}No se pudo publicar en GitHub: las operaciones siguen en cola.{COLOR_RESET}")
+    return False
+
+# Reemplazar las reservas por las del remoto y volver a aplicar encima el diario
+def aplicar_sobre_remoto(reservas, remoto):
+    try:
+        servidor = json.loads(remoto.contenido)
+    except (TypeError, ValueError):  # El remoto todavía no tiene el archivo
+        servidor = {sala: {} for sala in SALAS}
+    with ESCRITURA.candado:
+        reservas.clear()
+        reservas.update(servidor)
+        recargado()
+        informar_rechazos(ESCRITURA.recuperar())  # Guarda el archivo con las operaciones aplicadas
+
+# Quitar las colas de espera de fechas pasadas y de horarios cerrados de las
+# reservas recién cargadas (se guarda como cualquier otro cambio)
+@ESCRITURA.mutacion
+def podar_esperas(reservas):
+    CIERRES.cargar(reservas)
+
+# Mostrar las operaciones en cola que chocaron con cambios del remoto
+def informar_rechazos(resultado):
+    aplicadas, rechazos = resultado
+    if not rechazos:
+        return
+    print(f"\n{COLOR_ERROR}Se aplicaron {aplicadas} operaciones y se rechazaron {len(rechazos)} "
+          f"por cambios en GitHub:{COLOR_RESET}")
+    for rechazo in rechazos:
+        print(f" - {rechazo}")
+    input("\nPresione Enter para continuar...")
+
+# Función para verificar y actualizar desde GitHub: se trae solo la rama de
+# datos y el archivo local se reemplaza únicamente si su hash es distinto.
+# Sin diario, un archivo local que no llegó a publicarse (falló la
+# sincronización al salir) no se pisa: se publica al salir de esta sesión.
+@medido("verificar_y_actualizar")
 def verificar_y_actualizar():
     # Obtener los últimos cambios del repositorio remoto
     print("Verificando actualizaciones en GitHub...")
-    resultado = subprocess.run(['git', 'pull', 'origin', 'main'], capture_output=True, text=True)
+    try:
+        anteriores = sincronizacion.publicados(ARCHIVO_DATOS)
+    except sincronizacion.ErrorGit as e:
+        print("Error al actualizar:", e)
+        return False
+    resultado = sincronizacion.traer()
     
     if resultado.returncode == 0:
-        print("Actualización completada.")
-    else:
-        print("Error al actualizar:", resultado.stderr)
+        try:
+            cambio = sincronizacion.actualizar_copia(ARCHIVO_DATOS, anteriores)
+        except sincronizacion.CambiosSinPublicar as e:
+            print(f"{COLOR_ERROR}{e}: se conserva la copia local y se publicará al salir.{COLOR_RESET}")
+            return False
+        except sincronizacion.ErrorGit as e:
+            print("Error al actualizar:", e)
+            return False
+        print("Actualización completada." if cambio else "Las reservas ya estaban al día.")
+        return True
+    print("Error al actualizar:", resultado.stderr.decode(errors="replace"))
+    print("Se trabaja con la copia local; los cambios se publicarán al salir o en la próxima sesión.")
+    return False
+
+# Tablero de recepción: en cada minuto relee el archivo si otro proceso lo cambió
+def mostrar_tablero(reservas):
+    import tablero  # curses solo se carga si se usa el tablero
+    ESCRITURA.vaciar()  # Que el archivo tenga los cambios propios antes de vigilarlo
+    modificado = [os.path.getmtime(ARCHIVO_DATOS) if os.path.exists(ARCHIVO_DATOS) else 0]
+    
+    def recargar():
+        if not os.path.exists(ARCHIVO_DATOS) or os.path.getmtime(ARCHIVO_DATOS) == modificado[0]:
+            return
+        modificado[0] = os.path.getmtime(ARCHIVO_DATOS)
+        nuevas = cargar_datos()
+        with ESCRITURA.candado:
+            reservas.clear()
+            reservas.update(nuevas)
+            recargado()
+    
+    tablero.ejecutar(reservas, SALAS, HORAS, recargar)
 
 # Funciones auxiliares
 def seleccionar_usuario(reservas):
-    # Obtener todos los usuarios únicos con reservas
-    usuarios = set()
-    for sala in SALAS:
-        for fecha in reservas[sala]:
-            for usuario in reservas[sala][fecha].values():
-                usuarios.add(usuario)
-    
-    if not usuarios:
+    # Buscar por parte del nombre en el índice (no recorre las reservas)
+    INDICE.asegurar(reservas, SALAS)
+    if not INDICE.horas:
         print(f"{COLOR_ERROR}No hay reservas registradas.{COLOR_RESET}")
         return None
     
-    # Mostrar lista numerada
-    print(f"\n{COLOR_RESALTADO}{' USUARIOS CON RESERVAS '.center(30)}{COLOR_RESET}")
-    for i, usuario in enumerate(sorted(usuarios), 1):
-        print(f"{i}. {usuario}")
-    
-    # Permitir selección
-    try:
-        seleccion = input("\nSeleccione un usuario (número) o [X] para cancelar: ").strip().lower()
-        if seleccion == 'x':
+    texto = input("\nNombre o parte del nombre (Enter para ver todos, [X] para cancelar): ").strip()
+    por_pagina = max(5, shutil.get_terminal_size().lines - 8)
+    desde = 0  # Sin texto salen todos los usuarios, de a una página
+    while texto.lower() != 'x':
+        candidatos = INDICE.buscar(texto)
+        if not candidatos:
+            print(f"{COLOR_ERROR}Ningún usuario coincide con '{texto}'.{COLOR_RESET}")
+        else:
+            print(f"\n{COLOR_RESALTADO}{' USUARIOS CON RESERVAS '.center(30)}{COLOR_RESET}")
+            for i, usuario in enumerate(candidatos[desde:desde + por_pagina], desde + 1):
+                print(f"{i}. {usuario} ({INDICE.horas[usuario]} h)")
+        mas = desde + por_pagina < len(candidatos)
+        # Un número elige de la lista; Enter muestra la página siguiente y
+        # cualquier otro texto es una nueva búsqueda
+        seleccion = input(f"\nSeleccione un usuario (número), {'Enter para ver más, ' if mas else ''}"
+                          f"escriba otra búsqueda o [X] para cancelar: ").strip()
+        if seleccion.isdigit():
+            if 1 <= int(seleccion) <= len(candidatos):
+                return candidatos[int(seleccion) - 1]
+            print(f"{COLOR_ERROR}Opción no válida.{COLOR_RESET}")
             return None
-        seleccion = int(seleccion)
-        return sorted(usuarios)[seleccion-1]
-    except (ValueError, IndexError):
-        print(f"{COLOR_ERROR}Opción no válida.{COLOR_RESET}")
-        return None
+        if not seleccion and mas:
+            desde += por_pagina
+            continue
+        texto, desde = seleccion, 0
+    return None
         
 def seleccionar_sala():
       # Obtener todos los usuarios únicos con reservas
@@ -403,11 +722,14 @@ def seleccionar_dia():
         print(f"{COLOR_ERROR}Opción inválida.{COLOR_RESET}")
         return None
 
-def seleccionar_hora(horas_ocupadas=None):
+def seleccionar_hora(horas_ocupadas=None, mostrar_ocupadas=False, cerradas=frozenset()):
     if horas_ocupadas is None:
         horas_ocupadas = set()  # Si no se pasan horas ocupadas, asumimos que ninguna está reservada
     
-    horas_disponibles = [hora for hora in HORAS if hora not in horas_ocupadas]
+    # mostrar_ocupadas lista también las horas tomadas (para la lista de espera);
+    # las cerradas (feriados, mantenimiento) nunca se ofrecen
+    horas_disponibles = [hora for hora in HORAS
+                         if hora not in cerradas and (mostrar_ocupadas or hora not in horas_ocupadas)]
     
     if not horas_disponibles:
         print(f"{COLOR_ERROR}No hay horas disponibles.{COLOR_RESET}")
@@ -415,7 +737,10 @@ def seleccionar_hora(horas_ocupadas=None):
         
     print("\nHoras disponibles:")
     for i, hora in enumerate(horas_disponibles, 1):
-        print(f"{i}. {hora}")
+        if hora in horas_ocupadas:
+            print(f"{i}. {hora} {COLOR_ERROR}(ocupado){COLOR_RESET}")
+        else:
+            print(f"{i}. {hora}")
     try:
         seleccion = int(input("Opción (0 para cancelar): "))
         if seleccion == 0:
@@ -425,38 +750,118 @@ def seleccionar_hora(horas_ocupadas=None):
         print(f"{COLOR_ERROR}Opción inválida.{COLOR_RESET}")
         return None
 
+# Reservas completas desde ARCHIVO_DATOS (o ya leídas en `datos`), vinculadas
+# a la escritura diferida
+def cargar_reservas(datos=None):
+    reservas = cargar_datos() if datos is None else datos
+    if not isinstance(reservas, dict):  # Si no es diccionario, reinicializar
+        reservas = {sala: {} for sala in SALAS}
+    ESCRITURA.vincular(reservas)
+    podar_esperas(reservas)
+    return reservas
+
+# Lectura completa de ARCHIVO_DATOS en un hilo, mientras los cuadros se
+# siguen leyendo de la instantánea. reservas() espera a que termine, cierra la
+# instantánea y devuelve las reservas vinculadas (llamar desde el hilo
+# principal).
+class CargaEnSegundoPlano(threading.Thread):
+    def __init__(self, previa):
+        super().__init__(daemon=True)
+        self.previa = previa
+        self.datos = None
+    
+    def run(self):
+        self.datos = cargar_datos()
+    
+    def reservas(self):
+        self.join()
+        self.previa.cerrar()
+        return cargar_reservas(self.datos)
+
+# Opciones que solo cambian la semana o la sala del cuadro: se pueden
+# atender con la instantánea mientras se cargan las reservas
+NAVEGACION = {'s', '>', '.', '<', ','}
+
 # Función principal
 def main():
-    # Verificar y actualizar desde GitHub
-    verificar_y_actualizar()
+    # Operaciones de una sesión anterior sin publicar: se aplican sobre lo que
+    # hay en GitHub (o, sin conexión, sobre la copia local) en vez de hacer pull
+    en_cola = ESCRITURA.en_cola()
+    if not en_cola:
+        verificar_y_actualizar()  # Verificar y actualizar desde GitHub
 
-    reservas = cargar_datos()
-    if not isinstance(reservas, dict):  # Si no es diccionario, reinicializar
-        reservas = {sala: {} for sala in SALAS}
+    # Con una instantánea hecha desde el archivo actual, los cuadros leen solo
+    # su semana del archivo mapeado y el JSON se carga en segundo plano
+    # después del primero; la primera opción que no sea navegar espera a que
+    # termine. Con operaciones en cola los datos van a cambiar: se carga todo.
+    previa = None
+    if ARCHIVO_INSTANTANEA and not en_cola:
+        previa = instantanea.vigente(ARCHIVO_INSTANTANEA, ARCHIVO_DATOS)
+    reservas = None if previa else cargar_reservas()
+    if en_cola and not sincronizar_con_github(reservas):
+        informar_rechazos(ESCRITURA.recuperar())
+    instantanea_vieja = previa is None
     sala_actual = SALAS[1]
     semana_actual = 0
+    pantalla = Pantalla()
+    precargador = Precargador(TABLA)
+    carga = None
     
     while True:
-        mostrar_menu()
-        mostrar_horarios(sala_actual, reservas, semana_actual)
+        if carga and not carga.is_alive():  # Terminó de cargar: los cuadros salen de las reservas
+            reservas, carga = carga.reservas(), None
+        # Menú y horarios se componen como un cuadro y se envían en una sola escritura
+        with tramo("dibujar_cuadro"), pantalla.capturar():
+            mostrar_menu()
+            mostrar_horarios(sala_actual, previa if reservas is None else reservas, semana_actual)
+        if reservas is None:
+            if carga is None:  # Primer cuadro mostrado desde la instantánea
+                carga = CargaEnSegundoPlano(previa)
+                carga.start()
+        else:
+            if instantanea_vieja:  # Rehacerla para la próxima sesión, ya con el cuadro en pantalla
+                guardar_instantanea(reservas)
+                instantanea_vieja = False
+            # Precalcular las semanas vecinas mientras se espera la opción
+            precargador.solicitar(reservas, sala_actual, [fechas_semana(semana_actual + 1), fechas_semana(semana_actual - 1)])
         
-        opcion = input("\nOpción (S/R/U/M/E/V/Q): ").lower()
+        opcion = input("\nOpción (S/R/U/M/E/V/</>/F/T/C/X/Q): ").lower()
+        if reservas is None and opcion not in NAVEGACION:  # El resto necesita las reservas completas
+            reservas, carga = carga.reservas(), None
         
         if opcion == 'q':
+            ESCRITURA.vaciar()
             print("¡Hasta luego!")
             # Sincronizar cambios con GitHub
-            sincronizar_con_github()
+            sincronizar_con_github(reservas)
+            guardar_instantanea(reservas)  # Desde el archivo que queda al salir
             break
         elif opcion == 's':
         # Cambia a la siguiente sala (alterna entre las disponibles)
             indice_actual = SALAS.index(sala_actual)
             nuevo_indice = (indice_actual + 1) % len(SALAS)  # Circular: si es la última, vuelve a la primera
             sala_actual = SALAS[nuevo_indice]
+            continue  # Nada más se imprimió: el próximo cuadro solo redibuja las celdas que cambian
+        elif opcion in ('>', '.'):
+            semana_actual += 1
+            continue
+        elif opcion in ('<', ','):
+            semana_actual -= 1
+            continue
+        elif opcion == 'f':
+            semana = seleccionar_semana()
+            if semana is not None:
+                semana_actual = semana
+            else:
+                input("\nPresione Enter para continuar...")
+        elif opcion == 't':
+            mostrar_tablero(reservas)
+        elif opcion == 'c':
+            ver_mapa(reservas, SALAS, HORAS)
         elif opcion == 'r':
-            reservar_horario(reservas, sala_actual)
+            reservar_horario(reservas, sala_actual, semana_actual)
         elif opcion == 'u':
             mostrar_por_usuario(reservas)
-            input("\nPresione Enter para continuar...")
         elif opcion == 'm':
             modificar_reserva(reservas)
             input("\nPresione Enter para continuar...")
@@ -465,10 +870,15 @@ def main():
             input("\nPresione Enter para continuar...")
         elif opcion == 'v':
             mostrar_resumen(reservas)
-            input("\nPresione Enter para continuar...")
+            exportar_analisis()
+        elif opcion == 'x':
+            gestionar_cierres(reservas)
         else:
             print(f"{COLOR_ERROR}Opción no válida.{COLOR_RESET}")
             input("\nPresione Enter para continuar...")
+        
+        # La opción escribió en la terminal: el próximo cuadro se dibuja completo
+        pantalla.invalidar()
 
 if __name__ == "__main__":
     main()
@@ -1,14 +1,37 @@
 import os
 import json
-import firebase_admin
+import shutil
+import sys
+import threading
+import time
 from datetime import datetime, timedelta
-from firebase_admin import credentials, firestore
+import costos_firestore
+import instrumentacion
+from instrumentacion import contar, medido, tramo
+from cambios import asignar, liberar, recargado, suscribir
+from carga_particionada import TRABAJADORES, leer_particionado
+from escritura_diferida import BufferEscritura
+from analitica import ANALITICA
+from cuotas import CUOTAS
+from indice_usuarios import INDICE
+from listados import INDICE_RESERVAS, paginas
+from cierres import Calendario, cierre
+from columnar import COLUMNAS
+from mapa_calor import ver_mapa
+from tabla import MotorTabla, Precargador
+from pantalla import Pantalla, BORRAR_TODO, INICIO
+from lista_espera import CLAVE_ESPERA, agregar_en_espera, profundidad, promover
 
 # Configuración
 SALAS = ["Sala Piso 4", "Sala Piso 5"]
 HORAS = ["08:00", "09:00", "10:00", "11:00", "12:00", "13:00", "14:00", "15:00", "16:00"]
 DIAS_SEMANA = ["Lu", "Ma", "Mi", "Ju", "Vi"]
 # ARCHIVO_DATOS = "reservas6.json"
+COLECCION_ESPERA = "lista_espera"
+ARCHIVO_CACHE = "reservas_cache.json"  # Copia local de lo último leído/guardado
+ARCHIVO_DIARIO = "reservas_diario.jsonl"  # Operaciones que Firestore todavía no confirmó
+LIMITE_BATCH = 500  # Máximo de operaciones por batch en Firestore
+REINTENTO_CONEXION = 30  # Segundos entre intentos de reconexión sin conexión
 
 # Caracteres ASCII para la interfaz
 BORDE_H = "═"
@@ -29,18 +52,150 @@ COLOR_ERROR = "\033[1;31m"
 COLOR_EXITO = "\033[1;32m"
 COLOR_RESET = "\033[0m"
 
+# Feriados y cierres (cierres.json), compilados en máscaras por sala y día
+CIERRES = Calendario(HORAS)
+
+# Motor de tablas semanales (plantillas precalculadas y caché por semana)
+TABLA = MotorTabla(HORAS, DIAS_SEMANA, COLOR_TITULO, COLOR_ERROR, COLOR_RESET, cierres=CIERRES)
+
+# Con RESERVAS_COLUMNAR=1 las tablas y el listado por usuario salen del
+# almacén por columnas (columnar.py) en vez de los diccionarios anidados
+COLUMNAR = os.environ.get("RESERVAS_COLUMNAR") == "1"
+
+# Reservas de una sala para las fechas de la tabla
+def datos_tabla(reservas, sala, fechas):
+    if not COLUMNAR:
+        return reservas
+    COLUMNAS.asegurar(reservas, SALAS, HORAS)
+    return COLUMNAS.cuadricula(sala, fechas)
+
+# Índice para los listados (mismas consultas en los dos)
+def indice_listados(reservas):
+    if COLUMNAR:
+        COLUMNAS.asegurar(reservas, SALAS, HORAS)
+        return COLUMNAS
+    INDICE_RESERVAS.asegurar(reservas, SALAS)
+    return INDICE_RESERVAS
+
+_candado_conexion = threading.Lock()
+
 # Configuración inicial (solo una vez en tu programa)
+# Con RESERVAS_FIRESTORE=falso se usa el Firestore en memoria (sin red).
+# El SDK de Firebase (grpc, protobuf, google-auth) se importa recién aquí,
+# para que el primer cuadro no tenga que esperarlo.
 def inicializar_firebase():
-    if not firebase_admin._apps:
-        cred = credentials.Certificate("salareunionbar-firebase-adminsdk-fbsvc-f99134b887.json")  # Ruta a tu archivo JSON
-        firebase_admin.initialize_app(cred)
+    if os.environ.get("RESERVAS_FIRESTORE") == "falso":
+        import firestore_falso
+        return firestore_falso.cliente_compartido()
+    from firebase_admin import firestore
+    inicializar_app()
     return firestore.client()
 
-# Cargar todas las reservas desde Firestore
+def inicializar_app():
+    import firebase_admin
+    from firebase_admin import credentials
+    with _candado_conexion:  # La carga en segundo plano también se conecta
+        if not firebase_admin._apps:
+            cred = credentials.Certificate("salareunionbar-firebase-adminsdk-fbsvc-f99134b887.json")  # Ruta a tu archivo JSON
+            firebase_admin.initialize_app(cred)
+
+# Con RESERVAS_ASYNC=1 las lecturas y los guardados usan el cliente asíncrono
+# (almacen_async): las consultas y los batches independientes se envían a la
+# vez desde un bucle de asyncio que corre en su propio hilo.
+ASINCRONICO = os.environ.get("RESERVAS_ASYNC") == "1"
+_almacen = None
+_bucle = None
+_candado_almacen = threading.Lock()
+
+def crear_cliente_async():
+    if os.environ.get("RESERVAS_FIRESTORE") == "falso":
+        import firestore_falso
+        return firestore_falso.ClienteAsyncFalso(firestore_falso.cliente_compartido())
+    from firebase_admin import firestore_async
+    inicializar_app()
+    return firestore_async.client()
+
+def inicializar_almacen():
+    global _almacen, _bucle
+    with _candado_almacen:
+        if _almacen is None:
+            from almacen_async import AlmacenAsync, BucleEnSegundoPlano
+            _bucle = BucleEnSegundoPlano().iniciar()
+            _almacen = _bucle.crear(lambda: AlmacenAsync(crear_cliente_async()))
+    return _almacen, _bucle
+
+# Documentos conocidos en Firestore, para guardar solo las diferencias:
+# (sala, fecha, hora) -> (id, usuario) y clave de espera -> (id, cola)
+_documentos = {}
+_documentos_espera = {}
+_guardado_pendiente = False
+_guardados = 0  # Cantidad de guardados hechos en esta sesión
+
+# Copia local de las reservas y de los ids de sus documentos
+def guardar_cache(reservas):
+    datos = {
+        "reservas": reservas,
+        "documentos": [[sala, fecha, hora, id_doc, usuario]
+                       for (sala, fecha, hora), (id_doc, usuario) in _documentos.items()],
+        "espera": {clave: id_doc for clave, (id_doc, _) in _documentos_espera.items()},
+    }
+    temporal = ARCHIVO_CACHE + ".tmp"
+    with open(temporal, 'w') as f:
+        json.dump(datos, f)
+    os.replace(temporal, ARCHIVO_CACHE)
+
+def cargar_cache():
+    try:
+        with open(ARCHIVO_CACHE, 'r') as f:
+            datos = json.load(f)
+    except (OSError, ValueError):
+        return None
+    _documentos.clear()
+    for sala, fecha, hora, id_doc, usuario in datos.get("documentos", []):
+        _documentos[(sala, fecha, hora)] = (id_doc, usuario)
+    reservas = datos["reservas"]
+    _documentos_espera.clear()
+    for clave, id_doc in datos.get("espera", {}).items():
+        cola = reservas.get(CLAVE_ESPERA, {}).get(clave, [])
+        _documentos_espera[clave] = (id_doc, [list(entrada) for entrada in cola])
+    return reservas
+
+# Cargar todas las reservas (y la lista de espera) desde Firestore.
+# Si el presupuesto de lecturas está por agotarse, no se recorre la colección
+# y se usa la copia local.
+@medido("cargar_datos")
 def cargar_datos():
-    db = inicializar_firebase()  # Usa la función de conexión a Firestore
+    if not costos_firestore.puede_leer():
+        reservas = cargar_cache()
+        if reservas is not None:
+            print(f"{COLOR_ERROR}Presupuesto de lecturas casi agotado: usando la copia local.{COLOR_RESET}")
+            return reservas
+    return aplicar_lectura(*leer_firestore())
+
+# Reemplazar los documentos conocidos por los de una lectura completa
+def aplicar_lectura(reservas, documentos, documentos_espera):
+    _documentos.clear()
+    _documentos.update(documentos)
+    _documentos_espera.clear()
+    _documentos_espera.update(documentos_espera)
+    guardar_cache(reservas)
+    return reservas
+
+# Leer las colecciones completas (no toca el estado global; puede correr en otro hilo)
+def leer_firestore():
     reservas = {sala: {} for sala in SALAS}  # Estructura inicial
-    docs = db.collection("reservas").stream()
+    documentos = {}
+    documentos_espera = {}
+    # La colección completa se lee por rangos de fechas en paralelo
+    if ASINCRONICO:  # Las dos colecciones y todos los rangos a la vez
+        almacen, bucle = inicializar_almacen()
+        (docs, facturadas), (docs_espera, _) = bucle.ejecutar(almacen.leer_varias(
+            ("reservas", "fecha", TRABAJADORES), (COLECCION_ESPERA,)))
+    else:
+        db = inicializar_firebase()  # Usa la función de conexión a Firestore
+        docs, facturadas = leer_particionado(db.collection("reservas"))
+        docs_espera = db.collection(COLECCION_ESPERA).stream()
+    leidos = len(docs)
     for doc in docs:
         data = doc.to_dict()
         sala = data["sala"]
@@ -52,62 +207,200 @@ def cargar_datos():
         if fecha not in reservas[sala]:
             reservas[sala][fecha] = {}
         reservas[sala][fecha][hora] = usuario
-    return reservas
+        documentos[(sala, fecha, hora)] = (doc.id, usuario)
     
-   # Obtener todas las reservas desde Firestore
-    docs = db.collection("reservas").stream()
-    for doc in docs:
+    # Colas de espera: un documento por horario con el heap serializado
+    esperas = {}
+    leidos_espera = 0
+    for doc in docs_espera:
         data = doc.to_dict()
-        sala = data["sala"]
-        fecha = data["fecha"]
-        hora = data["hora"]
-        usuario = data["usuario"]
-        
-        if sala not in reservas:
-            reservas[sala] = {}
-        if fecha not in reservas[sala]:
-            reservas[sala][fecha] = {}
-        reservas[sala][fecha][hora] = usuario
+        leidos_espera += 1
+        if data.get("cola"):
+            esperas[data["clave"]] = [list(entrada) for entrada in data["cola"]]
+            documentos_espera[data["clave"]] = (doc.id, [list(entrada) for entrada in data["cola"]])
+    if esperas:
+        reservas[CLAVE_ESPERA] = esperas
+    
+    # Cada consulta se factura como mínimo una lectura
+    costos_firestore.registrar("lecturas", facturadas + max(leidos_espera, 1))
+    contar("documentos_leidos", leidos + leidos_espera)
+    return reservas, documentos, documentos_espera
+
+# Conexión y lectura en segundo plano, mientras se muestra la copia local
+class CargaEnSegundoPlano(threading.Thread):
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.resultado = None
+        self.error = None
+        self.guardados = _guardados
     
-    return reservas    
+    def run(self):
+        try:
+            self.resultado = leer_firestore()
+        except Exception as e:  # Sin conexión: se sigue con la copia local
+            self.error = e
     
-# Guardar una nueva reserva en Firestore
-def guardar_datos(reservas):
-    db = inicializar_firebase()
-    # Limpiar todas las reservas existentes (opcional, pero útil para evitar duplicados)
-    batch = db.batch()    
-    # Primero limpia todas las reservas existentes (opcional, depende de tu lógica)
-    docs = db.collection("reservas").stream()
-    for doc in docs:
-        batch.delete(doc.reference)
-    batch.commit()
-    
-    # Guardar las nuevas reservas
-    for sala, fechas in reservas.items():
-        for fecha, horas in fechas.items():
-            for hora, usuario in horas.items():
-                db.collection("reservas").add({
-                    "sala": sala,
-                    "fecha": fecha,
-                    "hora": hora,
-                    "usuario": usuario
-                })
+    # Pasar los datos frescos a las reservas en uso y volver a aplicar encima
+    # las operaciones en cola (llamar desde el hilo principal). Si mientras
+    # tanto se guardó algo, la lectura puede no tenerlo: no se aplica y
+    # devuelve None (hay que volver a leer, ver reintentar()); si no, devuelve
+    # el resultado de ESCRITURA.recuperar().
+    def aplicar(self, reservas):
+        with ESCRITURA.candado:
+            if self.guardados != _guardados or (ESCRITURA.pendientes and not ESCRITURA.diario):
+                return None
+            nuevas = aplicar_lectura(*self.resultado)
+            reservas.clear()
+            reservas.update(nuevas)
+            recargado()
+            self.resultado = None
+            resultado = ESCRITURA.recuperar()
+            podar_esperas(reservas)
+            return resultado
+    
+    # Nueva lectura para reemplazar una que quedó vieja. Sin diario, lo que
+    # está pendiente se guarda antes para que la lectura nueva ya lo tenga.
+    @staticmethod
+    def reintentar():
+        if not ESCRITURA.diario:
+            ESCRITURA.vaciar()
+        carga = CargaEnSegundoPlano()
+        carga.start()
+        return carga
+
+# Guardar reservas y lista de espera en Firestore con un único batch
+# (la liberación de un horario y la promoción del siguiente en espera
+# quedan en la misma escritura atómica). Solo se escriben y borran los
+# documentos que cambiaron desde la última carga o guardado; no se vuelve
+# a leer la colección. Con el presupuesto de escrituras casi agotado, los
+# guardados se agrupan y se envían al salir (guardar_pendiente).
+@medido("guardar_datos")
+def guardar_datos(reservas, forzar=False):
+    global _guardado_pendiente, _guardados
+    _guardados += 1
+    guardar_cache(reservas)  # La copia local siempre queda al día
+    if not forzar and costos_firestore.agrupar_escrituras():
+        _guardado_pendiente = True
+        return False  # Solo la copia local: el diario sigue hasta el envío
+    
+    if ASINCRONICO:
+        almacen, bucle = inicializar_almacen()
+        db = almacen.cliente
+    else:
+        db = inicializar_firebase()
+    operaciones = []  # ("set" | "delete", colección, id, datos)
+    escritos = 0
+    borrados = 0
+    
+    deseados = {
+        (sala, fecha, hora): usuario
+        for sala, fechas in reservas.items() if sala != CLAVE_ESPERA
+        for fecha, horas in fechas.items()
+        for hora, usuario in horas.items()
+    }
+    
+    # Borrar las reservas que ya no están (o que cambiaron de usuario)
+    for clave, (id_doc, usuario) in list(_documentos.items()):
+        if deseados.get(clave) != usuario:
+            operaciones.append(("delete", "reservas", id_doc, None))
+            del _documentos[clave]
+            borrados += 1
+    
+    # Guardar las reservas nuevas
+    for (sala, fecha, hora), usuario in deseados.items():
+        if (sala, fecha, hora) in _documentos:
+            continue
+        documento = {
+            "sala": sala,
+            "fecha": fecha,
+            "hora": hora,
+            "usuario": usuario
+        }
+        id_doc = db.collection("reservas").document().id  # Id nuevo, sin ir al servidor
+        operaciones.append(("set", "reservas", id_doc, documento))
+        _documentos[(sala, fecha, hora)] = (id_doc, usuario)
+        escritos += 1
+        if instrumentacion.ACTIVO:
+            contar("bytes_serializados", len(json.dumps(documento)))
+    
+    # Guardar las colas de espera que cambiaron y borrar las vacías
+    esperas = {clave: cola for clave, cola in reservas.get(CLAVE_ESPERA, {}).items() if cola}
+    for clave, (id_doc, _) in list(_documentos_espera.items()):
+        if clave not in esperas:
+            operaciones.append(("delete", COLECCION_ESPERA, id_doc, None))
+            del _documentos_espera[clave]
+            borrados += 1
+    for clave, cola in esperas.items():
+        conocido = _documentos_espera.get(clave)
+        if conocido and conocido[1] == cola:
+            continue
+        id_doc = conocido[0] if conocido else db.collection(COLECCION_ESPERA).document().id
+        operaciones.append(("set", COLECCION_ESPERA, id_doc, {"clave": clave, "cola": cola}))
+        _documentos_espera[clave] = (id_doc, [list(entrada) for entrada in cola])
+        escritos += 1
+    
+    with tramo("firestore.batch_commit"):
+        if ASINCRONICO:  # Los batches de más de LIMITE_BATCH operaciones se envían a la vez
+            bucle.ejecutar(almacen.confirmar(operaciones))
+        else:
+            confirmar_operaciones(db, operaciones)
+    _guardado_pendiente = False
+    costos_firestore.registrar("escrituras", escritos)
+    costos_firestore.registrar("borrados", borrados)
+    contar("documentos_escritos", escritos)
+    contar("documentos_borrados", borrados)
+    guardar_cache(reservas)  # Con los ids de los documentos nuevos
+
+# Firestore limita un batch a 500 operaciones; por encima se parte y los
+# batches se envían uno detrás de otro
+def confirmar_operaciones(db, operaciones):
+    for inicio in range(0, max(len(operaciones), 1), LIMITE_BATCH):
+        batch = db.batch()
+        for tipo, coleccion, id_doc, datos in operaciones[inicio:inicio + LIMITE_BATCH]:
+            referencia = db.collection(coleccion).document(id_doc)
+            if tipo == "delete":
+                batch.delete(referencia)
+            else:
+                batch.set(referencia, datos)
+        batch.commit()
+
+# Enviar lo que quedó sin guardar: la escritura diferida y los guardados
+# que se agruparon por presupuesto
+def guardar_pendiente(reservas):
+    ESCRITURA.vaciar()
+    if _guardado_pendiente and not ESCRITURA.suspendido:
+        guardar_datos(reservas, forzar=True)
+        ESCRITURA.confirmar()
+
+# Para recuperar(): una reserva del diario en un horario que se cerró o que ya
+# no entra en la cuota se rechaza, igual que al reservar
+def validar_reserva(sala, fecha, hora, usuario):
+    if CIERRES.cerrado(sala, fecha, hora):
+        return f"{sala} {fecha} {hora} está cerrado ({CIERRES.motivo(sala, fecha, hora)})"
+    CUOTAS.asegurar(ESCRITURA.reservas, SALAS)
+    return CUOTAS.verificar(usuario, sala, fecha)
+
+# Los cambios se guardan juntos, un momento después de la última edición
+ESCRITURA = BufferEscritura(guardar_datos, ARCHIVO_DIARIO, validar=validar_reserva)
+suscribir(ESCRITURA.registrar)
  
-# Limpiar pantalla
+# Limpiar pantalla (secuencia ANSI, sin lanzar un proceso)
 def limpiar_pantalla():
-    os.system('cls' if os.name == 'nt' else 'clear')
+    sys.stdout.write(INICIO + BORRAR_TODO)
+    sys.stdout.flush()
 
 # Dibujar marco
 def dibujar_marco(ancho=80):
     print(f"{COLOR_TITULO}{ESQUINA_TL}{BORDE_H*(ancho-2)}{ESQUINA_TR}{COLOR_RESET}")
 
 # Menú principal
+# (la pantalla la prepara el renderer de main, que solo redibuja lo que cambió)
 def mostrar_menu():
-    limpiar_pantalla()
     dibujar_marco()
     print(f"{COLOR_TITULO}{BORDE_V}{COLOR_MENU}{' SISTEMA DE RESERVAS '.center(78)}{COLOR_TITULO}{BORDE_V}{COLOR_RESET}")
     dibujar_marco()
     print(f"{COLOR_TITULO}{BORDE_V} {COLOR_MENU}[S]ala  [R]eservar  [U]suarios  [M]odificar  [E]liminar  [V]er  [Q]uit {COLOR_TITULO}{BORDE_V:>7}{COLOR_RESET}")
+    print(f"{COLOR_TITULO}{BORDE_V} {COLOR_MENU}{'[<] Semana ant.  [>] Semana sig.  [F]echa  [T]ablero  [C]alor  [X] Cierres'.ljust(77)}{COLOR_TITULO}{BORDE_V}{COLOR_RESET}")
     dibujar_marco()
 
 # Convertir día abreviado a fecha
@@ -120,34 +413,41 @@ def dia_a_fecha(dia_abrev, semana=0):
     diferencia = (dia_num - hoy.weekday() + 7) % 7
     fecha = hoy + timedelta(days=diferencia + semana * 7)
     
-    # Si la fecha calculada es anterior a hoy, sumamos 1 semana (por seguridad)
-    if fecha.date() < hoy.date():
+    # Si la fecha calculada es anterior a hoy, sumamos 1 semana (por seguridad).
+    # Las semanas anteriores (semana < 0) sí pueden quedar en el pasado.
+    if semana >= 0 and fecha.date() < hoy.date():
         fecha += timedelta(days=7)
     
     return fecha.strftime("%Y-%m-%d")
 
+# Fechas de cada día de la semana mostrada
+def fechas_semana(semana=0):
+    return [dia_a_fecha(dia, semana) for dia in DIAS_SEMANA]
+
+# Semana (relativa a la actual) que contiene una fecha
+def semana_de_fecha(fecha):
+    return (fecha.date() - datetime.now().date()).days // 7
+
 def mostrar_horarios(sala, reservas, semana=0):
+    fechas = fechas_semana(semana)
+    desde = datetime.strptime(min(fechas), "%Y-%m-%d").strftime("%d/%m")
+    hasta = datetime.strptime(max(fechas), "%Y-%m-%d").strftime("%d/%m")
     print(f"\n{COLOR_RESALTADO}{sala.center(30)}{COLOR_RESET}")
-    
-    # Cabecera de la tabla
-    print(f"{COLOR_TITULO}┌────────┬───┬───┬───┬───┬───┐{COLOR_RESET}")
-    print(f"{COLOR_TITULO}│ Hora   │{DIAS_SEMANA[0]} │{DIAS_SEMANA[1]} │{DIAS_SEMANA[2]} │{DIAS_SEMANA[3]} │{DIAS_SEMANA[4]} │{COLOR_RESET}")
-    print(f"{COLOR_TITULO}├────────┼───┼───┼───┼───┼───┤{COLOR_RESET}")  # Corregido: eliminé el "┼─────" extra
-    
-    for hora in HORAS:  # Ahora está correctamente indentado
-        fila = f"{COLOR_TITULO}│ {COLOR_RESET}{hora.ljust(6)}{COLOR_TITULO} │{COLOR_RESET}"
-        for dia in DIAS_SEMANA:
-            fecha = dia_a_fecha(dia)
-            if reservas.get(sala, {}).get(fecha, {}).get(hora):
-                usuario = reservas[sala][fecha][hora]
-                fila += f" {COLOR_ERROR}{usuario[:1]}{COLOR_RESET} {COLOR_TITULO}│{COLOR_RESET}"
-            else:
-                fila += f"   {COLOR_TITULO}│{COLOR_RESET}"
-        print(fila)
-    print(f"{COLOR_TITULO}└────────┴───┴───┴───┴───┴───┘{COLOR_RESET}")
+    print(f"{f'{desde} - {hasta}'.center(30)}")
+    print(TABLA.dibujar(datos_tabla(reservas, sala, fechas), sala, fechas, "horarios"))
+
+# Pedir una fecha y devolver la semana que la contiene
+def seleccionar_semana():
+    texto = input("Ir a la fecha (DD/MM/AAAA): ").strip()
+    try:
+        return semana_de_fecha(datetime.strptime(texto, "%d/%m/%Y"))
+    except ValueError:
+        print(f"{COLOR_ERROR}Fecha inválida.{COLOR_RESET}")
+        return None
 
 # Módulo de reserva
-def reservar_horario(reservas, sala_actual):
+@ESCRITURA.mutacion
+def reservar_horario(reservas, sala_actual, semana=0):
     #sala = seleccionar_sala()
     #if not sala:
     #    return
@@ -158,10 +458,14 @@ def reservar_horario(reservas, sala_actual):
     dia = seleccionar_dia()
     if not dia:
         return
-    fecha = dia_a_fecha(dia)
+    fecha = dia_a_fecha(dia, semana)  # Día de la semana que se está mostrando
+    if fecha < datetime.now().strftime("%Y-%m-%d"):
+        print(f"{COLOR_ERROR}No se puede reservar en una fecha pasada.{COLOR_RESET}")
+        return
     horas_ocupadas = set(reservas.get(sala_actual, {}).get(fecha, {}).keys())  # Obtiene las horas ocupadas
+    cerradas = CIERRES.bloqueadas(sala_actual, fecha)  # Feriados y cierres: no se ofrecen
     
-    hora = seleccionar_hora(horas_ocupadas)
+    hora = seleccionar_hora(horas_ocupadas, mostrar_ocupadas=True, cerradas=cerradas)
     if not hora:
         return
     
@@ -169,40 +473,81 @@ def reservar_horario(reservas, sala_actual):
     if not usuario:
         print(f"{COLOR_ERROR}Debe ingresar un nombre.{COLOR_RESET}")
         return
+    
+    # Cuotas: horas por semana, por sala y semana, y reservas pendientes
+    CUOTAS.asegurar(reservas, SALAS)
+    motivo = CUOTAS.verificar(usuario, sala_actual, fecha)
+    if motivo:
+        print(f"{COLOR_ERROR}Límite alcanzado: {motivo}.{COLOR_RESET}")
+        return
         
-    if hora in horas_ocupadas:  # Validación adicional por seguridad
+    if CIERRES.cerrado(sala_actual, fecha, hora):
+        print(f"{COLOR_ERROR}La sala está cerrada en ese horario ({CIERRES.motivo(sala_actual, fecha, hora)}).{COLOR_RESET}")
+        return
+        
+    if hora in horas_ocupadas:  # Horario tomado: ofrecer la lista de espera
         print(f"{COLOR_ERROR}¡Este horario ya está reservado!{COLOR_RESET}")
+        en_espera = profundidad(reservas, sala_actual, fecha, hora)
+        confirmacion = input(f"¿Entrar en la lista de espera? ({en_espera} esperando) (S/N): ").lower()
+        if confirmacion == 's':
+            if agregar_en_espera(reservas, sala_actual, fecha, hora, usuario):
+                print(f"{COLOR_EXITO}Quedó en la lista de espera. Se le asignará si el horario se libera.{COLOR_RESET}")
+            else:
+                print(f"{COLOR_ERROR}Ya está en la lista de espera de este horario.{COLOR_RESET}")
         return
 
     if reservas[sala_actual].get(fecha, {}).get(hora):
         print(f"{COLOR_ERROR}¡Este horario ya está reservado!{COLOR_RESET}")
         return
     
-    reservas[sala_actual].setdefault(fecha, {})[hora] = usuario
-    guardar_datos(reservas)
+    asignar(reservas, sala_actual, fecha, hora, usuario)
     print(f"{COLOR_EXITO}¡Reserva realizada con éxito!{COLOR_RESET}")
 
-# Módulo de visualización por usuario
+# Para promover(): quien espera solo toma el horario si sigue dentro de su cuota
+def en_cuota(reservas, sala, fecha):
+    CUOTAS.asegurar(reservas, SALAS)
+    return lambda usuario: CUOTAS.permite(usuario, sala, fecha)
+
+# Módulo de visualización por usuario: se recorre el índice de a una página,
+# con los filtros de fecha y sala aplicados en la consulta
 def mostrar_por_usuario(reservas):
-    usuarios = {}
-    for sala in SALAS:
-        for fecha in reservas[sala]:
-            for hora, usuario in reservas[sala][fecha].items():
-                usuarios.setdefault(usuario, []).append((sala, fecha, hora))
-    
-    if not usuarios:
+    indice = indice_listados(reservas)
+    if not indice.por_usuario:
         print(f"{COLOR_ERROR}No hay reservas registradas.{COLOR_RESET}")
+        input("\nPresione Enter para continuar...")
+        return
+    
+    texto = input("\nDesde la fecha (DD/MM/AAAA, Enter para toda la historia): ").strip()
+    try:
+        desde = datetime.strptime(texto, "%d/%m/%Y").strftime("%Y-%m-%d") if texto else None
+    except ValueError:
+        print(f"{COLOR_ERROR}Fecha inválida.{COLOR_RESET}")
+        input("\nPresione Enter para continuar...")
         return
+    opciones = "  ".join(f"{i}. {sala}" for i, sala in enumerate(SALAS, 1))
+    texto = input(f"Sala ({opciones}; Enter para todas): ").strip()
+    salas = [SALAS[int(texto) - 1]] if texto.isdigit() and 1 <= int(texto) <= len(SALAS) else None
     
+    por_pagina = max(5, shutil.get_terminal_size().lines - 8)
+    filas = indice.por_usuarios(salas=salas, desde=desde)
+    usuario_actual = None
     print(f"\n{COLOR_RESALTADO}{' RESERVAS POR USUARIO '.center(30)}{COLOR_RESET}")
-    for usuario, reservas_usuario in usuarios.items():
-        print(f"\n{COLOR_MENU}Usuario: {usuario}{COLOR_RESET}")
-        for sala, fecha, hora in reservas_usuario:
+    for numero, pagina in enumerate(paginas(filas, por_pagina), 1):
+        for fecha, hora, sala, usuario in pagina:
+            if usuario != usuario_actual:
+                print(f"\n{COLOR_MENU}Usuario: {usuario}{COLOR_RESET}")
+                usuario_actual = usuario
             fecha_formato = datetime.strptime(fecha, "%Y-%m-%d").strftime("%d/%m/%Y")
             dia_semana = DIAS_SEMANA[datetime.strptime(fecha, "%Y-%m-%d").weekday()]
             print(f" - {sala}: {dia_semana} {fecha_formato} a las {hora}")
+        if input(f"\nPágina {numero}. Enter para seguir, [Q] para volver: ").strip().lower() == 'q':
+            return
+    if usuario_actual is None:
+        print(f"{COLOR_ERROR}No hay reservas con esos filtros.{COLOR_RESET}")
+        input("\nPresione Enter para continuar...")
 
 # Módulo de modificación
+@ESCRITURA.mutacion
 def modificar_reserva(reservas):
    # usuario = input("Ingrese su nombre: ").strip()
    # Paso 1: Seleccionar usuario
@@ -211,12 +556,9 @@ def modificar_reserva(reservas):
         print(f"{COLOR_ERROR}Debe ingresar un nombre.{COLOR_RESET}")
         return
     
-    reservas_usuario = []
-    for sala in SALAS:
-        for fecha in reservas[sala]:
-            for hora, usuario_reserva in reservas[sala][fecha].items():
-                if usuario_reserva == usuario:
-                    reservas_usuario.append((sala, fecha, hora))
+    # Sus reservas salen del índice por usuario, sin recorrer todas las salas
+    reservas_usuario = [(sala, fecha, hora)
+                        for fecha, hora, sala, _ in indice_listados(reservas).por_usuarios([usuario])]
     
     if not reservas_usuario:
         print(f"{COLOR_ERROR}No se encontraron reservas para este usuario.{COLOR_RESET}")
@@ -243,7 +585,7 @@ def modificar_reserva(reservas):
         h for h in reservas[sala][fecha].keys() 
         if h != hora_antigua  # Excluimos la hora que se está modificando
     }
-    nueva_hora = seleccionar_hora(horas_ocupadas)
+    nueva_hora = seleccionar_hora(horas_ocupadas, cerradas=CIERRES.bloqueadas(sala, fecha))
     if not nueva_hora:
         return
     
@@ -251,19 +593,31 @@ def modificar_reserva(reservas):
     if nueva_hora in reservas[sala][fecha]:
         print(f"{COLOR_ERROR}La hora {nueva_hora} ya está ocupada.{COLOR_RESET}")
         return
+    if CIERRES.cerrado(sala, fecha, nueva_hora):
+        print(f"{COLOR_ERROR}La sala está cerrada a las {nueva_hora} ({CIERRES.motivo(sala, fecha, nueva_hora)}).{COLOR_RESET}")
+        return
     
     # Realizar la modificación
     try:
         # Eliminar la reserva antigua
-        del reservas[sala][fecha][hora_antigua]
+        liberar(reservas, sala, fecha, hora_antigua)
         
         # Crear la nueva reserva
-        reservas[sala][fecha][nueva_hora] = usuario
+        asignar(reservas, sala, fecha, nueva_hora, usuario)
+        
+        # Asignar la hora liberada al primero en espera (misma escritura),
+        # salvo que el horario esté cerrado
+        promovido = None
+        if not CIERRES.cerrado(sala, fecha, hora_antigua):
+            promovido = promover(reservas, sala, fecha, hora_antigua, en_cuota(reservas, sala, fecha))
         print(f"{COLOR_EXITO}Reserva modificada exitosamente.{COLOR_RESET}")
+        if promovido:
+            print(f"{COLOR_EXITO}{hora_antigua} asignada a {promovido} (lista de espera).{COLOR_RESET}")
     except Exception as e:
         print(f"{COLOR_ERROR}Error al modificar la reserva: {e}{COLOR_RESET}") 
 
 # Módulo de eliminación
+@ESCRITURA.mutacion
 def eliminar_reserva(reservas):
     # Paso 1: Seleccionar usuario
     usuario = seleccionar_usuario(reservas)  # <- Usa la nueva función
@@ -271,12 +625,9 @@ def eliminar_reserva(reservas):
         return
     
     # Paso 2: Mostrar reservas del usuario seleccionado
-    reservas_usuario = []
-    for sala in SALAS:
-        for fecha in reservas[sala]:
-            for hora, usuario_reserva in reservas[sala][fecha].items():
-                if usuario_reserva == usuario:
-                    reservas_usuario.append((sala, fecha, hora))
+    # Sus reservas salen del índice por usuario, sin recorrer todas las salas
+    reservas_usuario = [(sala, fecha, hora)
+                        for fecha, hora, sala, _ in indice_listados(reservas).por_usuarios([usuario])]
     
     #print(f"\n{COLOR_RESALTADO}{' RESERVAS DE ' + usuario.upper() + ' '.center(30)}{COLOR_RESET}")
     #for i, (sala, fecha, hora) in enumerate(reservas_usuario, 1):
@@ -306,12 +657,15 @@ def eliminar_reserva(reservas):
     # Confirmar eliminación
     confirmacion = input(f"¿Eliminar esta reserva? (S/N): ").lower()
     if confirmacion == 's':
-        del reservas[sala][fecha][hora]
-        # Eliminar fecha si no hay más reservas
-        if not reservas[sala][fecha]:
-            del reservas[sala][fecha]
-        guardar_datos(reservas)
+        liberar(reservas, sala, fecha, hora)  # Elimina también la fecha si queda vacía
+        # Asignar el horario liberado al primero en espera (misma escritura),
+        # salvo que el horario esté cerrado
+        promovido = None
+        if not CIERRES.cerrado(sala, fecha, hora):
+            promovido = promover(reservas, sala, fecha, hora, en_cuota(reservas, sala, fecha))
         print(f"{COLOR_EXITO}¡Reserva eliminada con éxito!{COLOR_RESET}")
+        if promovido:
+            print(f"{COLOR_EXITO}Horario asignado a {promovido} (lista de espera).{COLOR_RESET}")
     else:
         print("Operación cancelada.")
 
@@ -319,54 +673,169 @@ def eliminar_reserva(reservas):
 def mostrar_resumen(reservas):
     print(f"\n{COLOR_RESALTADO}{' RESUMEN DE RESERVAS '.center(30)}{COLOR_RESET}")
     
+    fechas = fechas_semana()
     for sala in SALAS:
         print(f"\n{COLOR_MENU}{sala.center(0)}{COLOR_RESET}")
-        
-        # Cabecera de la tabla
-        print(f"{COLOR_TITULO}┌───────┬───┬───┬───┬───┬───┐{COLOR_RESET}")
-        print(f"{COLOR_TITULO}│ Hora  │{DIAS_SEMANA[0]} │{DIAS_SEMANA[1]} │{DIAS_SEMANA[2]} │{DIAS_SEMANA[3]} │{DIAS_SEMANA[4]} │{COLOR_RESET}")
-        print(f"{COLOR_TITULO}├───────┼───┼───┼───┼───┼───┤{COLOR_RESET}")
-        
-        for hora in HORAS:
-            fila = f"{COLOR_TITULO}│{COLOR_RESET}{hora.ljust(6)}{COLOR_TITULO} │{COLOR_RESET}"
-            for dia in DIAS_SEMANA:
-                fecha = dia_a_fecha(dia)
-                if reservas.get(sala, {}).get(fecha, {}).get(hora):
-                    usuario = reservas[sala][fecha][hora]
-                    fila += f" {COLOR_ERROR}{usuario[:1]}{COLOR_RESET} {COLOR_TITULO}│{COLOR_RESET}"
-                else:
-                    fila += f"   {COLOR_TITULO}│{COLOR_RESET}"
-            print(fila)
-        print(f"{COLOR_TITULO}└───────┴───┴───┴───┴───┴───┘{COLOR_RESET}")
+        print(TABLA.dibujar(datos_tabla(reservas, sala, fechas), sala, fechas, "resumen"))
+    
+    ANALITICA.asegurar(reservas, SALAS, HORAS)
+    print(f"\n{COLOR_RESALTADO}{' OCUPACIÓN '.center(30)}{COLOR_RESET}")
+    print(ANALITICA.resumen(SALAS))
+
+# Exportar el análisis de ocupación (Enter para seguir sin exportar)
+def exportar_analisis():
+    ruta = input("\nExportar el análisis a un archivo .csv o .json (Enter para continuar): ").strip()
+    if not ruta:
+        return
+    try:
+        filas = ANALITICA.exportar(ruta, SALAS)
+    except (OSError, ValueError) as e:
+        print(f"{COLOR_ERROR}No se pudo exportar: {e}{COLOR_RESET}")
+    else:
+        print(f"{COLOR_EXITO}{filas} filas exportadas a {ruta}{COLOR_RESET}")
+    input("\nPresione Enter para continuar...")
+
+# Texto breve de un cierre
+def describir_cierre(datos):
+    desde = datetime.strptime(datos["desde"], "%Y-%m-%d").strftime("%d/%m/%Y")
+    hasta = datetime.strptime(datos["hasta"], "%Y-%m-%d").strftime("%d/%m/%Y")
+    fechas = desde if desde == hasta else f"{desde} a {hasta}"
+    if datos["hora_desde"] or datos["hora_hasta"]:
+        horas = f"{datos['hora_desde'] or HORAS[0]} a {datos['hora_hasta'] or 'cierre'}"
+    else:
+        horas = "todo el día"
+    return f"{fechas}, {datos['sala'] or 'todas las salas'}, {horas}: {datos['motivo'] or '-'}"
+
+# Calendario de cierres: ver los vigentes, agregar uno o quitarlo
+def gestionar_cierres(reservas):
+    print(f"\n{COLOR_RESALTADO}{' CIERRES '.center(30)}{COLOR_RESET}")
+    vigentes = CIERRES.vigentes()
+    if not vigentes:
+        print("No hay cierres vigentes.")
+    for numero, (_, datos) in enumerate(vigentes, 1):
+        print(f"{numero}. {describir_cierre(datos)}")
+    
+    opcion = input("\n[A]gregar, número para quitar, Enter para volver: ").strip().lower()
+    if opcion == 'a':
+        agregar_cierre(reservas)
+    elif opcion.isdigit() and 1 <= int(opcion) <= len(vigentes):
+        quitado = CIERRES.quitar(vigentes[int(opcion) - 1][0])
+        print(f"{COLOR_EXITO}Cierre quitado: {describir_cierre(quitado)}{COLOR_RESET}")
+    else:
+        return
+    input("\nPresione Enter para continuar...")
+
+# Pedir los datos de un cierre nuevo e informar, todas juntas, las reservas
+# que quedan dentro (no se borran: se avisa para reubicarlas). Las colas de
+# espera de los horarios cerrados sí se quitan, y se guardan como un cambio.
+@ESCRITURA.mutacion
+def agregar_cierre(reservas):
+    try:
+        desde = datetime.strptime(input("Desde (DD/MM/AAAA): ").strip(), "%d/%m/%Y")
+        texto = input("Hasta (DD/MM/AAAA, Enter para un solo día): ").strip()
+        hasta = datetime.strptime(texto, "%d/%m/%Y") if texto else desde
+    except ValueError:
+        print(f"{COLOR_ERROR}Fecha inválida.{COLOR_RESET}")
+        return
+    if hasta < desde:
+        print(f"{COLOR_ERROR}La fecha final es anterior a la inicial.{COLOR_RESET}")
+        return
+    opciones = "  ".join(f"{i}. {sala}" for i, sala in enumerate(SALAS, 1))
+    texto = input(f"Sala ({opciones}; Enter para todas): ").strip()
+    sala = SALAS[int(texto) - 1] if texto.isdigit() and 1 <= int(texto) <= len(SALAS) else None
+    texto = input("Horas (HH:MM-HH:MM, Enter para todo el día): ").strip()
+    hora_desde = hora_hasta = None
+    if texto:
+        try:
+            hora_desde, hora_hasta = (datetime.strptime(parte.strip(), "%H:%M").strftime("%H:%M")
+                                      for parte in texto.split("-"))
+        except ValueError:
+            print(f"{COLOR_ERROR}Horas inválidas.{COLOR_RESET}")
+            return
+    motivo = input("Motivo: ").strip()
+    
+    nuevo = cierre(desde.strftime("%Y-%m-%d"), hasta.strftime("%Y-%m-%d"), sala, hora_desde, hora_hasta, motivo)
+    afectadas = CIERRES.agregar(nuevo, reservas, SALAS)
+    print(f"{COLOR_EXITO}Cierre agregado: {describir_cierre(nuevo)}{COLOR_RESET}")
+    if afectadas:
+        print(f"{COLOR_ERROR}{len(afectadas)} reservas quedan dentro del cierre:{COLOR_RESET}")
+        for sala, fecha, hora, usuario in afectadas:
+            fecha_formato = datetime.strptime(fecha, "%Y-%m-%d").strftime("%d/%m/%Y")
+            dia_semana = DIAS_SEMANA[datetime.strptime(fecha, "%Y-%m-%d").weekday()]
+            print(f" - {sala}: {dia_semana} {fecha_formato} a las {hora} ({usuario})")
+
+# Tablero de recepción: se actualiza con los cambios que llegan de Firestore
+def mostrar_tablero(reservas):
+    import tablero  # curses solo se carga si se usa el tablero
+    
+    # Los cambios remotos ya están guardados: no se anotan para guardarlos otra vez
+    @ESCRITURA.sin_anotar()
+    def al_cambiar(documentos, cambios_docs, leido_en):
+        costos_firestore.registrar("lecturas", len(cambios_docs))
+        for cambio in cambios_docs:
+            data = cambio.document.to_dict()
+            sala, fecha, hora, usuario = data["sala"], data["fecha"], data["hora"], data["usuario"]
+            actual = reservas.get(sala, {}).get(fecha, {}).get(hora)
+            if cambio.type.name == "REMOVED":
+                if _documentos.get((sala, fecha, hora), (None,))[0] == cambio.document.id:
+                    del _documentos[(sala, fecha, hora)]
+                if actual == usuario:
+                    liberar(reservas, sala, fecha, hora)
+            else:
+                _documentos[(sala, fecha, hora)] = (cambio.document.id, usuario)
+                if actual != usuario:
+                    asignar(reservas, sala, fecha, hora, usuario)
+    
+    # El listener empieza leyendo toda la colección: sin presupuesto, solo datos locales
+    if not costos_firestore.puede_leer(len(_documentos)):
+        print(f"{COLOR_ERROR}Presupuesto de lecturas casi agotado: el tablero no recibirá cambios remotos.{COLOR_RESET}")
+        tablero.ejecutar(reservas, SALAS, HORAS)
+        return
+    try:
+        escucha = inicializar_firebase().collection("reservas").on_snapshot(al_cambiar)
+    except Exception as e:
+        print(f"{COLOR_ERROR}Sin conexión ({e}): el tablero no recibirá cambios remotos.{COLOR_RESET}")
+        tablero.ejecutar(reservas, SALAS, HORAS)
+        return
+    try:
+        tablero.ejecutar(reservas, SALAS, HORAS)
+    finally:
+        escucha.unsubscribe()
 
 # Funciones auxiliares
 def seleccionar_usuario(reservas):
-    # Obtener todos los usuarios únicos con reservas
-    usuarios = set()
-    for sala in SALAS:
-        for fecha in reservas[sala]:
-            for usuario in reservas[sala][fecha].values():
-                usuarios.add(usuario)
-    
-    if not usuarios:
+    # Buscar por parte del nombre en el índice (no recorre las reservas)
+    INDICE.asegurar(reservas, SALAS)
+    if not INDICE.horas:
         print(f"{COLOR_ERROR}No hay reservas registradas.{COLOR_RESET}")
         return None
     
-    # Mostrar lista numerada
-    print(f"\n{COLOR_RESALTADO}{' USUARIOS CON RESERVAS '.center(30)}{COLOR_RESET}")
-    for i, usuario in enumerate(sorted(usuarios), 1):
-        print(f"{i}. {usuario}")
-    
-    # Permitir selección
-    try:
-        seleccion = input("\nSeleccione un usuario (número) o [X] para cancelar: ").strip().lower()
-        if seleccion == 'x':
+    texto = input("\nNombre o parte del nombre (Enter para ver todos, [X] para cancelar): ").strip()
+    por_pagina = max(5, shutil.get_terminal_size().lines - 8)
+    desde = 0  # Sin texto salen todos los usuarios, de a una página
+    while texto.lower() != 'x':
+        candidatos = INDICE.buscar(texto)
+        if not candidatos:
+            print(f"{COLOR_ERROR}Ningún usuario coincide con '{texto}'.{COLOR_RESET}")
+        else:
+            print(f"\n{COLOR_RESALTADO}{' USUARIOS CON RESERVAS '.center(30)}{COLOR_RESET}")
+            for i, usuario in enumerate(candidatos[desde:desde + por_pagina], desde + 1):
+                print(f"{i}. {usuario} ({INDICE.horas[usuario]} h)")
+        mas = desde + por_pagina < len(candidatos)
+        # Un número elige de la lista; Enter muestra la página siguiente y
+        # cualquier otro texto es una nueva búsqueda
+        seleccion = input(f"\nSeleccione un usuario (número), {'Enter para ver más, ' if mas else ''}"
+                          f"escriba otra búsqueda o [X] para cancelar: ").strip()
+        if seleccion.isdigit():
+            if 1 <= int(seleccion) <= len(candidatos):
+                return candidatos[int(seleccion) - 1]
+            print(f"{COLOR_ERROR}Opción no válida.{COLOR_RESET}")
             return None
-        seleccion = int(seleccion)
-        return sorted(usuarios)[seleccion-1]
-    except (ValueError, IndexError):
-        print(f"{COLOR_ERROR}Opción no válida.{COLOR_RESET}")
-        return None
+        if not seleccion and mas:
+            desde += por_pagina
+            continue
+        texto, desde = seleccion, 0
+    return None
         
 def seleccionar_sala():
       # Obtener todos los usuarios únicos con reservas
@@ -408,11 +877,14 @@ def seleccionar_dia():
         print(f"{COLOR_ERROR}Opción inválida.{COLOR_RESET}")
         return None
 
-def seleccionar_hora(horas_ocupadas=None):
+def seleccionar_hora(horas_ocupadas=None, mostrar_ocupadas=False, cerradas=frozenset()):
     if horas_ocupadas is None:
         horas_ocupadas = set()  # Si no se pasan horas ocupadas, asumimos que ninguna está reservada
     
-    horas_disponibles = [hora for hora in HORAS if hora not in horas_ocupadas]
+    # mostrar_ocupadas lista también las horas tomadas (para la lista de espera);
+    # las cerradas (feriados, mantenimiento) nunca se ofrecen
+    horas_disponibles = [hora for hora in HORAS
+                         if hora not in cerradas and (mostrar_ocupadas or hora not in horas_ocupadas)]
     
     if not horas_disponibles:
         print(f"{COLOR_ERROR}No hay horas disponibles.{COLOR_RESET}")
@@ -420,7 +892,10 @@ def seleccionar_hora(horas_ocupadas=None):
         
     print("\nHoras disponibles:")
     for i, hora in enumerate(horas_disponibles, 1):
-        print(f"{i}. {hora}")
+        if hora in horas_ocupadas:
+            print(f"{i}. {hora} {COLOR_ERROR}(ocupado){COLOR_RESET}")
+        else:
+            print(f"{i}. {hora}")
     try:
         seleccion = int(input("Opción (0 para cancelar): "))
         if seleccion == 0:
@@ -430,21 +905,98 @@ def seleccionar_hora(horas_ocupadas=None):
         print(f"{COLOR_ERROR}Opción inválida.{COLOR_RESET}")
         return None
 
+# Quitar las colas de espera de fechas pasadas y de horarios cerrados de las
+# reservas recién cargadas (se guarda como cualquier otro cambio)
+@ESCRITURA.mutacion
+def podar_esperas(reservas):
+    CIERRES.cargar(reservas)
+
+# Mostrar las operaciones en cola que el servidor rechazó al reconectar
+def informar_rechazos(resultado):
+    if not resultado or not resultado[1]:
+        return
+    aplicadas, rechazos = resultado
+    print(f"\n{COLOR_ERROR}Al reconectar se aplicaron {aplicadas} operaciones y se rechazaron {len(rechazos)}:{COLOR_RESET}")
+    for rechazo in rechazos:
+        print(f" - {rechazo}")
+    input("\nPresione Enter para continuar...")
+
 # Función principal
 def main():
-    reservas = cargar_datos()
+    # El primer cuadro sale de la copia local; Firestore se conecta en segundo plano.
+    # Sin conexión se sigue con la copia local y las operaciones esperan en
+    # el diario hasta que una reconexión las aplique sobre el servidor.
+    carga = None
+    en_linea = True
+    ultimo_intento = time.monotonic()
+    reservas = cargar_cache() if costos_firestore.puede_leer() else None
+    if reservas is None:
+        try:
+            reservas = cargar_datos()
+        except Exception as e:  # Sin conexión y sin copia local
+            print(f"{COLOR_ERROR}Sin conexión con Firestore: {e}{COLOR_RESET}")
+            en_linea = False
+    else:
+        carga = CargaEnSegundoPlano()
+        carga.start()
     if not isinstance(reservas, dict):  # Si no es diccionario, reinicializar
         reservas = {sala: {} for sala in SALAS}
+    ESCRITURA.vincular(reservas)
+    if en_linea and carga is None:  # Datos del servidor: se aplica ya lo que quedó en cola
+        try:
+            informar_rechazos(ESCRITURA.recuperar())
+        except Exception as e:
+            ESCRITURA.error = e
+    elif ESCRITURA.en_cola():
+        ESCRITURA.suspender()
+    podar_esperas(reservas)
     sala_actual = SALAS[1]
     semana_actual = 0
+    pantalla = Pantalla()
+    precargador = Precargador(TABLA)
     
     while True:
-        mostrar_menu()
-        mostrar_horarios(sala_actual, reservas, semana_actual)
+        if carga and not carga.is_alive():
+            en_linea = carga.error is None
+            vieja = False
+            if carga.resultado:
+                try:
+                    resultado = carga.aplicar(reservas)
+                    vieja = resultado is None
+                    informar_rechazos(resultado)
+                except Exception as e:  # Se leyó, pero no se pudo guardar
+                    ESCRITURA.error = e
+                pantalla.invalidar()
+            # Se guardó algo mientras se leía: se vuelve a leer en vez de
+            # seguir con la copia local y los documentos que ya no están al día
+            carga = CargaEnSegundoPlano.reintentar() if vieja else None
+        if ESCRITURA.error:
+            en_linea = False
+        if not en_linea and not carga and time.monotonic() - ultimo_intento >= REINTENTO_CONEXION:
+            ultimo_intento = time.monotonic()
+            carga = CargaEnSegundoPlano()
+            carga.start()
+        # Menú y horarios se componen como un cuadro y se envían en una sola escritura
+        with tramo("dibujar_cuadro"), pantalla.capturar():
+            mostrar_menu()
+            mostrar_horarios(sala_actual, reservas, semana_actual)
+            if not en_linea:
+                print(f"{COLOR_ERROR}Sin conexión: {ESCRITURA.en_cola()} operaciones en cola "
+                      f"(se reintenta cada {REINTENTO_CONEXION} s){COLOR_RESET}")
+        # Precalcular las semanas vecinas mientras se espera la opción
+        precargador.solicitar(reservas, sala_actual, [fechas_semana(semana_actual + 1), fechas_semana(semana_actual - 1)])
         
-        opcion = input("\nOpción (S/R/U/M/E/V/Q): ").lower()
+        opcion = input("\nOpción (S/R/U/M/E/V/</>/F/T/C/X/Q): ").lower()
         
         if opcion == 'q':
+            try:
+                guardar_pendiente(reservas)
+            except Exception as e:
+                print(f"{COLOR_ERROR}No se pudo guardar en Firestore: {e}{COLOR_RESET}")
+            if ESCRITURA.en_cola():
+                print(f"{COLOR_ERROR}{ESCRITURA.en_cola()} operaciones quedan en cola; "
+                      f"se enviarán en la próxima sesión con conexión.{COLOR_RESET}")
+            print(costos_firestore.resumen())
             print("¡Hasta luego!")
             break
         elif opcion == 's':
@@ -452,11 +1004,27 @@ def main():
             indice_actual = SALAS.index(sala_actual)
             nuevo_indice = (indice_actual + 1) % len(SALAS)  # Circular: si es la última, vuelve a la primera
             sala_actual = SALAS[nuevo_indice]
+            continue  # Nada más se imprimió: el próximo cuadro solo redibuja las celdas que cambian
+        elif opcion in ('>', '.'):
+            semana_actual += 1
+            continue
+        elif opcion in ('<', ','):
+            semana_actual -= 1
+            continue
+        elif opcion == 'f':
+            semana = seleccionar_semana()
+            if semana is not None:
+                semana_actual = semana
+            else:
+                input("\nPresione Enter para continuar...")
+        elif opcion == 't':
+            mostrar_tablero(reservas)
+        elif opcion == 'c':
+            ver_mapa(reservas, SALAS, HORAS)
         elif opcion == 'r':
-            reservar_horario(reservas, sala_actual)
+            reservar_horario(reservas, sala_actual, semana_actual)
         elif opcion == 'u':
             mostrar_por_usuario(reservas)
-            input("\nPresione Enter para continuar...")
         elif opcion == 'm':
             modificar_reserva(reservas)
             input("\nPresione Enter para continuar...")
@@ -465,10 +1033,15 @@ def main():
             input("\nPresione Enter para continuar...")
         elif opcion == 'v':
             mostrar_resumen(reservas)
-            input("\nPresione Enter para continuar...")
+            exportar_analisis()
+        elif opcion == 'x':
+            gestionar_cierres(reservas)
         else:
             print(f"{COLOR_ERROR}Opción no válida.{COLOR_RESET}")
             input("\nPresione Enter para continuar...")
+        
+        # La opción escribió en la terminal: el próximo cuadro se dibuja completo
+        pantalla.invalidar()
 
 if __name__ == "__main__":
     main()
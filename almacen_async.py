@@ -0,0 +1,112 @@
+# Acceso asíncrono a Firestore (AsyncClient)
+#
+# Con el cliente síncrono cada consulta y cada batch esperan su ida y vuelta
+# antes de empezar la siguiente. AlmacenAsync hace lo mismo con corrutinas y
+# lanza a la vez todo lo que no depende entre sí (las particiones de una
+# lectura, las colecciones de una carga, los batches de un guardado grande)
+# con asyncio.gather, con a lo sumo `concurrencia` RPC en vuelo.
+#
+# Las corrutinas se pueden usar directamente desde un servidor asíncrono. El
+# menú de consola no tiene bucle propio: BucleEnSegundoPlano corre uno en un
+# hilo y ejecutar() espera el resultado desde el hilo que llama.
+#
+# RESERVAS_CONCURRENCIA fija el máximo de RPC simultáneas.
+import asyncio
+import os
+import threading
+
+from carga_particionada import PARTICIONES_POR_TRABAJADOR, rangos_de_fechas
+
+CONCURRENCIA = int(os.environ.get("RESERVAS_CONCURRENCIA", "16"))
+LIMITE_BATCH = 500  # Máximo de operaciones por batch en Firestore
+
+
+class AlmacenAsync:
+    def __init__(self, cliente, concurrencia=CONCURRENCIA):
+        self.cliente = cliente
+        self.concurrencia = concurrencia
+        self._semaforo = asyncio.Semaphore(concurrencia)
+
+    async def _acotado(self, corrutina):
+        async with self._semaforo:
+            return await corrutina
+
+    async def _leer(self, consulta):
+        async with self._semaforo:
+            return [doc async for doc in consulta.stream()]
+
+    # Todos los documentos de una colección y las lecturas que factura
+    # Firestore. Con `campo` (fecha ISO) se lee por rangos de días, a la vez.
+    async def leer(self, coleccion, campo=None, particiones=1):
+        referencia = self.cliente.collection(coleccion)
+        if campo is None or particiones <= 1:
+            documentos = await self._leer(referencia)
+            return documentos, max(1, len(documentos))
+        primero, ultimo = await asyncio.gather(
+            self._leer(referencia.order_by(campo).limit(1)),
+            self._leer(referencia.order_by(campo, direction="DESCENDING").limit(1)))
+        if not primero:
+            return [], 2
+        try:
+            rangos = rangos_de_fechas(primero[0].get(campo), ultimo[0].get(campo),
+                                      particiones * PARTICIONES_POR_TRABAJADOR)
+        except (TypeError, ValueError):  # El campo no es una fecha ISO: una sola consulta
+            documentos = await self._leer(referencia)
+            return documentos, 2 + max(1, len(documentos))
+        partes = await asyncio.gather(*(self._leer(referencia.where(campo, ">=", inicio).where(campo, "<", fin))
+                                        for inicio, fin in rangos))
+        return [doc for parte in partes for doc in parte], 2 + sum(max(1, len(parte)) for parte in partes)
+
+    # Varias lecturas a la vez: leer_varias(("reservas", "fecha", 8), ("lista_espera",))
+    async def leer_varias(self, *pedidos):
+        return await asyncio.gather(*(self.leer(*pedido) for pedido in pedidos))
+
+    # Aplicar operaciones ("set", colección, id, datos) / ("delete", colección,
+    # id, None) en batches de LIMITE_BATCH enviados a la vez. Cada batch es
+    # atómico; entre batches no hay orden garantizado.
+    async def confirmar(self, operaciones):
+        batches = []
+        for inicio in range(0, len(operaciones), LIMITE_BATCH):
+            batch = self.cliente.batch()
+            for tipo, coleccion, id_doc, datos in operaciones[inicio:inicio + LIMITE_BATCH]:
+                referencia = self.cliente.collection(coleccion).document(id_doc)
+                if tipo == "delete":
+                    batch.delete(referencia)
+                else:
+                    batch.set(referencia, datos)
+            batches.append(batch)
+        await asyncio.gather(*(self._acotado(batch.commit()) for batch in batches))
+        return len(batches)
+
+
+# Bucle de asyncio en un hilo propio, para usar AlmacenAsync desde código
+# síncrono
+class BucleEnSegundoPlano(threading.Thread):
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.bucle = asyncio.new_event_loop()
+        self._listo = threading.Event()
+
+    def run(self):
+        asyncio.set_event_loop(self.bucle)
+        self.bucle.call_soon(self._listo.set)
+        self.bucle.run_forever()
+
+    def iniciar(self):
+        self.start()
+        self._listo.wait()
+        return self
+
+    # Ejecutar una corrutina en el bucle y esperar su resultado (o su excepción)
+    def ejecutar(self, corrutina, espera=None):
+        return asyncio.run_coroutine_threadsafe(corrutina, self.bucle).result(espera)
+
+    # Crear un objeto dentro del hilo del bucle (el AsyncClient real toma el
+    # bucle en el que se crea)
+    def crear(self, fabrica):
+        async def crear():
+            return fabrica()
+        return self.ejecutar(crear())
+
+    def detener(self):
+        self.bucle.call_soon_threadsafe(self.bucle.stop)
@@ -0,0 +1,193 @@
+# Ocupación de las salas por hora, día de la semana, mes y usuario
+#
+# Los contadores se arman en una sola pasada sobre las reservas (construir)
+# y después se mantienen al día con cambios.py, así que las consultas no
+# recorren las reservas: la ocupación es horas reservadas / horas hábiles del
+# período (lunes a viernes entre la primera y la última fecha con reservas;
+# entre reconstrucciones el período solo se amplía).
+# exportar() escribe todas las filas en CSV o JSON según la extensión.
+import calendar
+import csv
+import json
+from collections import Counter
+from datetime import date, timedelta
+
+from cambios import suscribir
+
+DIAS = ["Lu", "Ma", "Mi", "Ju", "Vi", "Sa", "Do"]
+DIMENSIONES = ["hora", "dia", "mes", "usuario"]
+CAMPOS = ["sala", "dimension", "clave", "horas", "capacidad", "ocupacion"]
+
+
+# Días de lunes a viernes en [desde, hasta], sin recorrerlos
+def dias_habiles(desde, hasta):
+    dias = (hasta - desde).days + 1
+    if dias <= 0:
+        return 0
+    semanas, resto = divmod(dias, 7)
+    return semanas * 5 + sum((desde.weekday() + i) % 7 < 5 for i in range(resto))
+
+
+# Cuántas veces cae el día de la semana `dia` (0 = lunes) en [desde, hasta]
+def veces_dia(desde, hasta, dia):
+    dias = (hasta - desde).days + 1
+    if dias <= 0:
+        return 0
+    semanas, resto = divmod(dias, 7)
+    return semanas + ((dia - desde.weekday()) % 7 < resto)
+
+
+class Analitica:
+    def __init__(self):
+        self.horas = []
+        self.listo = False
+        self._limpiar()
+
+    def _limpiar(self):
+        self.total = Counter()       # sala -> horas reservadas
+        self.por_hora = Counter()    # (sala, hora)
+        self.por_dia = Counter()     # (sala, 0-6)
+        self.por_mes = Counter()     # (sala, "AAAA-MM")
+        self.por_usuario = Counter() # (sala, usuario)
+        self.desde = self.hasta = None
+        self._ranking = {}  # sala -> usuarios ordenados (se descarta al cambiar)
+
+    # Construir los contadores recorriendo las reservas una sola vez
+    def construir(self, reservas, salas, horas):
+        self._limpiar()
+        self.horas = list(horas)
+        filas = [(sala, fecha, hora, usuario)
+                 for sala in salas
+                 for fecha, horas_dia in reservas.get(sala, {}).items()
+                 for hora, usuario in horas_dia.items()]
+        dias = {fecha: date.fromisoformat(fecha) for fecha in {fila[1] for fila in filas}}
+        self.total.update(sala for sala, _, _, _ in filas)
+        self.por_hora.update((sala, hora) for sala, _, hora, _ in filas)
+        self.por_dia.update((sala, dias[fecha].weekday()) for sala, fecha, _, _ in filas)
+        self.por_mes.update((sala, fecha[:7]) for sala, fecha, _, _ in filas)
+        self.por_usuario.update((sala, usuario) for sala, _, _, usuario in filas)
+        if dias:
+            self.desde, self.hasta = min(dias.values()), max(dias.values())
+        self.listo = True
+
+    def asegurar(self, reservas, salas, horas):
+        if not self.listo:
+            self.construir(reservas, salas, horas)
+
+    # Suscriptor de cambios.py
+    def actualizar(self, sala, fecha, hora, anterior, nuevo):
+        if sala is None:
+            self.listo = False  # Recarga completa: hay que reconstruir
+            return
+        if not self.listo:
+            return
+        if anterior is not None:
+            self._sumar(sala, fecha, hora, anterior, -1)
+        if nuevo is not None:
+            self._sumar(sala, fecha, hora, nuevo, 1)
+
+    def _sumar(self, sala, fecha, hora, usuario, delta):
+        dia = date.fromisoformat(fecha)
+        for contador, clave in ((self.total, sala), (self.por_hora, (sala, hora)),
+                                (self.por_dia, (sala, dia.weekday())), (self.por_mes, (sala, fecha[:7])),
+                                (self.por_usuario, (sala, usuario))):
+            contador[clave] += delta
+            if contador[clave] <= 0:
+                del contador[clave]
+        if delta > 0:
+            self.desde = min(self.desde or dia, dia)
+            self.hasta = max(self.hasta or dia, dia)
+        self._ranking.pop(sala, None)
+
+    # Horas hábiles de una sala en el período (o en una parte de él)
+    def capacidad(self, desde=None, hasta=None):
+        if self.desde is None:
+            return 0
+        desde = max(desde or self.desde, self.desde)
+        hasta = min(hasta or self.hasta, self.hasta)
+        return dias_habiles(desde, hasta) * len(self.horas)
+
+    def ocupacion(self, sala):
+        capacidad = self.capacidad()
+        return self.total[sala] / capacidad if capacidad else 0.0
+
+    # Filas (clave, horas, capacidad, ocupación) de una dimensión; para
+    # "usuario" la capacidad es el total de horas reservadas de la sala
+    def por(self, sala, dimension):
+        if dimension == "hora":
+            capacidad = self.capacidad() // len(self.horas) if self.horas else 0
+            filas = [(hora, self.por_hora[(sala, hora)], capacidad) for hora in self.horas]
+        elif dimension == "dia":
+            filas = [(DIAS[dia], self.por_dia[(sala, dia)],
+                      veces_dia(self.desde, self.hasta, dia) * len(self.horas) if self.desde else 0)
+                     for dia in range(5)]
+        elif dimension == "mes":
+            filas = []
+            for (nombre, mes), horas in sorted(self.por_mes.items()):
+                if nombre != sala:
+                    continue
+                anio, numero = map(int, mes.split("-"))
+                primero = date(anio, numero, 1)
+                ultimo = primero + timedelta(days=calendar.monthrange(anio, numero)[1] - 1)
+                filas.append((mes, horas, self.capacidad(primero, ultimo)))
+        elif dimension == "usuario":
+            filas = [(usuario, horas, self.total[sala]) for usuario, horas in self.usuarios_principales(sala)]
+        else:
+            raise ValueError(f"Dimensión desconocida: {dimension}")
+        return [(clave, horas, capacidad, round(horas / capacidad, 4) if capacidad else 0.0)
+                for clave, horas, capacidad in filas]
+
+    def hora_pico(self, sala):
+        if not self.horas:
+            return None
+        return max(self.horas, key=lambda hora: self.por_hora[(sala, hora)])
+
+    # Usuarios de la sala de más a menos horas (el orden se guarda hasta el
+    # próximo cambio en esa sala)
+    def usuarios_principales(self, sala, cantidad=None):
+        if sala not in self._ranking:
+            self._ranking[sala] = sorted(((usuario, horas) for (nombre, usuario), horas in self.por_usuario.items()
+                                          if nombre == sala), key=lambda par: (-par[1], par[0]))
+        return self._ranking[sala][:cantidad]
+
+    def filas(self, salas):
+        return [dict(zip(CAMPOS, (sala, dimension) + fila))
+                for sala in salas for dimension in DIMENSIONES for fila in self.por(sala, dimension)]
+
+    # Escribir todas las filas en `ruta` (.csv o .json)
+    def exportar(self, ruta, salas):
+        filas = self.filas(salas)
+        if ruta.lower().endswith(".json"):
+            with open(ruta, "w", encoding="utf-8") as f:
+                json.dump({"desde": self.desde and self.desde.isoformat(),
+                           "hasta": self.hasta and self.hasta.isoformat(),
+                           "filas": filas}, f, ensure_ascii=False, indent=2)
+        elif ruta.lower().endswith(".csv"):
+            with open(ruta, "w", encoding="utf-8", newline="") as f:
+                escritor = csv.DictWriter(f, fieldnames=CAMPOS)
+                escritor.writeheader()
+                escritor.writerows(filas)
+        else:
+            raise ValueError("El archivo debe terminar en .csv o .json")
+        return len(filas)
+
+    # Texto breve por sala para el resumen
+    def resumen(self, salas):
+        if self.desde is None:
+            return "Sin reservas para analizar."
+        lineas = [f"Período {self.desde.isoformat()} a {self.hasta.isoformat()}"]
+        for sala in salas:
+            pico = self.hora_pico(sala)
+            principales = ", ".join(f"{usuario} {horas} h ({horas / self.total[sala]:.0%})"
+                                    for usuario, horas in self.usuarios_principales(sala, 3))
+            lineas.append(f"\n{sala}: ocupación {self.ocupacion(sala):.0%}, hora pico {pico}")
+            lineas.append("  Por hora: " + "  ".join(f"{hora} {ocupacion:.0%}"
+                                                     for hora, _, _, ocupacion in self.por(sala, "hora")))
+            lineas.append("  Por día:  " + "  ".join(f"{dia} {ocupacion:.0%}"
+                                                     for dia, _, _, ocupacion in self.por(sala, "dia")))
+            lineas.append(f"  Usuarios: {principales or '-'}")
+        return "\n".join(lineas)
+
+
+ANALITICA = Analitica()
+suscribir(ANALITICA.actualizar)
@@ -0,0 +1,29 @@
+# Benchmarks del sistema de reservas.
+#
+#   python -m benchmarks.generador --salas 20 --usuarios 500 --anios 3 -o datos.json
+#   python -m benchmarks.ejecutar --salas 20 --usuarios 500 --anios 3 -o resultados.json
+#   python -m benchmarks.memoria --salas 20 --usuarios 500 --anios 3
+import importlib.util
+import os
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+
+# Importar uno de los scripts del repositorio (tienen guiones en el nombre)
+def cargar_script(archivo, nombre=None):
+    ruta = os.path.join(RAIZ, archivo)
+    nombre = nombre or os.path.splitext(archivo)[0].replace("-", "_").lower()
+    if nombre in sys.modules:
+        return sys.modules[nombre]
+    spec = importlib.util.spec_from_file_location(nombre, ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules[nombre] = modulo
+    try:
+        spec.loader.exec_module(modulo)
+    except BaseException:
+        del sys.modules[nombre]
+        raise
+    return modulo
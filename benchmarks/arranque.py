@@ -0,0 +1,115 @@
+# Tiempo de arranque hasta el primer cuadro
+#
+# Lanza cada script como proceso nuevo (intérprete frío) en un directorio
+# temporal con datos generados y mide cuánto tarda en aparecer el menú en la
+# salida. Reservas-v6-2.py corre contra el Firestore en memoria con la copia
+# local ya escrita, que es el caso normal después de la primera sesión.
+# Reservas-v6-1-ssh-github.py arranca con la instantánea binaria de
+# reservas6.json al día (instantanea.py), salvo con --sin-instantanea; con
+# ella el primer cuadro no debería crecer con --anios.
+#
+#   python -m benchmarks.arranque --repeticiones 10 --latencia-ms 200
+#   python -m benchmarks.arranque --anios 10 --sin-instantanea
+import argparse
+import json
+import os
+import selectors
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import RAIZ
+from benchmarks.ejecutar import percentil
+from benchmarks.generador import HORAS, a_formato_lista, contar, generar
+from instantanea import escribir
+
+PRESUPUESTO_MS = 100
+MARCAS = {
+    "Reservas-v6-1-ssh-github.py": b"SISTEMA DE RESERVAS",
+    "Reservas-v6-2.py": b"SISTEMA DE RESERVAS",
+    "reservas.py": b"SISTEMA DE RESERVA DE SALAS",
+}
+
+
+def preparar(directorio, reservas):
+    with open(os.path.join(directorio, "reservas6.json"), "w") as f:
+        json.dump(reservas, f)
+    escribir(reservas, os.path.join(directorio, "reservas6.bin"), HORAS,
+             origen=os.path.join(directorio, "reservas6.json"))
+    with open(os.path.join(directorio, "reservas.json"), "w", encoding="utf-8") as f:
+        json.dump(a_formato_lista(reservas), f, ensure_ascii=False)
+    with open(os.path.join(directorio, "reservas_cache.json"), "w") as f:
+        json.dump({"reservas": reservas, "documentos": [], "espera": {}}, f)
+    with open(os.path.join(directorio, "datos_falsos.json"), "w") as f:
+        json.dump(reservas, f)
+
+
+# Milisegundos hasta que `marca` aparece en la salida, o None si el proceso
+# termina (o se pasa del límite) sin mostrarla
+def primer_cuadro(script, marca, directorio, entorno, limite=10):
+    inicio = time.perf_counter()
+    proceso = subprocess.Popen([sys.executable, os.path.join(RAIZ, script)], cwd=directorio, env=entorno,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    leido = b""
+    try:
+        with selectors.DefaultSelector() as selector:
+            selector.register(proceso.stdout, selectors.EVENT_READ)
+            while time.perf_counter() - inicio < limite:
+                if not selector.select(timeout=limite):
+                    break
+                bloque = os.read(proceso.stdout.fileno(), 65536)
+                if not bloque:
+                    break
+                leido += bloque
+                if marca in leido:
+                    return (time.perf_counter() - inicio) * 1000
+        return None
+    finally:
+        proceso.kill()
+        proceso.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo hasta el primer cuadro de cada script")
+    parser.add_argument("--salas", type=int, default=2)
+    parser.add_argument("--usuarios", type=int, default=50)
+    parser.add_argument("--anios", type=int, default=1)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--latencia-ms", type=float, default=100,
+                        help="Latencia por RPC del Firestore en memoria")
+    parser.add_argument("--sin-instantanea", action="store_true",
+                        help="Que Reservas-v6-1 lea reservas6.json antes del primer cuadro")
+    args = parser.parse_args()
+
+    reservas = generar(args.salas, args.usuarios, args.anios)
+    resultados = []
+    with tempfile.TemporaryDirectory() as directorio:
+        preparar(directorio, reservas)
+        entorno = dict(os.environ, PYTHONPATH=RAIZ, RESERVAS_FIRESTORE="falso",
+                       RESERVAS_LATENCIA_MS=str(args.latencia_ms),
+                       RESERVAS_DATOS_FALSOS=os.path.join(directorio, "datos_falsos.json"))
+        if args.sin_instantanea:
+            entorno["RESERVAS_INSTANTANEA"] = ""
+        for script, marca in MARCAS.items():
+            tiempos = [primer_cuadro(script, marca, directorio, entorno) for _ in range(args.repeticiones)]
+            if None in tiempos:
+                resultados.append({"script": script, "omitido": "no llegó al primer cuadro"})
+                continue
+            p50 = percentil(tiempos, 0.50)
+            resultados.append({
+                "script": script,
+                "p50_ms": round(p50, 1),
+                "max_ms": round(max(tiempos), 1),
+                "dentro_del_presupuesto": p50 <= PRESUPUESTO_MS,
+            })
+            print(f"{script:30} p50 {p50:8.1f} ms", file=sys.stderr)
+
+    print(json.dumps({
+        "parametros": dict(vars(args), horas_reservadas=contar(reservas), presupuesto_ms=PRESUPUESTO_MS),
+        "resultados": resultados,
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
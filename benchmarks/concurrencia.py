@@ -0,0 +1,346 @@
+# Prueba de carga concurrente: muchos clientes reservando el mismo horario
+#
+# Cada cliente simulado (un hilo) hace lo mismo que el programa: leer todas
+# las reservas, ver si el horario está libre, agregar la suya y guardar. Los
+# clientes arrancan juntos (barrera) contra uno de los almacenamientos:
+#   - json: reservas6.json con cargar_datos/guardar_datos de Reservas-v6-1
+#   - git: un clon por cliente y un remoto bare local (pull, commit, push)
+#   - firestore_borrar: Firestore en memoria, guardado original (borrar todo
+#     y volver a agregar)
+#   - firestore_diferencias: Firestore en memoria, guardado de Reservas-v6-2
+#     (solo el documento nuevo)
+#   - firestore_transaccion: referencia de cómo debería hacerse (un documento
+#     por horario, leído y escrito dentro de una transacción)
+#
+# Al final se relee el almacenamiento y se informa, por backend:
+#   - confirmadas: clientes a los que se les dijo que la reserva quedó hecha
+#   - perdidas: confirmadas que no están en el estado final (lost updates)
+#   - dobles: confirmaciones de más para un mismo horario (double-booking)
+#   - duplicados: documentos de más guardados para un mismo horario
+#   - preexistentes_perdidas: reservas anteriores que desaparecieron
+#   - almacenamiento_corrupto: el estado final no se pudo leer
+#
+#   python -m benchmarks.concurrencia --clientes 50 --horarios 1
+#   python -m benchmarks.concurrencia --backends json,git --clientes 20 -o carga.json
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+
+from benchmarks import cargar_script
+from benchmarks.ejecutar import percentil
+from benchmarks.estrategias_firestore import guardar_borrar_y_recrear
+from benchmarks.generador import contar, generar
+import firestore_falso
+
+BACKENDS = {}
+BACKENDS_EXTRA = {}  # Datos que algunos backends cuentan durante la corrida
+
+
+# Registrar un backend. La función recibe (directorio, reservas iniciales,
+# args) y devuelve (reservar, leer_final):
+#   reservar(cliente, sala, fecha, hora, usuario) -> True si se confirmó
+#   leer_final() -> lista de (sala, fecha, hora, usuario) guardados
+def backend(nombre):
+    def registrar(funcion):
+        BACKENDS[nombre] = funcion
+        return funcion
+    return registrar
+
+
+def aplanar(reservas):
+    return [(sala, fecha, hora, usuario)
+            for sala, fechas in reservas.items() if not sala.startswith("_")
+            for fecha, horas in fechas.items()
+            for hora, usuario in horas.items()]
+
+
+def esta_libre(reservas, sala, fecha, hora):
+    return hora not in reservas.get(sala, {}).get(fecha, {})
+
+
+def agregar(reservas, sala, fecha, hora, usuario):
+    reservas.setdefault(sala, {}).setdefault(fecha, {})[hora] = usuario
+
+
+@backend("json")
+def _json(directorio, iniciales, args):
+    v6 = cargar_script("Reservas-v6-1-ssh-github.py")
+    with open(os.path.join(directorio, v6.ARCHIVO_DATOS), "w") as f:
+        json.dump(iniciales, f)
+
+    def reservar(cliente, sala, fecha, hora, usuario):
+        reservas = v6.cargar_datos()
+        if not esta_libre(reservas, sala, fecha, hora):
+            return False
+        agregar(reservas, sala, fecha, hora, usuario)
+        v6.guardar_datos(reservas)
+        return True
+
+    def leer_final():
+        with open(os.path.join(directorio, v6.ARCHIVO_DATOS)) as f:
+            return aplanar(json.load(f))
+    return reservar, leer_final
+
+
+def git(carpeta, *argumentos):
+    return subprocess.run(["git", "-c", "user.name=carga", "-c", "user.email=carga@localhost",
+                           "-c", "init.defaultBranch=main", *argumentos],
+                          cwd=carpeta, capture_output=True, text=True)
+
+
+@backend("git")
+def _git(directorio, iniciales, args):
+    archivo = "reservas6.json"
+    remoto = os.path.join(directorio, "remoto.git")
+    git(directorio, "init", "-q", "--bare", remoto)
+    semilla = os.path.join(directorio, "semilla")
+    git(directorio, "clone", "-q", remoto, semilla)
+    with open(os.path.join(semilla, archivo), "w") as f:
+        json.dump(iniciales, f, indent=2)
+    git(semilla, "add", archivo)
+    git(semilla, "commit", "-q", "-m", "Reservas iniciales")
+    git(semilla, "push", "-q", "origin", "HEAD:main")
+    clones = []
+    for cliente in range(args.clientes):
+        clon = os.path.join(directorio, f"cliente{cliente}")
+        git(directorio, "clone", "-q", remoto, clon)
+        clones.append(clon)
+    rechazos = BACKENDS_EXTRA.setdefault("git", {"rechazos_push": 0, "conflictos_pull": 0})
+    candado = threading.Lock()
+
+    # Como lo hacía originalmente Reservas-v6-1: pull, reservar y add/commit/push,
+    # sin mirar si el push fue rechazado
+    def reservar(cliente, sala, fecha, hora, usuario):
+        clon = clones[cliente]
+        if git(clon, "pull", "-q", "origin", "main").returncode != 0:
+            with candado:
+                rechazos["conflictos_pull"] += 1
+        try:
+            with open(os.path.join(clon, archivo)) as f:
+                reservas = json.load(f)
+        except ValueError:  # Quedaron marcas de conflicto en el archivo
+            return False
+        if not esta_libre(reservas, sala, fecha, hora):
+            return False
+        agregar(reservas, sala, fecha, hora, usuario)
+        with open(os.path.join(clon, archivo), "w") as f:
+            json.dump(reservas, f, indent=2)
+        git(clon, "add", archivo)
+        git(clon, "commit", "-q", "-m", "Actualización de reservas6.json")
+        if git(clon, "push", "-q", "origin", "HEAD:main").returncode != 0:
+            with candado:
+                rechazos["rechazos_push"] += 1
+        return True
+
+    def leer_final():
+        resultado = git(directorio, "--git-dir", remoto, "show", f"main:{archivo}")
+        return aplanar(json.loads(resultado.stdout))
+    return reservar, leer_final
+
+
+def cliente_firestore(iniciales, args):
+    db = firestore_falso.ClienteFalso(latencia=args.latencia_ms / 1000)
+    firestore_falso.cargar_reservas(db, iniciales)
+    return db
+
+
+def leer_firestore(db):
+    reservas = {}
+    for doc in db.collection("reservas").stream():
+        datos = doc.to_dict()
+        agregar(reservas, datos["sala"], datos["fecha"], datos["hora"], datos["usuario"])
+    return reservas
+
+
+def documentos_firestore(db):
+    return lambda: [(d["sala"], d["fecha"], d["hora"], d["usuario"])
+                    for d in (doc.to_dict() for doc in db.collection("reservas").stream())]
+
+
+@backend("firestore_borrar")
+def _firestore_borrar(directorio, iniciales, args):
+    db = cliente_firestore(iniciales, args)
+
+    def reservar(cliente, sala, fecha, hora, usuario):
+        reservas = leer_firestore(db)
+        if not esta_libre(reservas, sala, fecha, hora):
+            return False
+        agregar(reservas, sala, fecha, hora, usuario)
+        guardar_borrar_y_recrear(db, reservas)
+        return True
+    return reservar, documentos_firestore(db)
+
+
+# Reservas-v6-2 guarda diferencias con los ids que conoce en variables del
+# módulo, así que no se puede compartir entre hilos; para una reserva nueva
+# su guardar_datos se reduce a leer todo y escribir un documento en un batch.
+@backend("firestore_diferencias")
+def _firestore_diferencias(directorio, iniciales, args):
+    db = cliente_firestore(iniciales, args)
+
+    def reservar(cliente, sala, fecha, hora, usuario):
+        reservas = leer_firestore(db)
+        if not esta_libre(reservas, sala, fecha, hora):
+            return False
+        batch = db.batch()
+        batch.set(db.collection("reservas").document(),
+                  {"sala": sala, "fecha": fecha, "hora": hora, "usuario": usuario})
+        batch.commit()
+        return True
+    return reservar, documentos_firestore(db)
+
+
+@backend("firestore_transaccion")
+def _firestore_transaccion(directorio, iniciales, args):
+    db = cliente_firestore(iniciales, args)
+
+    def reservar_en(transaccion, sala, fecha, hora, usuario):
+        referencia = db.collection("reservas").document(f"{sala}|{fecha}|{hora}")
+        if referencia.get(transaction=transaccion).exists:
+            return False
+        transaccion.set(referencia, {"sala": sala, "fecha": fecha, "hora": hora, "usuario": usuario})
+        return True
+
+    def reservar(cliente, sala, fecha, hora, usuario):
+        funcion = firestore_falso.transaccional(reservar_en, intentos=args.clientes + 1)
+        return funcion(db.transaction(), sala, fecha, hora, usuario)
+    return reservar, documentos_firestore(db)
+
+
+# Horarios en disputa: el lunes de la semana que viene desde las 09:00,
+# recorriendo salas y horas
+def horarios_en_disputa(salas, cantidad, horas):
+    hoy = date.today()
+    lunes = (hoy + timedelta(days=7 - hoy.weekday())).isoformat()
+    return [(sala, lunes, hora) for hora in horas[1:] + horas[:1] for sala in salas][:cantidad]
+
+
+def correr(nombre, args):
+    iniciales = generar(args.salas, args.usuarios, args.anios, args.semilla)
+    salas = list(iniciales)
+    horarios = horarios_en_disputa(salas, args.horarios, cargar_script("Reservas-v6-1-ssh-github.py").HORAS)
+    for sala, fecha, hora in horarios:
+        iniciales.get(sala, {}).get(fecha, {}).pop(hora, None)
+    anteriores = set(aplanar(iniciales))
+
+    original = os.getcwd()
+    with tempfile.TemporaryDirectory() as directorio:
+        os.chdir(directorio)  # Las funciones de los scripts usan rutas relativas
+        try:
+            reservar, leer_final = BACKENDS[nombre](directorio, iniciales, args)
+            barrera = threading.Barrier(args.clientes)
+            resultados = [None] * args.clientes
+
+            def cliente(numero):
+                sala, fecha, hora = horarios[numero % len(horarios)]
+                usuario = f"cliente-{numero}"
+                barrera.wait()
+                inicio = time.perf_counter_ns()
+                try:
+                    confirmada = reservar(numero, sala, fecha, hora, usuario)
+                    error = None
+                except Exception as excepcion:
+                    confirmada = False
+                    error = f"{type(excepcion).__name__}: {excepcion}"
+                resultados[numero] = ((sala, fecha, hora), usuario, confirmada, error,
+                                      time.perf_counter_ns() - inicio)
+
+            hilos = [threading.Thread(target=cliente, args=(numero,)) for numero in range(args.clientes)]
+            # Los mensajes de los scripts se descartan (redirect_stdout es de
+            # todo el proceso, así que se hace una vez y no en cada hilo)
+            with redirect_stdout(io.StringIO()):
+                inicio = time.perf_counter()
+                for hilo in hilos:
+                    hilo.start()
+                for hilo in hilos:
+                    hilo.join()
+                segundos = time.perf_counter() - inicio
+            try:
+                final = leer_final()
+                corrupto = False
+            except ValueError:  # Dos escrituras se mezclaron y el archivo quedó ilegible
+                final = []
+                corrupto = True
+        finally:
+            os.chdir(original)
+
+    guardados = {}
+    for sala, fecha, hora, usuario in final:
+        guardados.setdefault((sala, fecha, hora), []).append(usuario)
+    confirmadas = [(horario, usuario) for horario, usuario, confirmada, _, _ in resultados if confirmada]
+    por_horario = {}
+    for horario, usuario in confirmadas:
+        por_horario[horario] = por_horario.get(horario, 0) + 1
+    errores = [error for *_, error, _ in resultados if error]
+    tiempos = [duracion for *_, duracion in resultados]
+    presentes = set(final)
+
+    return {
+        "backend": nombre,
+        "clientes": args.clientes,
+        "horarios": len(horarios),
+        "segundos": round(segundos, 4),
+        "ops_por_seg": round(args.clientes / segundos, 2) if segundos else None,
+        "p50_ms": round(percentil(tiempos, 0.50) / 1e6, 3),
+        "p95_ms": round(percentil(tiempos, 0.95) / 1e6, 3),
+        "p99_ms": round(percentil(tiempos, 0.99) / 1e6, 3),
+        "confirmadas": len(confirmadas),
+        "rechazadas": args.clientes - len(confirmadas) - len(errores),
+        "errores": len(errores),
+        "perdidas": sum(1 for horario, usuario in confirmadas if usuario not in guardados.get(horario, [])),
+        "dobles": sum(cantidad - 1 for cantidad in por_horario.values() if cantidad > 1),
+        "duplicados": sum(len(usuarios) - 1 for usuarios in guardados.values() if len(usuarios) > 1),
+        "preexistentes_perdidas": len(anteriores - presentes),
+        "almacenamiento_corrupto": corrupto,
+        **BACKENDS_EXTRA.pop(nombre, {}),
+        "ejemplos_error": sorted(set(errores))[:3],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga concurrente de reservas")
+    parser.add_argument("--backends", default=",".join(BACKENDS),
+                        help=f"Separados por coma (disponibles: {', '.join(BACKENDS)})")
+    parser.add_argument("--clientes", type=int, default=50)
+    parser.add_argument("--horarios", type=int, default=1, help="Cantidad de horarios en disputa")
+    parser.add_argument("--salas", type=int, default=2)
+    parser.add_argument("--usuarios", type=int, default=20)
+    parser.add_argument("--anios", type=int, default=1)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--latencia-ms", type=float, default=1, help="Latencia por RPC del Firestore en memoria")
+    parser.add_argument("-o", "--salida", help="Archivo JSON del informe (por defecto, stdout)")
+    args = parser.parse_args()
+
+    resultados = []
+    for nombre in args.backends.split(","):
+        if nombre not in BACKENDS:
+            parser.error(f"Backend desconocido: {nombre}")
+        resultado = correr(nombre, args)
+        resultados.append(resultado)
+        print(f"{nombre:22} {resultado['ops_por_seg']:>9} ops/s  p99 {resultado['p99_ms']:>10} ms  "
+              f"perdidas {resultado['perdidas']:>3}  dobles {resultado['dobles']:>3}  "
+              f"errores {resultado['errores']:>3}", file=sys.stderr)
+
+    informe = {
+        "parametros": dict(vars(args), horas_reservadas=contar(generar(args.salas, args.usuarios,
+                                                                       args.anios, args.semilla))),
+        "resultados": resultados,
+    }
+    texto = json.dumps(informe, ensure_ascii=False, indent=2)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    else:
+        print(texto)
+
+
+if __name__ == "__main__":
+    main()
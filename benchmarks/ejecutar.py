@@ -0,0 +1,343 @@
+# Benchmarks repetibles de carga, guardado, dibujo y búsquedas
+#
+# Genera un conjunto de datos con benchmarks.generador, lo escribe en un
+# directorio temporal y mide cada operación varias veces. El resultado (ops/s,
+# latencias p50/p99 y memoria pico) se imprime o se guarda como JSON para
+# poder comparar corridas y detectar regresiones (--comparar anterior.json).
+import argparse
+import builtins
+import copy
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+
+from analitica import Analitica
+from benchmarks import cargar_script
+from benchmarks.generador import a_formato_lista, contar, generar
+from cambios import asignar, suscribir
+from columnar import AlmacenColumnar
+from escritura_diferida import BufferEscritura
+from listados import IndiceReservas
+
+BENCHMARKS = []
+
+
+# Registrar un benchmark. La función recibe el contexto y devuelve la
+# operación a medir (sin argumentos), o None si no aplica en este entorno.
+def benchmark(nombre):
+    def registrar(funcion):
+        BENCHMARKS.append((nombre, funcion))
+        return funcion
+    return registrar
+
+
+def percentil(valores, fraccion):
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, int(round(fraccion * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+def medir(operacion, repeticiones, calentamiento=1):
+    salida = io.StringIO()
+    with redirect_stdout(salida):
+        for _ in range(calentamiento):
+            operacion()
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter_ns()
+            operacion()
+            tiempos.append(time.perf_counter_ns() - inicio)
+            salida.seek(0)
+            salida.truncate()
+        # Memoria pico en una corrida aparte (tracemalloc hace todo más lento)
+        tracemalloc.start()
+        operacion()
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    total = sum(tiempos) / 1e9
+    return {
+        "repeticiones": repeticiones,
+        "ops_por_seg": round(repeticiones / total, 2) if total else None,
+        "p50_ms": round(percentil(tiempos, 0.50) / 1e6, 4),
+        "p99_ms": round(percentil(tiempos, 0.99) / 1e6, 4),
+        "memoria_pico_kb": round(pico / 1024, 1),
+    }
+
+
+# Respuestas automáticas para las funciones que piden datos con input()
+class Respuestas:
+    def __init__(self, respuestas):
+        self.respuestas = respuestas
+
+    def __enter__(self):
+        self.original = builtins.input
+        siguiente = itertools.cycle(self.respuestas)
+        builtins.input = lambda *_: next(siguiente)
+        return self
+
+    def __exit__(self, *excepcion):
+        builtins.input = self.original
+
+
+@benchmark("v6.cargar_datos")
+def _cargar(ctx):
+    v6 = ctx["v6"]
+    return v6.cargar_datos
+
+
+@benchmark("v6.guardar_datos")
+def _guardar(ctx):
+    v6 = ctx["v6"]
+    return lambda: v6.guardar_datos(ctx["reservas"])
+
+
+@benchmark("v6.rafaga de cambios (escritura diferida)")
+def _rafaga(ctx):
+    v6 = ctx["v6"]
+    reservas = copy.deepcopy(ctx["reservas"])
+    escritura = BufferEscritura(v6.guardar_datos, espera=60)  # Solo se guarda al vaciar
+    escritura.vincular(reservas)
+    suscribir(escritura.registrar)
+
+    def operacion():
+        for hora in v6.HORAS:  # Una escritura para todos los cambios
+            asignar(reservas, ctx["salas"][0], "2099-01-05", hora, "rafaga")
+        escritura.vaciar()
+    return operacion
+
+
+@benchmark("v6.mostrar_horarios (sin caché)")
+def _horarios_frio(ctx):
+    v6 = ctx["v6"]
+
+    def operacion():
+        v6.recargado()  # Invalida la caché de tablas
+        for sala in ctx["salas"]:
+            v6.mostrar_horarios(sala, ctx["reservas"])
+    return operacion
+
+
+@benchmark("v6.mostrar_horarios (con caché)")
+def _horarios_caliente(ctx):
+    v6 = ctx["v6"]
+
+    def operacion():
+        for sala in ctx["salas"]:
+            v6.mostrar_horarios(sala, ctx["reservas"])
+    return operacion
+
+
+@benchmark("v6.mostrar_por_usuario")
+def _por_usuario(ctx):
+    v6 = ctx["v6"]
+    def operacion():
+        with Respuestas(["", "", "q"]):  # Sin filtros, primera página
+            v6.mostrar_por_usuario(ctx["reservas"])
+    return operacion
+
+
+# reservar_horario sobre horarios ya tomados de las próximas semanas: arma
+# las horas ocupadas y cerradas, verifica cuota y cierre, detecta el conflicto
+# y rechaza la lista de espera, sin cambiar las reservas
+@benchmark("v6.conflictos (100 reservas rechazadas)")
+def _conflictos(ctx):
+    v6, reservas = ctx["v6"], ctx["reservas"]
+    hoy = date.today().isoformat()
+    ocupados = []
+    for sala in ctx["salas"]:
+        for semana in range(4):
+            for numero, dia in enumerate(v6.DIAS_SEMANA, 1):
+                fecha = v6.dia_a_fecha(dia, semana)
+                for hora in reservas[sala].get(fecha, {}) if fecha >= hoy else ():
+                    ocupados.append((sala, semana, [str(numero), str(v6.HORAS.index(hora) + 1), "bench", "n"]))
+    if not ocupados:
+        return None
+    consultas = random.Random(7).choices(ocupados, k=100)
+
+    def operacion():
+        for sala, semana, respuestas in consultas:
+            with Respuestas(respuestas):
+                v6.reservar_horario(reservas, sala, semana)
+    return operacion
+
+
+@benchmark("v6.seleccionar_usuario")
+def _seleccionar_usuario(ctx):
+    v6 = ctx["v6"]
+
+    def operacion():
+        with Respuestas(["an", "1"]):
+            v6.seleccionar_usuario(ctx["reservas"])
+    return operacion
+
+
+@benchmark("analitica.construir (una pasada)")
+def _analitica_construir(ctx):
+    return lambda: Analitica().construir(ctx["reservas"], ctx["salas"], ctx["v6"].HORAS)
+
+
+@benchmark("analitica.consultas (1000)")
+def _analitica_consultas(ctx):
+    analitica = Analitica()
+    analitica.construir(ctx["reservas"], ctx["salas"], ctx["v6"].HORAS)
+    sala = ctx["salas"][0]
+
+    def operacion():
+        for _ in range(1000):
+            analitica.ocupacion(sala)
+            analitica.hora_pico(sala)
+            analitica.usuarios_principales(sala, 3)
+    return operacion
+
+
+@benchmark("columnar.construir (una pasada)")
+def _columnar_construir(ctx):
+    return lambda: AlmacenColumnar().construir(ctx["reservas"], ctx["salas"], ctx["v6"].HORAS)
+
+
+# Recorrer toda la historia, en orden, desde los diccionarios anidados (con
+# el índice de listados.py) y desde las columnas
+@benchmark("listados.listar (historia completa)")
+def _listar_anidado(ctx):
+    indice = IndiceReservas()
+    indice.construir(ctx["reservas"], ctx["salas"])
+    return lambda: sum(1 for _ in indice.listar(ctx["reservas"], ctx["salas"]))
+
+
+@benchmark("columnar.listar (historia completa)")
+def _listar_columnar(ctx):
+    columnas = AlmacenColumnar()
+    columnas.construir(ctx["reservas"], ctx["salas"], ctx["v6"].HORAS)
+    return lambda: sum(1 for _ in columnas.listar(salas=ctx["salas"]))
+
+
+@benchmark("columnar.cuadricula (52 semanas)")
+def _cuadricula_columnar(ctx):
+    columnas = AlmacenColumnar()
+    columnas.construir(ctx["reservas"], ctx["salas"], ctx["v6"].HORAS)
+    lunes = date.today() - timedelta(days=date.today().weekday())
+    semanas = [[(lunes - timedelta(weeks=semana, days=-dia)).isoformat() for dia in range(5)]
+               for semana in range(52)]
+
+    def operacion():
+        for fechas in semanas:
+            for sala in ctx["salas"]:
+                columnas.cuadricula(sala, fechas)
+    return operacion
+
+
+@benchmark("reservas.cargar_reservas")
+def _cargar_lista(ctx):
+    lista = ctx["lista"]
+    return lista and lista.cargar_reservas
+
+
+@benchmark("reservas.guardar_reservas")
+def _guardar_lista(ctx):
+    lista = ctx["lista"]
+    if not lista:
+        return None
+    reservas = lista.cargar_reservas()
+    return lambda: lista.guardar_reservas(reservas)
+
+
+@benchmark("reservas.obtener_horas_reservadas")
+def _conflictos_lista(ctx):
+    lista = ctx["lista"]
+    if not lista:
+        return None
+    reservas = lista.cargar_reservas()
+    return lambda: [lista.obtener_horas_reservadas(reservas, sala, dia)
+                    for sala in lista.SALAS for dia in lista.DIAS_SEMANA]
+
+
+def preparar_contexto(args, directorio):
+    reservas = generar(args.salas, args.usuarios, args.anios, args.semilla)
+    with open(os.path.join(directorio, "reservas6.json"), "w") as f:
+        json.dump(reservas, f)
+    with open(os.path.join(directorio, "reservas.json"), "w", encoding="utf-8") as f:
+        json.dump(a_formato_lista(reservas), f, ensure_ascii=False)
+
+    ctx = {"reservas": reservas, "errores": {}}
+    ctx["v6"] = cargar_script("Reservas-v6-1-ssh-github.py")
+    ctx["salas"] = [sala for sala in reservas]
+    ctx["v6"].SALAS[:] = ctx["salas"]
+    try:
+        ctx["lista"] = cargar_script("reservas.py", "reservas_lista")
+    except ImportError as error:
+        ctx["lista"] = None
+        ctx["errores"]["reservas.py"] = str(error)
+    return ctx
+
+
+def comparar(resultados, anterior):
+    previos = {r["operacion"]: r for r in anterior["resultados"]}
+    for resultado in resultados:
+        previo = previos.get(resultado["operacion"])
+        if previo and previo.get("p50_ms"):
+            cambio = (resultado["p50_ms"] - previo["p50_ms"]) / previo["p50_ms"] * 100
+            resultado["cambio_p50_pct"] = round(cambio, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del sistema de reservas")
+    parser.add_argument("--salas", type=int, default=2)
+    parser.add_argument("--usuarios", type=int, default=50)
+    parser.add_argument("--anios", type=int, default=1)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--filtro", default="", help="Solo benchmarks cuyo nombre contenga este texto")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior")
+    parser.add_argument("-o", "--salida", help="Archivo JSON de resultados (por defecto, stdout)")
+    args = parser.parse_args()
+
+    original = os.getcwd()
+    with tempfile.TemporaryDirectory() as directorio:
+        os.chdir(directorio)
+        try:
+            ctx = preparar_contexto(args, directorio)
+            resultados = []
+            for nombre, crear in BENCHMARKS:
+                if args.filtro not in nombre:
+                    continue
+                operacion = crear(ctx)
+                if not operacion:
+                    resultados.append({"operacion": nombre, "omitido": True})
+                    continue
+                resultado = {"operacion": nombre}
+                resultado.update(medir(operacion, args.repeticiones))
+                resultados.append(resultado)
+                print(f"{nombre:45} p50 {resultado['p50_ms']:>10} ms  p99 {resultado['p99_ms']:>10} ms",
+                      file=sys.stderr)
+        finally:
+            os.chdir(original)
+
+    if args.comparar:
+        with open(args.comparar) as f:
+            comparar(resultados, json.load(f))
+    informe = {
+        "parametros": {"salas": args.salas, "usuarios": args.usuarios, "anios": args.anios,
+                       "semilla": args.semilla, "horas_reservadas": contar(ctx["reservas"])},
+        "entorno": {"python": platform.python_version(), "plataforma": platform.platform()},
+        "errores": ctx["errores"],
+        "resultados": resultados,
+    }
+    texto = json.dumps(informe, ensure_ascii=False, indent=2)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    else:
+        print(texto)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# Comparación de estrategias de carga/guardado contra el Firestore en memoria
+#
+# Usa firestore_falso.ClienteFalso con latencia por RPC fija y semilla, así
+# que los resultados son deterministas y no necesitan red. Compara:
+#   - "borrar_y_recrear": la estrategia original de guardar_datos (leer toda la
+#     colección, borrarla y volver a agregar cada reserva con add())
+#   - "diferencias_batch": el guardar_datos actual de Reservas-v6-2.py
+#   - "carga_particionada (N hilos)": la colección completa leída por rangos de
+#     fechas con carga_particionada.leer_particionado; con
+#     --latencia-doc-ms el tiempo de cada stream() crece con los documentos,
+#     así que debería bajar con más hilos
+#   - "carga_async (N concurrentes)": lo mismo con almacen_async (corrutinas y
+#     asyncio.gather en vez de hilos)
+#   - "subida_completa (N concurrentes)": toda la historia a una colección
+#     vacía con almacen_async.confirmar, en batches de 500 (1 = en serie)
+#
+#   python -m benchmarks.estrategias_firestore --latencia-ms 20 --cambios 5 --trabajadores 1,2,4,8
+import argparse
+import asyncio
+import io
+import json
+import os
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+from benchmarks import cargar_script
+from almacen_async import AlmacenAsync
+from benchmarks.generador import contar, generar
+from carga_particionada import leer_particionado
+import firestore_falso
+
+
+# guardar_datos tal como estaba antes de la contabilidad de costos
+def guardar_borrar_y_recrear(db, reservas):
+    batch = db.batch()
+    for numero, doc in enumerate(db.collection("reservas").stream(), 1):
+        batch.delete(doc.reference)
+        if numero % 500 == 0:  # El original no partía el batch y fallaba con más de 500
+            batch.commit()
+            batch = db.batch()
+    batch.commit()
+    for sala, fechas in reservas.items():
+        for fecha, horas in fechas.items():
+            for hora, usuario in horas.items():
+                db.collection("reservas").add({"sala": sala, "fecha": fecha, "hora": hora, "usuario": usuario})
+
+
+def cambiar_algunas(reservas, cantidad):
+    # Simula una sesión: se liberan y reservan `cantidad` horarios
+    sala = next(iter(reservas))
+    fechas = sorted(reservas[sala])[-cantidad:]
+    for fecha in fechas:
+        horas = reservas[sala][fecha]
+        hora = next(iter(horas))
+        horas[hora] = horas[hora] + "*"
+
+
+def medir(nombre, db, operacion):
+    antes = dict(db.contadores)
+    inicio = time.perf_counter()
+    operacion()
+    segundos = time.perf_counter() - inicio
+    return {
+        "estrategia": nombre,
+        "segundos": round(segundos, 4),
+        **{clave: db.contadores[clave] - antes[clave] for clave in db.contadores},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estrategias de guardado en Firestore (simulado)")
+    parser.add_argument("--salas", type=int, default=2)
+    parser.add_argument("--usuarios", type=int, default=50)
+    parser.add_argument("--anios", type=int, default=1)
+    parser.add_argument("--latencia-ms", type=float, default=5)
+    parser.add_argument("--cambios", type=int, default=5)
+    parser.add_argument("--latencia-doc-ms", type=float, default=0.5,
+                        help="Demora por documento devuelto en un stream()")
+    parser.add_argument("--trabajadores", default="1,2,4,8")
+    args = parser.parse_args()
+
+    reservas = generar(args.salas, args.usuarios, args.anios)
+    resultados = []
+
+    db = firestore_falso.ClienteFalso(latencia=args.latencia_ms / 1000)
+    firestore_falso.cargar_reservas(db, reservas)
+    cambiar_algunas(reservas, args.cambios)
+    resultados.append(medir("borrar_y_recrear", db, lambda: guardar_borrar_y_recrear(db, reservas)))
+
+    db = firestore_falso.ClienteFalso(latencia=args.latencia_ms / 1000,
+                                      latencia_por_documento=args.latencia_doc_ms / 1000)
+    firestore_falso.cargar_reservas(db, generar(args.salas, args.usuarios, args.anios))
+    for trabajadores in map(int, args.trabajadores.split(",")):
+        resultado = medir(f"carga_particionada ({trabajadores} hilos)", db,
+                          lambda: leer_particionado(db.collection("reservas"), trabajadores=trabajadores))
+        resultados.append(resultado)
+    for concurrencia in map(int, args.trabajadores.split(",")):
+        almacen = AlmacenAsync(firestore_falso.ClienteAsyncFalso(db), concurrencia)
+        resultados.append(medir(f"carga_async ({concurrencia} concurrentes)", db,
+                                lambda: asyncio.run(almacen.leer("reservas", "fecha", concurrencia))))
+
+    operaciones = [("set", "reservas", f"{sala}|{fecha}|{hora}", {"sala": sala, "fecha": fecha, "hora": hora,
+                                                                   "usuario": usuario})
+                   for sala, fechas in reservas.items()
+                   for fecha, horas in fechas.items()
+                   for hora, usuario in horas.items()]
+    for concurrencia in map(int, args.trabajadores.split(",")):
+        db = firestore_falso.ClienteFalso(latencia=args.latencia_ms / 1000)
+        almacen = AlmacenAsync(firestore_falso.ClienteAsyncFalso(db), concurrencia)
+        resultados.append(medir(f"subida_completa ({concurrencia} concurrentes)", db,
+                                lambda: asyncio.run(almacen.confirmar(operaciones))))
+
+    original = os.getcwd()
+    with tempfile.TemporaryDirectory() as directorio:
+        os.chdir(directorio)
+        os.environ["RESERVAS_FIRESTORE"] = "falso"
+        try:
+            v62 = cargar_script("Reservas-v6-2.py")
+        except ImportError as error:
+            resultados.append({"estrategia": "diferencias_batch", "omitido": str(error)})
+        else:
+            db = firestore_falso.ClienteFalso(latencia=args.latencia_ms / 1000)
+            firestore_falso.cargar_reservas(db, generar(args.salas, args.usuarios, args.anios))
+            firestore_falso._compartido = db
+            with redirect_stdout(io.StringIO()):
+                resultados.append(medir("cargar_datos", db, v62.cargar_datos))
+                cargadas = v62.cargar_datos()
+                cambiar_algunas(cargadas, args.cambios)
+                resultados.append(medir("diferencias_batch", db, lambda: v62.guardar_datos(cargadas)))
+        finally:
+            os.chdir(original)
+
+    print(json.dumps({
+        "parametros": dict(vars(args), horas_reservadas=contar(reservas)),
+        "resultados": resultados,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
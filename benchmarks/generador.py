@@ -0,0 +1,104 @@
+# Generador de datos sintéticos (con semilla, repetible)
+#
+# Produce reservas realistas para N salas, M usuarios y Y años de historia:
+# pocas salas y pocos usuarios concentran la mayoría de las reservas (Zipf),
+# y las horas de la mañana son las más pedidas. Sale en el formato de
+# diccionarios anidados (sala -> fecha -> hora -> usuario) de los scripts v6
+# y en el formato de lista de Reserva de reservas.py.
+import argparse
+import json
+import random
+from datetime import date, timedelta
+
+HORAS = ["08:00", "09:00", "10:00", "11:00", "12:00", "13:00", "14:00", "15:00", "16:00"]
+PESO_HORAS = [0.6, 1.0, 1.0, 0.9, 0.5, 0.4, 0.7, 0.6, 0.4]
+NOMBRES = ["Ana", "Juan", "Cecilia", "Piero", "Alfredo", "JFL", "Oraculo", "Lucia",
+           "Marta", "Pedro", "Sofia", "Diego", "Valeria", "Jorge", "Carmen", "Luis"]
+DIAS_LISTA = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes"]
+
+
+def nombres_salas(cantidad):
+    salas = ["Sala Piso 4", "Sala Piso 5"]
+    salas += [f"Sala Piso {numero}" for numero in range(6, cantidad + 4)]
+    return salas[:cantidad]
+
+
+def nombres_usuarios(cantidad):
+    return [f"{NOMBRES[i % len(NOMBRES)]}-{i}" if i >= len(NOMBRES) else NOMBRES[i]
+            for i in range(cantidad)]
+
+
+def pesos_zipf(cantidad, exponente):
+    return [1 / (rango ** exponente) for rango in range(1, cantidad + 1)]
+
+
+# Reservas en formato de diccionarios anidados (reservas6.json / Firestore)
+def generar(salas=2, usuarios=50, anios=1, semilla=42, ocupacion=0.6, sesgo=1.1, hasta=None):
+    azar = random.Random(semilla)
+    lista_salas = nombres_salas(salas)
+    lista_usuarios = nombres_usuarios(usuarios)
+    pesos_usuarios = pesos_zipf(usuarios, sesgo)
+    pesos_salas = pesos_zipf(salas, sesgo * 0.5)
+    mayor = max(pesos_salas)
+
+    hasta = hasta or date.today() + timedelta(days=28)
+    dia = hasta - timedelta(days=365 * anios)
+    reservas = {sala: {} for sala in lista_salas}
+    while dia <= hasta:
+        if dia.weekday() < 5:
+            fecha = dia.isoformat()
+            for sala, peso_sala in zip(lista_salas, pesos_salas):
+                for hora, peso_hora in zip(HORAS, PESO_HORAS):
+                    if azar.random() < ocupacion * peso_hora * peso_sala / mayor:
+                        usuario = azar.choices(lista_usuarios, weights=pesos_usuarios)[0]
+                        reservas[sala].setdefault(fecha, {})[hora] = usuario
+        dia += timedelta(days=1)
+    return reservas
+
+
+# Convertir al formato de reservas.py (lista de Reserva con sala, persona,
+# dia de la semana, hora de inicio y duración). Las horas consecutivas del
+# mismo usuario se juntan en una sola reserva.
+def a_formato_lista(reservas):
+    lista = []
+    for numero, (sala, fechas) in enumerate(reservas.items(), 1):
+        for fecha, horas in sorted(fechas.items()):
+            dia = DIAS_LISTA[date.fromisoformat(fecha).weekday()]
+            actual = None
+            for hora in HORAS:
+                usuario = horas.get(hora)
+                if actual and usuario == actual["persona"]:
+                    actual["duracion"] += 1
+                    continue
+                actual = None
+                if usuario:
+                    actual = {"sala": str(numero), "persona": usuario, "dia": dia,
+                              "hora_inicio": hora, "duracion": 1}
+                    lista.append(actual)
+    return lista
+
+
+def contar(reservas):
+    return sum(len(horas) for fechas in reservas.values() for horas in fechas.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generar reservas sintéticas")
+    parser.add_argument("--salas", type=int, default=2)
+    parser.add_argument("--usuarios", type=int, default=50)
+    parser.add_argument("--anios", type=int, default=1)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--ocupacion", type=float, default=0.6)
+    parser.add_argument("--formato", choices=["dict", "lista"], default="dict")
+    parser.add_argument("-o", "--salida", default="reservas_sinteticas.json")
+    args = parser.parse_args()
+
+    reservas = generar(args.salas, args.usuarios, args.anios, args.semilla, args.ocupacion)
+    datos = reservas if args.formato == "dict" else a_formato_lista(reservas)
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(datos, f, ensure_ascii=False, indent=2)
+    print(f"{contar(reservas)} horas reservadas escritas en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
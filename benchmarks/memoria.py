@@ -0,0 +1,82 @@
+# Memoria ocupada por las reservas en cada representación
+#
+# Carga los mismos datos generados desde JSON (como al leer reservas6.json o
+# reservas.json) y mide con tracemalloc lo que queda vivo después de armar
+# cada forma:
+#   - anidado: diccionarios sala -> fecha -> hora -> usuario (scripts v6),
+#   - columnar: columnas de columnar.py,
+#   - lista_dict / lista_reserva: las filas de reservas.py como diccionarios
+#     o como Reserva con __slots__.
+#
+#   python -m benchmarks.memoria --salas 20 --usuarios 500 --anios 3
+import argparse
+import gc
+import json
+import sys
+import tracemalloc
+
+from benchmarks import cargar_script
+from benchmarks.generador import HORAS, a_formato_lista, contar, generar
+from columnar import AlmacenColumnar
+
+
+# Bytes que siguen ocupados después de `armar(texto)`
+def medir(armar, texto):
+    gc.collect()
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    resultado = armar(texto)
+    gc.collect()
+    ocupado = tracemalloc.get_traced_memory()[0] - antes
+    tracemalloc.stop()
+    return resultado, ocupado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memoria de las representaciones de reservas")
+    parser.add_argument("--salas", type=int, default=20)
+    parser.add_argument("--usuarios", type=int, default=500)
+    parser.add_argument("--anios", type=int, default=3)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("-o", "--salida", help="Guardar el resultado como JSON")
+    args = parser.parse_args()
+
+    reservas = generar(args.salas, args.usuarios, args.anios, args.semilla)
+    horas_reservadas = contar(reservas)
+    anidado = json.dumps(reservas)
+    lista = json.dumps(a_formato_lista(reservas), ensure_ascii=False)
+    Reserva = cargar_script("reservas.py").Reserva
+
+    resultados = {}
+    copia, resultados["anidado"] = medir(json.loads, anidado)
+    salas = list(copia)
+
+    def columnar(texto):
+        columnas = AlmacenColumnar()
+        columnas.construir(json.loads(texto), salas, HORAS)
+        return columnas
+    columnas, resultados["columnar"] = medir(columnar, anidado)
+    assert len(columnas) == horas_reservadas
+    filas, resultados["lista_dict"] = medir(json.loads, lista)
+    _, resultados["lista_reserva"] = medir(lambda texto: [Reserva(**fila) for fila in json.loads(texto)], lista)
+
+    salida = {
+        "parametros": dict(vars(args), horas_reservadas=horas_reservadas, filas_lista=len(filas)),
+        "python": sys.version.split()[0],
+        "bytes": resultados,
+        "bytes_por_hora": {nombre: round(ocupado / horas_reservadas, 1)
+                           for nombre, ocupado in resultados.items() if not nombre.startswith("lista")},
+        "bytes_por_fila": {nombre: round(ocupado / len(filas), 1)
+                           for nombre, ocupado in resultados.items() if nombre.startswith("lista")},
+    }
+    for nombre, ocupado in resultados.items():
+        print(f"{nombre:<14} {ocupado / 1024 / 1024:8.2f} MB")
+    print(f"columnar / anidado:          {resultados['columnar'] / resultados['anidado']:.0%}")
+    print(f"lista_reserva / lista_dict:  {resultados['lista_reserva'] / resultados['lista_dict']:.0%}")
+    if args.salida:
+        with open(args.salida, "w") as f:
+            json.dump(salida, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# Costo de sincronizar reservas6.json con GitHub
+#
+# Arma un remoto bare local y un clon con datos generados (más unos archivos
+# de código, como el repositorio real) y mide, por sincronización, cuántos
+# procesos se lanzan y cuánto tarda:
+#   - anterior: fetch, show, reset --soft, add, commit, diff y push (como lo
+#     hacía Reservas-v6-1), y git pull al arrancar,
+#   - plumbing: sincronizacion.py (cat-file sobre la rama remota ya traída,
+#     y update-index / mktree / commit-tree / push / update-ref solo si el
+#     archivo cambió; al arrancar, fetch de la rama sola entre dos cat-file).
+# Cada caso se mide con un cambio en el archivo y sin cambios.
+#
+#   python -m benchmarks.sincronizacion --repeticiones 10 --anios 3
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+
+import instrumentacion
+import sincronizacion
+from benchmarks.ejecutar import percentil
+from benchmarks.generador import contar, generar
+from cambios import asignar
+
+ARCHIVO = "reservas6.json"
+MENSAJE = "Actualización de reservas6.json"
+
+
+def git(carpeta, *argumentos):
+    return subprocess.run(["git", "-c", "init.defaultBranch=main", *argumentos], cwd=carpeta,
+                          capture_output=True, text=True, check=True)
+
+
+def preparar(directorio, reservas):
+    remoto = os.path.join(directorio, "remoto.git")
+    clon = os.path.join(directorio, "clon")
+    git(directorio, "init", "-q", "--bare", remoto)
+    git(directorio, "clone", "-q", remoto, clon)
+    git(clon, "config", "user.name", "bench")
+    git(clon, "config", "user.email", "bench@localhost")
+    for numero in range(20):  # Código que no cambia al sincronizar
+        with open(os.path.join(clon, f"modulo{numero}.py"), "w") as f:
+            f.write("# relleno\n" * 200)
+    with open(os.path.join(clon, ARCHIVO), "w") as f:
+        json.dump(reservas, f, indent=2)
+    git(clon, "add", ".")
+    git(clon, "commit", "-q", "-m", "Inicial")
+    git(clon, "push", "-q", "origin", "HEAD:main")
+    return clon
+
+
+def guardar(reservas):
+    with open(ARCHIVO, "w") as f:
+        json.dump(reservas, f, indent=2)
+
+
+def anterior_sincronizar(reservas):
+    ejecutar = instrumentacion.ejecutar
+    ejecutar(["git", "fetch", "-q", "origin", "main"])
+    remoto = ejecutar(["git", "show", f"origin/main:{ARCHIVO}"], capture_output=True, text=True)
+    guardar(json.loads(remoto.stdout) if not reservas else reservas)
+    ejecutar(["git", "reset", "-q", "--soft", "origin/main"])
+    ejecutar(["git", "add", ARCHIVO])
+    ejecutar(["git", "commit", "-q", "-m", MENSAJE], capture_output=True)
+    if ejecutar(["git", "diff", "--cached", "--quiet"]).returncode != 0:
+        return
+    ejecutar(["git", "push", "-q", "origin", "HEAD:main"], capture_output=True)
+
+
+def anterior_arranque():
+    instrumentacion.ejecutar(["git", "pull", "-q", "origin", "main"], capture_output=True, text=True)
+
+
+# Como sincronizar_con_github(): parte de la rama remota ya traída y solo
+# la vuelve a traer si el push se rechaza (aquí no hay otros clientes)
+def plumbing_sincronizar(reservas):
+    remoto = sincronizacion.leer_remoto(ARCHIVO)
+    guardar(reservas or json.loads(remoto.contenido))
+    with open(ARCHIVO, "rb") as f:
+        contenido = f.read()
+    if sincronizacion.publicar(ARCHIVO, contenido, remoto, MENSAJE) is None:
+        raise RuntimeError("push rechazado")
+
+
+def plumbing_arranque():
+    anteriores = sincronizacion.publicados(ARCHIVO)
+    sincronizacion.traer()
+    sincronizacion.actualizar_copia(ARCHIVO, anteriores)
+
+
+# Procesos y milisegundos por llamada a `operacion(numero)`
+def medir(operacion, repeticiones):
+    tiempos, procesos = [], []
+    for numero in range(repeticiones):
+        antes = instrumentacion.resumen()["contadores"].get("subprocesos", 0)
+        inicio = time.perf_counter()
+        operacion(numero)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        procesos.append(instrumentacion.resumen()["contadores"].get("subprocesos", 0) - antes)
+    return {
+        "procesos": max(procesos),
+        "p50_ms": round(percentil(tiempos, 0.50), 2),
+        "p99_ms": round(percentil(tiempos, 0.99), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Costo de sincronizar con GitHub")
+    parser.add_argument("--salas", type=int, default=2)
+    parser.add_argument("--usuarios", type=int, default=50)
+    parser.add_argument("--anios", type=int, default=1)
+    parser.add_argument("--repeticiones", type=int, default=10)
+    parser.add_argument("-o", "--salida", help="Guardar el resultado como JSON")
+    args = parser.parse_args()
+
+    instrumentacion.ACTIVO = True  # Para que ejecutar() cuente los procesos
+    reservas = generar(args.salas, args.usuarios, args.anios)
+    sala = next(iter(reservas))
+    resultados = {}
+    with tempfile.TemporaryDirectory() as directorio:
+        original = os.getcwd()
+        os.chdir(preparar(directorio, reservas))
+        try:
+            # Cada sincronización con cambios agrega un horario nuevo
+            dias = itertools.count(date(2099, 1, 1).toordinal())
+
+            def con_cambio(sincronizar):
+                def operacion(numero):
+                    asignar(reservas, sala, date.fromordinal(next(dias)).isoformat(), "08:00", "bench")
+                    sincronizar(reservas)
+                return operacion
+
+            for nombre, sincronizar, arranque in (("anterior", anterior_sincronizar, anterior_arranque),
+                                                  ("plumbing", plumbing_sincronizar, plumbing_arranque)):
+                resultados[nombre] = {
+                    "sincronizar_con_cambio": medir(con_cambio(sincronizar), args.repeticiones),
+                    "sincronizar_sin_cambio": medir(lambda numero: sincronizar(None), args.repeticiones),
+                    "arranque": medir(lambda numero: arranque(), args.repeticiones),
+                }
+        finally:
+            os.chdir(original)
+
+    for nombre, casos in resultados.items():
+        for caso, datos in casos.items():
+            print(f"{nombre:<9} {caso:<24} {datos['procesos']:>2} procesos  "
+                  f"p50 {datos['p50_ms']:8.2f} ms  p99 {datos['p99_ms']:8.2f} ms")
+    if args.salida:
+        with open(args.salida, "w") as f:
+            json.dump({"parametros": dict(vars(args), horas_reservadas=contar(reservas)),
+                       "python": sys.version.split()[0], "resultados": resultados}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
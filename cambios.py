@@ -0,0 +1,40 @@
+# Notificación de cambios en las reservas
+#
+# Toda modificación de un horario pasa por asignar() o liberar(), que avisan
+# a los suscriptores (caché de tablas, índices, contadores...). Un suscriptor
+# recibe (sala, fecha, hora, anterior, nuevo); si sala es None, cambió todo
+# (por ejemplo, al recargar los datos).
+_suscriptores = []
+
+
+def suscribir(funcion):
+    _suscriptores.append(funcion)
+    return funcion
+
+
+def notificar(sala, fecha, hora, anterior, nuevo):
+    for funcion in _suscriptores:
+        funcion(sala, fecha, hora, anterior, nuevo)
+
+
+# Avisar que las reservas se reemplazaron por completo
+def recargado():
+    notificar(None, None, None, None, None)
+
+
+# Reservar un horario para un usuario
+def asignar(reservas, sala, fecha, hora, usuario):
+    horas = reservas.setdefault(sala, {}).setdefault(fecha, {})
+    anterior = horas.get(hora)
+    horas[hora] = usuario
+    notificar(sala, fecha, hora, anterior, usuario)
+
+
+# Liberar un horario; elimina la fecha si queda sin reservas
+def liberar(reservas, sala, fecha, hora):
+    horas = reservas[sala][fecha]
+    anterior = horas.pop(hora)
+    if not horas:
+        del reservas[sala][fecha]
+    notificar(sala, fecha, hora, anterior, None)
+    return anterior
@@ -0,0 +1,143 @@
+# Calendario de cierres: feriados, mantenimiento, salas bloqueadas
+#
+# Cada cierre cubre un rango de fechas (inclusive), todas las salas o una, y
+# el día entero o un rango de horas (hora_hasta excluida). Al cargarlos se
+# compilan en máscaras de bits por (sala, fecha): el bit i bloquea HORAS[i],
+# y sala None vale para todas. Consultar un horario son dos búsquedas en un
+# diccionario y un AND; las tablas aplican la máscara una vez por día, no
+# por celda.
+#
+# Los cierres se guardan en cierres.json (RESERVAS_CIERRES), aparte de las
+# reservas. agregar() devuelve de una vez las reservas existentes que caen en
+# el cierre nuevo, recorriendo solo sus fechas, salas y horas.
+#
+# cargar(reservas) y agregar() también quitan de la lista de espera las colas
+# de fechas pasadas y de horarios cerrados, que nadie va a poder tomar: si no,
+# quedan para siempre dentro de las reservas guardadas.
+import json
+import os
+from datetime import date, timedelta
+
+from lista_espera import podar
+
+ARCHIVO_CIERRES = os.environ.get("RESERVAS_CIERRES", "cierres.json")
+CAMPOS = ["desde", "hasta", "sala", "hora_desde", "hora_hasta", "motivo"]
+
+
+def cierre(desde, hasta=None, sala=None, hora_desde=None, hora_hasta=None, motivo=""):
+    return {"desde": desde, "hasta": hasta or desde, "sala": sala,
+            "hora_desde": hora_desde, "hora_hasta": hora_hasta, "motivo": motivo}
+
+
+def fechas_de(cierre):
+    dia, hasta = date.fromisoformat(cierre["desde"]), date.fromisoformat(cierre["hasta"])
+    while dia <= hasta:
+        yield dia.isoformat()
+        dia += timedelta(days=1)
+
+
+class Calendario:
+    def __init__(self, horas, ruta=ARCHIVO_CIERRES):
+        self.horas = list(horas)
+        self.bits = {hora: 1 << i for i, hora in enumerate(self.horas)}
+        self.ruta = ruta
+        self.cierres = []
+        self.mascaras = {}  # (sala o None, fecha) -> horas bloqueadas
+        self._bloqueadas = {0: frozenset()}  # máscara -> horas
+        self.listo = False
+
+    def _asegurar(self):
+        if not self.listo:
+            self.cargar()
+
+    def cargar(self, reservas=None):
+        self.cierres = []
+        if os.path.exists(self.ruta):
+            with open(self.ruta, encoding="utf-8") as f:
+                self.cierres = [cierre(**datos) for datos in json.load(f)]
+        self.compilar()
+        if reservas is not None:
+            self.podar_esperas(reservas)
+
+    def guardar(self):
+        with open(self.ruta, "w", encoding="utf-8") as f:
+            json.dump(self.cierres, f, ensure_ascii=False, indent=2)
+
+    def compilar(self):
+        self.mascaras = {}
+        for datos in self.cierres:
+            self._marcar(datos)
+        self.listo = True
+
+    # Bits de las horas que cubre un cierre
+    def mascara_de(self, cierre):
+        desde, hasta = cierre["hora_desde"] or "", cierre["hora_hasta"] or "99:99"
+        return sum(bit for hora, bit in self.bits.items() if desde <= hora < hasta)
+
+    def _marcar(self, cierre):
+        bits = self.mascara_de(cierre)
+        for fecha in fechas_de(cierre):
+            clave = (cierre["sala"], fecha)
+            self.mascaras[clave] = self.mascaras.get(clave, 0) | bits
+
+    def mascara(self, sala, fecha):
+        self._asegurar()
+        return self.mascaras.get((None, fecha), 0) | self.mascaras.get((sala, fecha), 0)
+
+    # Horas de una máscara (se guardan: hay pocas máscaras distintas)
+    def horas_de(self, mascara):
+        horas = self._bloqueadas.get(mascara)
+        if horas is None:
+            horas = self._bloqueadas[mascara] = frozenset(hora for hora, bit in self.bits.items() if mascara & bit)
+        return horas
+
+    def bloqueadas(self, sala, fecha):
+        return self.horas_de(self.mascara(sala, fecha))
+
+    def cerrado(self, sala, fecha, hora):
+        return bool(self.mascara(sala, fecha) & self.bits.get(hora, 0))
+
+    # Quitar las colas de espera de fechas pasadas y de horarios cerrados;
+    # devuelve cuántas se quitaron
+    def podar_esperas(self, reservas, hoy=None):
+        hoy = hoy or date.today().isoformat()
+        return podar(reservas, lambda sala, fecha, hora: fecha < hoy or self.cerrado(sala, fecha, hora))
+
+    # Motivo del cierre que bloquea el horario (solo para mostrarlo)
+    def motivo(self, sala, fecha, hora):
+        for datos in self.cierres:
+            if (datos["sala"] in (None, sala) and datos["desde"] <= fecha <= datos["hasta"]
+                    and self.mascara_de(datos) & self.bits.get(hora, 0)):
+                return datos["motivo"] or "cerrado"
+        return None
+
+    # Agregar un cierre y devolver las reservas (sala, fecha, hora, usuario)
+    # que quedan dentro de él
+    def agregar(self, nuevo, reservas, salas):
+        self._asegurar()
+        self.cierres.append(nuevo)
+        self._marcar(nuevo)
+        self.guardar()
+        self.podar_esperas(reservas)
+        horas = self.horas_de(self.mascara_de(nuevo))
+        afectadas = []
+        for sala in ([nuevo["sala"]] if nuevo["sala"] else salas):
+            por_fecha = reservas.get(sala, {})
+            for fecha in fechas_de(nuevo):
+                for hora, usuario in por_fecha.get(fecha, {}).items():
+                    if hora in horas:
+                        afectadas.append((sala, fecha, hora, usuario))
+        return sorted(afectadas, key=lambda fila: (fila[1], fila[2], fila[0]))
+
+    def quitar(self, indice):
+        self._asegurar()
+        quitado = self.cierres.pop(indice)
+        self.compilar()
+        self.guardar()
+        return quitado
+
+    # Cierres que terminan hoy o después, con su posición en la lista
+    def vigentes(self, hoy=None):
+        self._asegurar()
+        hoy = hoy or date.today().isoformat()
+        return [(i, datos) for i, datos in enumerate(self.cierres) if datos["hasta"] >= hoy]
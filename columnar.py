@@ -0,0 +1,292 @@
+# Almacén de reservas por columnas
+#
+# Cuatro arreglos paralelos (array del módulo estándar): sala ('H'), día como
+# ordinal ('I'), índice de la hora ('B') y usuario ('I'), ordenados por
+# (sala, día, hora). Los nombres de salas y usuarios se guardan una sola vez
+# (internados) en tablas de ids (Nombres) y las fechas y horas se codifican
+# con Codigos. Cada hora reservada ocupa 11 bytes, sin un objeto por reserva,
+# y las consultas por sala y rango de fechas son unas pocas búsquedas
+# binarias y un recorrido contiguo.
+#
+# Se carga en bloque desde reservas6.json, los documentos de Firestore o
+# reservas.json y se mantiene al día con cambios.py. cuadricula() arma lo que
+# necesita MotorTabla para una semana, y listar() / por_usuarios() devuelven
+# lo mismo y en el mismo orden que los listados de listados.py.
+import bisect
+import heapq
+import json
+import sys
+from array import array
+from datetime import date, timedelta
+
+from cambios import suscribir
+
+DIAS_LISTA = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes"]
+
+
+# Nombres <-> ids consecutivos
+class Nombres:
+    __slots__ = ("ids", "nombres")
+
+    def __init__(self, nombres=()):
+        self.ids = {}
+        self.nombres = []
+        for nombre in nombres:
+            self.id_de(nombre)
+
+    def id_de(self, nombre):
+        identificador = self.ids.get(nombre)
+        if identificador is None:
+            nombre = sys.intern(nombre)
+            identificador = self.ids[nombre] = len(self.nombres)
+            self.nombres.append(nombre)
+        return identificador
+
+    def __getitem__(self, identificador):
+        return self.nombres[identificador]
+
+    def __len__(self):
+        return len(self.nombres)
+
+
+# (sala, fecha, hora, usuario) <-> enteros: ids de sala y usuario, ordinal de
+# la fecha (date.toordinal) e índice de la hora en la lista de horas
+class Codigos:
+    def __init__(self, horas):
+        self.horas = list(horas)
+        self.indice_hora = {hora: i for i, hora in enumerate(self.horas)}
+        self.salas = Nombres()
+        self.usuarios = Nombres()
+        self._ordinales = {}  # fecha -> ordinal
+        self._fechas = {}     # ordinal -> fecha
+
+    def ordinal(self, fecha):
+        dia = self._ordinales.get(fecha)
+        if dia is None:
+            dia = self._ordinales[fecha] = date.fromisoformat(fecha).toordinal()
+            self._fechas[dia] = fecha
+        return dia
+
+    def indice(self, hora):
+        if hora not in self.indice_hora:  # Una hora fuera de la grilla se agrega al final
+            self.indice_hora[hora] = len(self.horas)
+            self.horas.append(hora)
+        return self.indice_hora[hora]
+
+    def fecha(self, dia):
+        fecha = self._fechas.get(dia)
+        if fecha is None:
+            fecha = self._fechas[dia] = date.fromordinal(dia).isoformat()
+        return fecha
+
+    def codificar(self, sala, fecha, hora, usuario):
+        return self.salas.id_de(sala), self.ordinal(fecha), self.indice(hora), self.usuarios.id_de(usuario)
+
+
+class AlmacenColumnar:
+    def __init__(self):
+        self.listo = False
+        self._limpiar([])
+
+    def _limpiar(self, horas):
+        self.codigos = Codigos(horas)
+        self.sala = array("H")
+        self.dia = array("I")
+        self.hora = array("B")
+        self.usuario = array("I")
+        self._por_usuario = None
+
+    def __len__(self):
+        return len(self.sala)
+
+    def _clave(self, posicion):
+        return self.sala[posicion], self.dia[posicion], self.hora[posicion]
+
+    # Primera posición con clave >= (sala, dia, hora): como las filas están
+    # ordenadas por sala, día y hora, se busca en cada columna dentro del
+    # tramo que dejó la anterior (bisect trabaja directo sobre los arreglos)
+    def _posicion(self, sala, dia, hora=0):
+        inicio = bisect.bisect_left(self.sala, sala)
+        fin = bisect.bisect_right(self.sala, sala, inicio)
+        inicio = bisect.bisect_left(self.dia, dia, inicio, fin)
+        fin = bisect.bisect_right(self.dia, dia, inicio, fin)
+        return bisect.bisect_left(self.hora, hora, inicio, fin)
+
+    # Agregar muchas reservas (sala, fecha, hora, usuario) de una vez. Si todas
+    # van después de las que ya hay se agregan al final; si no, se mezclan y
+    # se reescriben las columnas (una reserva nueva reemplaza a la del mismo
+    # horario).
+    def agregar_varias(self, filas):
+        codificadas = {}  # (sala, dia, hora) -> usuario: un usuario por horario
+        for fila in filas:
+            sala, dia, hora, usuario = self.codigos.codificar(*fila)
+            codificadas[(sala, dia, hora)] = usuario
+        if not codificadas:
+            return
+        nuevas = sorted(clave + (usuario,) for clave, usuario in codificadas.items())
+        if len(self.sala) and nuevas[0][:3] <= self._clave(len(self.sala) - 1):
+            todas = {self._clave(i): self.usuario[i] for i in range(len(self.sala))}
+            todas.update(codificadas)
+            nuevas = sorted(clave + (usuario,) for clave, usuario in todas.items())
+            self.sala, self.dia, self.hora, self.usuario = array("H"), array("I"), array("B"), array("I")
+        self.sala.extend(fila[0] for fila in nuevas)
+        self.dia.extend(fila[1] for fila in nuevas)
+        self.hora.extend(fila[2] for fila in nuevas)
+        self.usuario.extend(fila[3] for fila in nuevas)
+        self._por_usuario = None
+
+    # Diccionarios anidados de los scripts v6 (reservas6.json)
+    def construir(self, reservas, salas, horas):
+        self._limpiar(horas)
+        for sala in salas:
+            self.codigos.salas.id_de(sala)  # En el orden de `salas`, también sin reservas
+        self.agregar_varias((sala, fecha, hora, usuario)
+                            for sala in salas
+                            for fecha, horas_dia in reservas.get(sala, {}).items()
+                            for hora, usuario in horas_dia.items())
+        self.listo = True
+
+    def asegurar(self, reservas, salas, horas):
+        if not self.listo:
+            self.construir(reservas, salas, horas)
+
+    # Documentos de la colección "reservas" de Firestore
+    def cargar_documentos(self, documentos, horas):
+        self._limpiar(horas)
+        self.agregar_varias((d["sala"], d["fecha"], d["hora"], d["usuario"]) for d in documentos)
+        self.listo = True
+
+    def cargar_firestore(self, db, horas, coleccion="reservas"):
+        self.cargar_documentos((documento.to_dict() for documento in db.collection(coleccion).stream()), horas)
+
+    # Filas de reservas.py (sala, persona, día de la semana, hora de inicio y
+    # duración en horas). No tienen fecha: cada día se ubica en la semana que
+    # empieza el lunes `lunes` (por defecto, la actual).
+    def cargar_lista(self, filas, horas, lunes=None):
+        lunes = lunes or date.today() - timedelta(days=date.today().weekday())
+        self._limpiar(horas)
+        self.agregar_varias(
+            (fila["sala"], (lunes + timedelta(days=DIAS_LISTA.index(fila["dia"]))).isoformat(),
+             f"{int(fila['hora_inicio'][:2]) + desplazamiento:02d}{fila['hora_inicio'][2:]}", fila["persona"])
+            for fila in filas for desplazamiento in range(int(fila["duracion"])))
+        self.listo = True
+
+    # reservas6.json (diccionario) o reservas.json (lista)
+    def cargar_archivo(self, ruta, horas):
+        with open(ruta, encoding="utf-8") as f:
+            datos = json.load(f)
+        if isinstance(datos, list):
+            self.cargar_lista(datos, horas)
+        else:
+            self.construir(datos, [sala for sala in datos if not sala.startswith("_")], horas)
+
+    # Suscriptor de cambios.py
+    def actualizar(self, sala, fecha, hora, anterior, nuevo):
+        if sala is None:
+            self.listo = False  # Recarga completa: hay que reconstruir
+            return
+        if not self.listo:
+            return
+        clave = (self.codigos.salas.id_de(sala), self.codigos.ordinal(fecha), self.codigos.indice(hora))
+        posicion = self._posicion(*clave)
+        existe = posicion < len(self.sala) and self._clave(posicion) == clave
+        if nuevo is None:
+            if existe:
+                for columna in (self.sala, self.dia, self.hora, self.usuario):
+                    del columna[posicion]
+        elif existe:
+            self.usuario[posicion] = self.codigos.usuarios.id_de(nuevo)
+        else:
+            for columna, valor in zip((self.sala, self.dia, self.hora, self.usuario),
+                                      clave + (self.codigos.usuarios.id_de(nuevo),)):
+                columna.insert(posicion, valor)
+        self._por_usuario = None
+
+    # Posiciones [inicio, fin) de una sala entre dos ordinales (hasta excluido)
+    def _rango(self, sala, desde=None, hasta=None):
+        identificador = self.codigos.salas.ids.get(sala)
+        if identificador is None:
+            return 0, 0
+        inicio = bisect.bisect_left(self.sala, identificador)
+        fin = bisect.bisect_right(self.sala, identificador, inicio)
+        if desde:
+            inicio = bisect.bisect_left(self.dia, desde, inicio, fin)
+        if hasta:
+            fin = bisect.bisect_left(self.dia, hasta, inicio, fin)
+        return inicio, fin
+
+    def _ordinal(self, fecha):
+        return date.fromisoformat(fecha).toordinal() if fecha else None
+
+    # {sala: {fecha: {hora: usuario}}} solo con las fechas pedidas, para
+    # MotorTabla.dibujar
+    def cuadricula(self, sala, fechas):
+        dias = {self.codigos.ordinal(fecha): fecha for fecha in fechas}
+        if not dias:
+            return {sala: {}}
+        horas, usuarios = self.codigos.horas, self.codigos.usuarios.nombres
+        inicio, fin = self._rango(sala, min(dias), max(dias) + 1)
+        semana = {}
+        for dia, hora, usuario in zip(self.dia[inicio:fin], self.hora[inicio:fin], self.usuario[inicio:fin]):
+            fecha = dias.get(dia)
+            if fecha:
+                semana.setdefault(fecha, {})[horas[hora]] = usuarios[usuario]
+        return {sala: semana}
+
+    # (fecha, hora, sala, usuario) de una sala, en orden, desde `desde`
+    # (incluida) hasta `hasta` (excluida)
+    def _de_sala(self, sala, desde, hasta):
+        horas, usuarios = self.codigos.horas, self.codigos.usuarios.nombres
+        inicio, fin = self._rango(sala, desde, hasta)
+        fecha, anterior = None, None
+        for dia, hora, usuario in zip(self.dia[inicio:fin], self.hora[inicio:fin], self.usuario[inicio:fin]):
+            if dia != anterior:
+                anterior, fecha = dia, self.codigos.fecha(dia)
+            yield fecha, horas[hora], sala, usuarios[usuario]
+
+    # Todas las reservas ordenadas por fecha, hora y sala
+    def listar(self, reservas=None, salas=None, desde=None, hasta=None):
+        salas = salas if salas is not None else sorted(self.codigos.salas.nombres)
+        desde, hasta = self._ordinal(desde), self._ordinal(hasta)
+        return heapq.merge(*(self._de_sala(sala, desde, hasta) for sala in salas))
+
+    # usuario -> posiciones de sus reservas ordenadas por (día, hora, sala);
+    # se arma en una pasada al primer uso después de un cambio
+    # usuario -> {id de sala: posiciones}. Las columnas están ordenadas por
+    # (sala, día, hora), así que las posiciones de cada sala ya quedan en orden.
+    @property
+    def por_usuario(self):
+        if self._por_usuario is None:
+            grupos = {}
+            for i, (sala, usuario) in enumerate(zip(self.sala, self.usuario)):
+                grupos.setdefault(usuario, {}).setdefault(sala, array("I")).append(i)
+            usuarios = self.codigos.usuarios
+            self._por_usuario = {usuarios[usuario]: por_sala for usuario, por_sala in grupos.items()}
+        return self._por_usuario
+
+    # (fecha, hora, sala, usuario) de un usuario en una sala, en orden, entre
+    # dos ordinales (hasta excluido)
+    def _de_usuario_sala(self, posiciones, sala, usuario, desde, hasta):
+        horas, dia = self.codigos.horas, self.dia.__getitem__
+        inicio = bisect.bisect_left(posiciones, desde, key=dia) if desde else 0
+        fin = bisect.bisect_left(posiciones, hasta, inicio, key=dia) if hasta else len(posiciones)
+        for i in posiciones[inicio:fin]:
+            yield self.codigos.fecha(self.dia[i]), horas[self.hora[i]], sala, usuario
+
+    # Reservas de usuarios, agrupadas por usuario (en orden alfabético) y
+    # ordenadas por fecha dentro de cada uno. Solo se recorren las salas
+    # pedidas de cada usuario, y de cada una solo el rango de fechas.
+    def por_usuarios(self, usuarios=None, salas=None, desde=None, hasta=None):
+        indice = self.por_usuario
+        nombres_salas = self.codigos.salas
+        ids = None if salas is None else [nombres_salas.ids[sala] for sala in salas if sala in nombres_salas.ids]
+        desde, hasta = self._ordinal(desde), self._ordinal(hasta)
+        for usuario in (usuarios if usuarios is not None else sorted(indice)):
+            por_sala = indice.get(usuario, {})
+            elegidas = por_sala if ids is None else [sala for sala in ids if sala in por_sala]
+            yield from heapq.merge(*(self._de_usuario_sala(por_sala[sala], nombres_salas[sala], usuario, desde, hasta)
+                                     for sala in elegidas))
+
+
+COLUMNAS = AlmacenColumnar()
+suscribir(COLUMNAS.actualizar)
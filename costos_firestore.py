@@ -0,0 +1,103 @@
+# Contabilidad de lecturas, escrituras y borrados facturados por Firestore
+#
+# Lleva la cuenta del día (se guarda en ARCHIVO_COSTOS para que sume entre
+# sesiones) y la compara con presupuestos diarios configurables por variables
+# de entorno. Cuando un presupuesto supera UMBRAL, el programa se degrada:
+#   - lecturas: se sirve desde la copia local y no se recorren colecciones
+#   - escrituras/borrados: los guardados se agrupan hasta la salida
+#
+# registrar() se llama también desde el hilo de carga en segundo plano, así
+# que los contadores y el archivo se tocan con _candado tomado.
+import json
+import os
+import threading
+from datetime import date
+
+ARCHIVO_COSTOS = "costos_firestore.json"
+UMBRAL = float(os.environ.get("RESERVAS_UMBRAL_PRESUPUESTO", "0.8"))
+
+# Cuota gratuita diaria de Firestore por defecto
+PRESUPUESTOS = {
+    "lecturas": int(os.environ.get("RESERVAS_PRESUPUESTO_LECTURAS", "50000")),
+    "escrituras": int(os.environ.get("RESERVAS_PRESUPUESTO_ESCRITURAS", "20000")),
+    "borrados": int(os.environ.get("RESERVAS_PRESUPUESTO_BORRADOS", "20000")),
+}
+
+_hoy = None
+_dia = {}     # Total del día (todas las sesiones)
+_sesion = {"lecturas": 0, "escrituras": 0, "borrados": 0}
+_candado = threading.RLock()
+
+
+def _cargar():
+    global _hoy, _dia
+    hoy = date.today().isoformat()
+    if _hoy == hoy:
+        return
+    with _candado:
+        if _hoy == hoy:
+            return
+        dia = {"lecturas": 0, "escrituras": 0, "borrados": 0}
+        try:
+            with open(ARCHIVO_COSTOS, "r") as f:
+                guardado = json.load(f)
+            if guardado.get("fecha") == hoy:
+                for tipo in dia:
+                    dia[tipo] = guardado.get(tipo, 0)
+        except (OSError, ValueError):
+            pass
+        _dia, _hoy = dia, hoy  # _hoy al final: quien lo vea al día ya ve _dia nuevo
+
+
+def _guardar():
+    try:
+        with open(ARCHIVO_COSTOS, "w") as f:
+            json.dump(dict(_dia, fecha=_hoy), f)
+    except OSError:
+        pass
+
+
+# Sumar operaciones facturadas ("lecturas", "escrituras" o "borrados")
+def registrar(tipo, cantidad=1):
+    if not cantidad:
+        return
+    with _candado:
+        _cargar()
+        _dia[tipo] += cantidad
+        _sesion[tipo] += cantidad
+        _guardar()
+
+
+def usado(tipo):
+    _cargar()
+    return _dia[tipo]
+
+
+# Fracción usada del presupuesto diario
+def fraccion(tipo):
+    presupuesto = PRESUPUESTOS[tipo]
+    return usado(tipo) / presupuesto if presupuesto else 0
+
+
+def cerca_del_limite(tipo):
+    return fraccion(tipo) >= UMBRAL
+
+
+# ¿Se puede recorrer una colección completa de `documentos` documentos?
+def puede_leer(documentos=1):
+    _cargar()
+    return not cerca_del_limite("lecturas") and _dia["lecturas"] + documentos <= PRESUPUESTOS["lecturas"]
+
+
+# ¿Hay que agrupar los guardados en vez de escribir en cada cambio?
+def agrupar_escrituras():
+    return cerca_del_limite("escrituras") or cerca_del_limite("borrados")
+
+
+def resumen():
+    _cargar()
+    lineas = ["Operaciones Firestore (sesión / hoy / presupuesto diario):"]
+    for tipo in ("lecturas", "escrituras", "borrados"):
+        lineas.append(f"  {tipo.capitalize():<11} {_sesion[tipo]:>7} / {_dia[tipo]:>7} / {PRESUPUESTOS[tipo]:>7}"
+                      f"  ({fraccion(tipo):.0%})")
+    return "\n".join(lineas)
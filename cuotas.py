@@ -0,0 +1,140 @@
+# Cuotas por usuario
+#
+# Tres límites, configurables con variables de entorno (0 = sin límite; por
+# defecto no hay ninguno) y por usuario con RESERVAS_CUOTAS_USUARIO:
+#   - horas por semana (todas las salas),
+#   - horas por semana en una misma sala,
+#   - reservas futuras (de hoy en adelante).
+# Los contadores por (usuario, semana) y (usuario, sala, semana) se arman en
+# una sola pasada sobre las reservas y se mantienen al día con cambios.py, así
+# que verificar() no recorre las reservas. Las reservas futuras se cuentan con
+# bisect sobre las fechas ordenadas de cada usuario.
+import bisect
+import os
+from collections import Counter
+from datetime import date
+
+from cambios import suscribir
+
+HORAS_SEMANA = int(os.environ.get("RESERVAS_CUOTA_SEMANA", "0"))
+HORAS_SALA_SEMANA = int(os.environ.get("RESERVAS_CUOTA_SALA_SEMANA", "0"))
+RESERVAS_FUTURAS = int(os.environ.get("RESERVAS_CUOTA_FUTURAS", "0"))
+
+LIMITES = ("horas_semana", "horas_sala_semana", "reservas_futuras")
+
+
+# Límites propios de algunos usuarios, configurables con
+# RESERVAS_CUOTAS_USUARIO, por ejemplo "JFL.horas_semana=4,Oraculo.reservas_futuras=10".
+# Lo que no se indique usa los generales.
+def leer_cuotas(texto):
+    cuotas = {}
+    for par in texto.split(","):
+        if "=" in par:
+            clave, maximo = par.rsplit("=", 1)
+            usuario, nombre = clave.strip().rsplit(".", 1)
+            if nombre not in LIMITES:
+                raise ValueError(f"Cuota desconocida {nombre!r}; use una de {', '.join(LIMITES)}")
+            cuotas.setdefault(usuario, {})[nombre] = int(maximo)
+    return cuotas
+
+
+CUOTAS_USUARIO = leer_cuotas(os.environ.get("RESERVAS_CUOTAS_USUARIO", ""))
+
+
+def semana(fecha):
+    anio, numero, _ = date.fromisoformat(fecha).isocalendar()
+    return anio, numero
+
+
+class Cuotas:
+    def __init__(self):
+        self.listo = False
+        self._limpiar()
+
+    def _limpiar(self):
+        self.por_semana = Counter()       # (usuario, semana) -> horas
+        self.por_sala_semana = Counter()  # (usuario, sala, semana) -> horas
+        self.fechas = {}                  # usuario -> fechas ordenadas (una por hora reservada)
+
+    # Construir los contadores recorriendo las reservas una sola vez
+    def construir(self, reservas, salas):
+        self._limpiar()
+        semanas = {}
+        for sala in salas:
+            for fecha, horas in reservas.get(sala, {}).items():
+                if fecha not in semanas:
+                    semanas[fecha] = semana(fecha)
+                clave = semanas[fecha]
+                for usuario in horas.values():
+                    self.por_semana[(usuario, clave)] += 1
+                    self.por_sala_semana[(usuario, sala, clave)] += 1
+                    self.fechas.setdefault(usuario, []).append(fecha)
+        for fechas in self.fechas.values():
+            fechas.sort()
+        self.listo = True
+
+    def asegurar(self, reservas, salas):
+        if not self.listo:
+            self.construir(reservas, salas)
+
+    # Suscriptor de cambios.py
+    def actualizar(self, sala, fecha, hora, anterior, nuevo):
+        if sala is None:
+            self.listo = False  # Recarga completa: hay que reconstruir
+            return
+        if not self.listo:
+            return
+        if anterior is not None:
+            self._sumar(anterior, sala, fecha, -1)
+        if nuevo is not None:
+            self._sumar(nuevo, sala, fecha, 1)
+
+    def _sumar(self, usuario, sala, fecha, delta):
+        clave = semana(fecha)
+        for contador, indice in ((self.por_semana, (usuario, clave)),
+                                 (self.por_sala_semana, (usuario, sala, clave))):
+            contador[indice] += delta
+            if contador[indice] <= 0:
+                del contador[indice]
+        fechas = self.fechas.setdefault(usuario, [])
+        if delta > 0:
+            bisect.insort(fechas, fecha)
+        else:
+            posicion = bisect.bisect_left(fechas, fecha)
+            if posicion < len(fechas) and fechas[posicion] == fecha:
+                del fechas[posicion]
+
+    def limite(self, usuario, nombre):
+        generales = {"horas_semana": HORAS_SEMANA, "horas_sala_semana": HORAS_SALA_SEMANA,
+                     "reservas_futuras": RESERVAS_FUTURAS}
+        return CUOTAS_USUARIO.get(usuario, {}).get(nombre, generales[nombre])
+
+    def futuras(self, usuario, hoy=None):
+        fechas = self.fechas.get(usuario, [])
+        return len(fechas) - bisect.bisect_left(fechas, hoy or date.today().isoformat())
+
+    # Motivo por el que `usuario` no puede sumar una hora en (sala, fecha), o
+    # None si puede
+    def verificar(self, usuario, sala, fecha, hoy=None):
+        clave = semana(fecha)
+        lunes = date.fromisocalendar(*clave, 1).strftime("%d/%m")
+        maximo = self.limite(usuario, "horas_semana")
+        if maximo and self.por_semana[(usuario, clave)] >= maximo:
+            return (f"{usuario} ya tiene {self.por_semana[(usuario, clave)]} h reservadas la semana "
+                    f"del {lunes} (máximo {maximo} por semana)")
+        maximo = self.limite(usuario, "horas_sala_semana")
+        if maximo and self.por_sala_semana[(usuario, sala, clave)] >= maximo:
+            return (f"{usuario} ya tiene {self.por_sala_semana[(usuario, sala, clave)]} h en {sala} la "
+                    f"semana del {lunes} (máximo {maximo} por sala y semana)")
+        maximo = self.limite(usuario, "reservas_futuras")
+        futuras = self.futuras(usuario, hoy)
+        if maximo and futuras >= maximo:
+            return f"{usuario} ya tiene {futuras} reservas pendientes (máximo {maximo})"
+        return None
+
+    def permite(self, usuario, sala, fecha):
+        return self.verificar(usuario, sala, fecha) is None
+
+
+CUOTAS = Cuotas()
+suscribir(CUOTAS.actualizar)
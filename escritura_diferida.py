@@ -0,0 +1,313 @@
+# Escritura diferida (write-behind) de las reservas
+#
+# En vez de guardar todo en cada cambio, los cambios se anotan y se guardan
+# juntos en una sola escritura:
+#   - cuando pasan `espera` segundos sin cambios nuevos (debounce),
+#   - cuando se acumulan `maximo` cambios, o
+#   - al salir (vaciar()).
+#
+# Con un diario (archivo JSON Lines), cada cambio se agrega y se hace fsync
+# antes de devolver el control, así que un cambio confirmado al usuario no se
+# pierde aunque el programa se corte antes del guardado. Cada línea lleva la
+# operación a la que pertenece (una llamada a una función @mutacion) y el
+# valor anterior del horario, así que el diario también es la cola de
+# operaciones sin conexión: recuperar() las vuelve a aplicar en orden sobre
+# el estado del servidor y rechaza las que chocan con un cambio ajeno o que
+# `validar` ya no permite (por ejemplo, por cuota).
+#
+# El diario se vacía después de cada guardado o, si guardar no llega al
+# servidor (confirmar_al_guardar=False), cuando se llama a confirmar().
+#
+# Los cambios de horarios llegan por cambios.py (registrar() es suscriptor);
+# la lista de espera se compara en anotar(), que llaman las funciones
+# decoradas con @mutacion al terminar, y se anota cola por cola con su valor
+# anterior, igual que los horarios.
+import copy
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from cambios import asignar, liberar
+from lista_espera import CLAVE_ESPERA, separar_clave
+
+ESPERA = float(os.environ.get("RESERVAS_ESPERA_MS", "500")) / 1000
+MAXIMO_CAMBIOS = int(os.environ.get("RESERVAS_MAXIMO_CAMBIOS", "20"))
+DURABILIDAD = os.environ.get("RESERVAS_DURABILIDAD", "diario")  # "diario" o "ninguna"
+
+
+class BufferEscritura:
+    def __init__(self, guardar, diario=None, espera=ESPERA, maximo=MAXIMO_CAMBIOS, confirmar_al_guardar=True,
+                 validar=None):
+        self.guardar = guardar  # guardar(reservas): una escritura completa
+        # validar(sala, fecha, hora, usuario): motivo por el que una reserva
+        # del diario ya no se puede hacer, o None
+        self.validar = validar
+        self.diario = diario if DURABILIDAD == "diario" else None
+        self.espera = espera
+        self.maximo = maximo
+        self.confirmar_al_guardar = confirmar_al_guardar
+        # Reentrante: guardar() y las mutaciones pueden volver a anotar
+        self.candado = threading.RLock()
+        self.reservas = None
+        self.pendientes = 0
+        self.guardados = 0
+        # Última falla de un guardado en segundo plano. Mientras haya una, no
+        # se reintenta solo: los cambios esperan en el diario
+        self.error = None
+        # Hay operaciones de antes que todavía no se aplicaron sobre el estado
+        # del servidor: no se guarda nada hasta recuperar()
+        self.suspendido = False
+        self._espera_anotada = None
+        self._temporizador = None
+        self._ignorar = False
+        self._operacion = None  # (id, nombre) de la mutación en curso
+        # ids de las operaciones en el diario, para en_cola() sin releerlo;
+        # None hasta la primera consulta, que lo lee una vez
+        self._en_diario = None
+
+    # Reservas que se guardan (el mismo diccionario durante toda la sesión)
+    def vincular(self, reservas):
+        with self.candado:
+            self.reservas = reservas
+            self._espera_anotada = copy.deepcopy(reservas.get(CLAVE_ESPERA, {}))
+
+    # Suscriptor de cambios.py
+    def registrar(self, sala, fecha, hora, anterior, nuevo):
+        if sala is None or self.reservas is None:
+            return  # Una recarga no es un cambio a guardar
+        with self.candado:
+            if not self._ignorar:
+                self._anotar({"cambio": [sala, fecha, hora, anterior, nuevo]})
+
+    # Aplicar cambios que ya están guardados (por ejemplo, los que llegan del
+    # servidor) sin anotarlos para volver a guardarlos
+    @contextmanager
+    def sin_anotar(self):
+        with self.candado:
+            anterior = self._ignorar
+            self._ignorar = True
+            try:
+                yield
+            finally:
+                self._ignorar = anterior
+
+    # Anotar las colas de espera que cambiaron desde la última vez, cada una
+    # con su valor anterior (una cola vacía y una que no está son lo mismo)
+    def anotar(self):
+        with self.candado:
+            if self.reservas is None:
+                return
+            espera = self.reservas.get(CLAVE_ESPERA, {})
+            if espera == self._espera_anotada:
+                return
+            anotada = self._espera_anotada or {}
+            cambios = [[clave, anotada.get(clave) or [], espera.get(clave) or []]
+                       for clave in sorted(set(anotada) | set(espera))
+                       if (anotada.get(clave) or []) != (espera.get(clave) or [])]
+            self._espera_anotada = copy.deepcopy(espera)
+            for clave, anterior, nueva in cambios:
+                self._anotar({"cola": [clave, copy.deepcopy(anterior), copy.deepcopy(nueva)]})
+
+    # Decorador para las funciones que modifican reservas: las ejecuta con el
+    # candado tomado (el guardado en segundo plano espera a que terminen) y
+    # agrupa sus cambios en una operación
+    def mutacion(self, funcion):
+        nombre = funcion.__name__.replace("_", " ")
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with self.candado:
+                externa = self._operacion
+                if externa is None:
+                    self._operacion = (time.time_ns(), nombre)
+                try:
+                    return funcion(*args, **kwargs)
+                finally:
+                    self.anotar()
+                    self._operacion = externa
+        return envoltura
+
+    def _anotar(self, entrada):
+        with self.candado:
+            if self.diario:
+                entrada["op"], entrada["nombre"] = self._operacion or (time.time_ns(), "cambio")
+                with open(self.diario, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entrada, ensure_ascii=False) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                if self._en_diario is not None:
+                    self._en_diario.add(entrada["op"])
+            self.pendientes += 1
+            if self.error or self.suspendido:
+                return  # Sin conexión: se envía al reconectar
+            if self.pendientes >= self.maximo:
+                self.vaciar()
+            else:
+                self._programar()
+
+    def _programar(self):
+        if self._temporizador:
+            self._temporizador.cancel()
+        self._temporizador = threading.Timer(self.espera, self._vaciar_en_segundo_plano)
+        self._temporizador.daemon = True
+        self._temporizador.start()
+
+    # Si el guardado falla, los cambios siguen pendientes (y en el diario)
+    # hasta el próximo intento
+    def _vaciar_en_segundo_plano(self):
+        try:
+            self.vaciar()
+        except Exception as e:
+            self.error = e
+
+    # Guardar ya todo lo pendiente
+    def vaciar(self):
+        with self.candado:
+            if self._temporizador:
+                self._temporizador.cancel()
+                self._temporizador = None
+            if not self.pendientes or self.suspendido:
+                return False
+            confirmado = self.guardar(self.reservas) is not False  # False: no llegó al servidor
+            self.pendientes = 0
+            self.error = None
+            self.guardados += 1
+            if confirmado and self.confirmar_al_guardar:
+                self.confirmar()
+            return True
+
+    # No guardar hasta que recuperar() aplique el diario sobre datos frescos
+    def suspender(self):
+        with self.candado:
+            self.suspendido = True
+            if self._temporizador:
+                self._temporizador.cancel()
+                self._temporizador = None
+
+    # El servidor tiene todo lo del diario
+    def confirmar(self):
+        with self.candado:
+            if self.diario and os.path.exists(self.diario):
+                os.remove(self.diario)
+            self._en_diario = set()
+
+    def _leer_diario(self):
+        operaciones = {}  # id -> {"nombre", "cambios", "colas"} en orden de llegada
+        if not self.diario or not os.path.exists(self.diario):
+            return operaciones
+        with open(self.diario, "r", encoding="utf-8") as f:
+            for linea in f:
+                try:
+                    entrada = json.loads(linea)
+                except ValueError:
+                    break  # Última línea a medio escribir
+                operacion = operaciones.setdefault(entrada["op"], {"nombre": entrada["nombre"], "cambios": [],
+                                                                  "colas": []})
+                if "cambio" in entrada:
+                    operacion["cambios"].append(entrada["cambio"])
+                else:
+                    operacion["colas"].append(entrada["cola"])
+        return operaciones
+
+    # Cantidad de operaciones que el servidor todavía no confirmó
+    def en_cola(self):
+        with self.candado:
+            if self._en_diario is None:
+                self._en_diario = set(self._leer_diario())
+            return len(self._en_diario)
+
+    # Volver a aplicar en orden las operaciones del diario sobre las reservas
+    # vinculadas (recién leídas del servidor o de la copia local) y guardar.
+    # Una operación se rechaza entera si alguno de sus horarios o de sus colas
+    # de espera ya no tiene el valor que tenía cuando se hizo (ni el que dejó
+    # la operación). Devuelve
+    # (cantidad aplicada, lista de rechazos explicados).
+    def recuperar(self):
+        with self.sin_anotar():
+            self.suspendido = False
+            operaciones = self._leer_diario()
+            if not operaciones:
+                self.confirmar()  # Diario vacío o ilegible desde el principio
+                return 0, []
+            aceptadas = set()
+            rechazos = []
+            for id_op, operacion in operaciones.items():
+                conflicto = self._aplicar_operacion(operacion)
+                if conflicto:
+                    rechazos.append(f"{operacion['nombre'].capitalize()}: {conflicto}")
+                else:
+                    aceptadas.add(id_op)
+            self._espera_anotada = copy.deepcopy(self.reservas.get(CLAVE_ESPERA, {}))
+            if rechazos:
+                self._reescribir_diario(aceptadas)
+            self.pendientes += len(operaciones)
+            self.vaciar()
+        return len(aceptadas), rechazos
+
+    def _aplicar_operacion(self, operacion):
+        propuesto = {}  # Horarios como quedarían tras la operación
+        for sala, fecha, hora, anterior, nuevo in operacion["cambios"]:
+            clave = (sala, fecha, hora)
+            actual = propuesto.get(clave, self.reservas.get(sala, {}).get(fecha, {}).get(hora))
+            if actual == anterior or actual == nuevo:
+                propuesto[clave] = nuevo
+            else:
+                return (f"{sala} {fecha} {hora} se esperaba {anterior or 'libre'} "
+                        f"y ahora está {actual or 'libre'}")
+        esperas = self.reservas.get(CLAVE_ESPERA, {})
+        colas = {}  # Colas de espera como quedarían tras la operación
+        for clave, anterior, nueva in operacion["colas"]:
+            actual = colas.get(clave, esperas.get(clave) or [])
+            if actual == anterior or actual == nueva:
+                colas[clave] = nueva
+            else:
+                sala, fecha, hora = separar_clave(clave)
+                return f"la lista de espera de {sala} {fecha} {hora} cambió mientras tanto"
+        # Primero se liberan los horarios, así una reserva que se mueve no
+        # cuenta dos veces al validar; si una no pasa, se deshace la operación
+        aplicados = []  # (sala, fecha, hora, usuario anterior)
+        for (sala, fecha, hora), usuario in sorted(propuesto.items(), key=lambda par: par[1] is not None):
+            actual = self.reservas.get(sala, {}).get(fecha, {}).get(hora)
+            if usuario == actual:
+                continue
+            motivo = usuario is not None and self.validar and self.validar(sala, fecha, hora, usuario)
+            if motivo:
+                for sala, fecha, hora, anterior in reversed(aplicados):
+                    self._poner(sala, fecha, hora, anterior)
+                return motivo
+            self._poner(sala, fecha, hora, usuario)
+            aplicados.append((sala, fecha, hora, actual))
+        for clave, cola in colas.items():
+            if cola:
+                self.reservas.setdefault(CLAVE_ESPERA, {})[clave] = cola
+            else:
+                esperas.pop(clave, None)
+        if CLAVE_ESPERA in self.reservas and not self.reservas[CLAVE_ESPERA]:
+            del self.reservas[CLAVE_ESPERA]
+        return None
+
+    def _poner(self, sala, fecha, hora, usuario):
+        if usuario is not None:
+            asignar(self.reservas, sala, fecha, hora, usuario)
+        elif hora in self.reservas.get(sala, {}).get(fecha, {}):
+            liberar(self.reservas, sala, fecha, hora)
+
+    # Dejar en el diario solo las operaciones aceptadas (las rechazadas no se
+    # vuelven a intentar)
+    def _reescribir_diario(self, aceptadas):
+        temporal = self.diario + ".tmp"
+        with open(self.diario, "r", encoding="utf-8") as f, open(temporal, "w", encoding="utf-8") as nuevo:
+            for linea in f:
+                try:
+                    if json.loads(linea)["op"] in aceptadas:
+                        nuevo.write(linea)
+                except ValueError:
+                    break
+            nuevo.flush()
+            os.fsync(nuevo.fileno())
+        os.replace(temporal, self.diario)
+        if self._en_diario is not None:
+            self._en_diario &= aceptadas
@@ -0,0 +1,467 @@
+# Firestore en memoria para pruebas y benchmarks sin red
+#
+# Implementa el subconjunto del cliente de Firestore que usan los scripts:
+# collection / document / stream / get / add / set / update / delete /
+# batch / transaction / where / order_by / limit / on_snapshot, y la versión
+# asíncrona de AsyncClient (ClienteAsyncFalso). Cada llamada
+# que en el cliente real sería un viaje al servidor (RPC) puede sumar una
+# latencia fija y fallar con una probabilidad dada, con una semilla para que
+# las corridas sean repetibles.
+#
+# Se activa en Reservas-v6-2.py con RESERVAS_FIRESTORE=falso
+# (RESERVAS_LATENCIA_MS, RESERVAS_FALLOS y RESERVAS_DATOS_FALSOS lo configuran).
+import asyncio
+import copy
+import itertools
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+ASCENDENTE = "ASCENDING"
+DESCENDENTE = "DESCENDING"
+
+OPERADORES = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a is not None and a < b,
+    "<=": lambda a, b: a is not None and a <= b,
+    ">": lambda a, b: a is not None and a > b,
+    ">=": lambda a, b: a is not None and a >= b,
+    "in": lambda a, b: a in b,
+    "not-in": lambda a, b: a not in b,
+    "array_contains": lambda a, b: isinstance(a, list) and b in a,
+}
+
+
+class ErrorFalso(Exception):
+    # Falla inyectada (equivale a ServiceUnavailable en el cliente real)
+    pass
+
+
+class TransaccionAbortada(ErrorFalso):
+    # Otro cliente modificó un documento leído dentro de la transacción
+    pass
+
+
+class Snapshot:
+    def __init__(self, referencia, datos, version):
+        self.reference = referencia
+        self.id = referencia.id
+        self._datos = datos
+        self.exists = datos is not None
+        self.version = version
+
+    def to_dict(self):
+        return copy.deepcopy(self._datos) if self._datos is not None else None
+
+    def get(self, campo):
+        return (self._datos or {}).get(campo)
+
+
+class Referencia:
+    def __init__(self, cliente, coleccion, id_doc):
+        self._cliente = cliente
+        self.coleccion = coleccion
+        self.id = id_doc
+        self.path = f"{coleccion}/{id_doc}"
+
+    def get(self, transaction=None):
+        if transaction is not None:
+            return transaction.get(self)
+        self._cliente._rpc("get")
+        return self._cliente._leer(self)
+
+    def set(self, datos, merge=False):
+        self._cliente._rpc("commit")
+        self._cliente._aplicar([("set", self, datos, merge)])
+
+    def update(self, datos):
+        self._cliente._rpc("commit")
+        self._cliente._aplicar([("update", self, datos, False)])
+
+    def delete(self):
+        self._cliente._rpc("commit")
+        self._cliente._aplicar([("delete", self, None, False)])
+
+
+class Consulta:
+    def __init__(self, cliente, coleccion, filtros=(), orden=(), tope=None):
+        self._cliente = cliente
+        self._coleccion = coleccion
+        self._filtros = tuple(filtros)
+        self._orden = tuple(orden)
+        self._tope = tope
+
+    def where(self, campo=None, operador=None, valor=None, filter=None):
+        if filter is not None:  # where(filter=FieldFilter(...))
+            campo, operador, valor = filter.field_path, filter.op_string, filter.value
+        return self._consulta(self._cliente, self._coleccion, self._filtros + ((campo, operador, valor),),
+                              self._orden, self._tope)
+
+    def order_by(self, campo, direction=ASCENDENTE):
+        return self._consulta(self._cliente, self._coleccion, self._filtros,
+                              self._orden + ((campo, direction),), self._tope)
+
+    def limit(self, cantidad):
+        return self._consulta(self._cliente, self._coleccion, self._filtros, self._orden, cantidad)
+
+    def _coincide(self, datos):
+        return all(OPERADORES[op](datos.get(campo), valor) for campo, op, valor in self._filtros)
+
+    def _resultados(self):
+        documentos = self._cliente._documentos(self._coleccion)
+        resultado = [(id_doc, datos, version) for id_doc, (datos, version) in documentos
+                     if self._coincide(datos)]
+        for campo, direccion in reversed(self._orden):
+            resultado.sort(key=lambda d: (d[1].get(campo) is None, d[1].get(campo)),
+                           reverse=direccion == DESCENDENTE)
+        if self._tope is not None:
+            resultado = resultado[:self._tope]
+        return [Snapshot(self._referencia(self._cliente, self._coleccion, id_doc), copy.deepcopy(datos), version)
+                for id_doc, datos, version in resultado]
+
+    def stream(self, transaction=None):
+        self._cliente._rpc("stream")
+        resultados = self._resultados()
+        self._cliente._contar("lecturas", max(1, len(resultados)))
+        for snapshot in resultados:
+            self._cliente._demorar_documento()
+            if transaction is not None:
+                transaction._leidos[snapshot.reference.path] = snapshot.version
+            yield snapshot
+
+    def get(self, transaction=None):
+        return list(self.stream(transaction))
+
+    def on_snapshot(self, callback):
+        return self._cliente._escuchar(self, callback)
+
+
+Consulta._consulta = Consulta
+Consulta._referencia = Referencia
+
+
+class Coleccion(Consulta):
+    def __init__(self, cliente, nombre):
+        super().__init__(cliente, nombre)
+        self.id = nombre
+
+    def document(self, id_doc=None):
+        return self._referencia(self._cliente, self._coleccion, id_doc or uuid.uuid4().hex[:20])
+
+    def add(self, datos, document_id=None):
+        referencia = self.document(document_id)
+        referencia.set(datos)
+        return time.time(), referencia
+
+
+class Batch:
+    def __init__(self, cliente):
+        self._cliente = cliente
+        self._operaciones = []
+
+    def set(self, referencia, datos, merge=False):
+        self._operaciones.append(("set", referencia, datos, merge))
+
+    def update(self, referencia, datos):
+        self._operaciones.append(("update", referencia, datos, False))
+
+    def delete(self, referencia):
+        self._operaciones.append(("delete", referencia, None, False))
+
+    def commit(self):
+        if len(self._operaciones) > 500:
+            raise ErrorFalso("Un batch no puede tener más de 500 operaciones")
+        self._cliente._rpc("commit")
+        self._cliente._aplicar(self._operaciones)
+        self._operaciones = []
+
+
+class Transaccion(Batch):
+    def __init__(self, cliente):
+        super().__init__(cliente)
+        self._leidos = {}  # path -> versión leída
+
+    def get(self, referencia_o_consulta):
+        if isinstance(referencia_o_consulta, Consulta):
+            return referencia_o_consulta.stream(transaction=self)
+        self._cliente._rpc("get")
+        snapshot = self._cliente._leer(referencia_o_consulta)
+        self._leidos[referencia_o_consulta.path] = snapshot.version
+        return snapshot
+
+    def commit(self):
+        self._cliente._rpc("commit")
+        self._cliente._aplicar(self._operaciones, self._leidos)
+        self._operaciones = []
+
+
+# Equivalente de firestore.transactional: reintenta si hubo conflicto
+def transaccional(funcion, intentos=5):
+    def envoltura(transaccion, *args, **kwargs):
+        for intento in range(intentos):
+            transaccion._operaciones = []
+            transaccion._leidos = {}
+            resultado = funcion(transaccion, *args, **kwargs)
+            try:
+                transaccion.commit()
+                return resultado
+            except TransaccionAbortada:
+                if intento == intentos - 1:
+                    raise
+    return envoltura
+
+
+class Escucha:
+    def __init__(self, cliente, consulta, callback):
+        self._cliente = cliente
+        self.consulta = consulta
+        self.callback = callback
+        self.vistos = {}  # id -> versión
+
+    def unsubscribe(self):
+        self._cliente._dejar_de_escuchar(self)
+
+
+class ClienteFalso:
+    def __init__(self, latencia=0.0, latencia_por_documento=0.0, fallos=0.0, semilla=0, latencias=None):
+        self.latencia = latencia
+        self.latencias = latencias or {}  # Latencia por tipo de RPC (stream, get, commit)
+        self.latencia_por_documento = latencia_por_documento
+        self.fallos = fallos
+        self._azar = random.Random(semilla)
+        self._candado = threading.RLock()
+        self._datos = {}  # colección -> {id: (datos, versión)}
+        self._versiones = itertools.count(1)
+        self._escuchas = []
+        self.contadores = {"rpc": 0, "lecturas": 0, "escrituras": 0, "borrados": 0, "fallos": 0}
+
+    # API pública del cliente
+    def collection(self, nombre):
+        return Coleccion(self, nombre)
+
+    def document(self, ruta):
+        coleccion, id_doc = ruta.split("/", 1)
+        return Referencia(self, coleccion, id_doc)
+
+    def batch(self):
+        return Batch(self)
+
+    def transaction(self):
+        return Transaccion(self)
+
+    def close(self):
+        pass
+
+    # Internos: latencia, fallas y contadores
+    def _contar(self, nombre, cantidad=1):
+        with self._candado:
+            self.contadores[nombre] += cantidad
+
+    def _sortear(self, tipo):
+        self._contar("rpc")
+        with self._candado:
+            falla = self.fallos and self._azar.random() < self.fallos
+        return self.latencias.get(tipo, self.latencia), falla
+
+    def _fallar(self, tipo):
+        self._contar("fallos")
+        raise ErrorFalso(f"Falla inyectada en {tipo}")
+
+    def _rpc(self, tipo):
+        demora, falla = self._sortear(tipo)
+        if demora:
+            time.sleep(demora)
+        if falla:
+            self._fallar(tipo)
+
+    # Igual que _rpc pero sin bloquear el bucle de asyncio
+    async def _rpc_async(self, tipo):
+        demora, falla = self._sortear(tipo)
+        if demora:
+            await asyncio.sleep(demora)
+        if falla:
+            self._fallar(tipo)
+
+    def _demorar_documento(self):
+        if self.latencia_por_documento:
+            time.sleep(self.latencia_por_documento)
+
+    def _documentos(self, coleccion):
+        with self._candado:
+            return list(self._datos.get(coleccion, {}).items())
+
+    def _leer(self, referencia):
+        self._contar("lecturas")
+        with self._candado:
+            datos, version = self._datos.get(referencia.coleccion, {}).get(referencia.id, (None, 0))
+        return Snapshot(referencia, copy.deepcopy(datos), version)
+
+    def _aplicar(self, operaciones, leidos=None):
+        with self._candado:
+            # En una transacción, abortar si algo leído cambió
+            for ruta, version in (leidos or {}).items():
+                coleccion, id_doc = ruta.split("/", 1)
+                if self._datos.get(coleccion, {}).get(id_doc, (None, 0))[1] != version:
+                    raise TransaccionAbortada(ruta)
+            for tipo, referencia, datos, merge in operaciones:
+                documentos = self._datos.setdefault(referencia.coleccion, {})
+                if tipo == "delete":
+                    documentos.pop(referencia.id, None)
+                    self.contadores["borrados"] += 1
+                    continue
+                actual = documentos.get(referencia.id, (None, 0))[0]
+                if tipo == "update" and actual is None:
+                    raise ErrorFalso(f"No existe {referencia.path}")
+                nuevo = dict(actual or {}) if (merge or tipo == "update") else {}
+                nuevo.update(copy.deepcopy(datos))
+                documentos[referencia.id] = (nuevo, next(self._versiones))
+                self.contadores["escrituras"] += 1
+            escuchas = list(self._escuchas)
+        for escucha in escuchas:
+            self._notificar(escucha)
+
+    # Listeners: se llaman en el mismo hilo, después de aplicar el cambio
+    def _escuchar(self, consulta, callback):
+        escucha = Escucha(self, consulta, callback)
+        with self._candado:
+            self._escuchas.append(escucha)
+        self._notificar(escucha)
+        return escucha
+
+    def _dejar_de_escuchar(self, escucha):
+        with self._candado:
+            if escucha in self._escuchas:
+                self._escuchas.remove(escucha)
+
+    def _notificar(self, escucha):
+        actuales = escucha.consulta._resultados()
+        cambios = []
+        ids = set()
+        for snapshot in actuales:
+            ids.add(snapshot.id)
+            previa = escucha.vistos.get(snapshot.id)
+            if previa is None:
+                cambios.append(SimpleNamespace(type=SimpleNamespace(name="ADDED"), document=snapshot))
+            elif previa[0] != snapshot.version:
+                cambios.append(SimpleNamespace(type=SimpleNamespace(name="MODIFIED"), document=snapshot))
+        for id_doc, (version, snapshot) in list(escucha.vistos.items()):
+            if id_doc not in ids:
+                cambios.insert(0, SimpleNamespace(type=SimpleNamespace(name="REMOVED"), document=snapshot))
+        escucha.vistos = {s.id: (s.version, s) for s in actuales}
+        if cambios:
+            self._contar("lecturas", len(cambios))
+            escucha.callback(actuales, cambios, time.time())
+
+
+# Versión asíncrona (como AsyncClient): mismas colecciones, latencias y
+# contadores que el ClienteFalso que envuelve, pero las RPC son corrutinas y
+# stream() es un generador asíncrono
+class ReferenciaAsync(Referencia):
+    async def get(self, transaction=None):
+        await self._cliente._rpc_async("get")
+        return self._cliente._leer(self)
+
+    async def set(self, datos, merge=False):
+        await self._cliente._rpc_async("commit")
+        self._cliente._aplicar([("set", self, datos, merge)])
+
+    async def update(self, datos):
+        await self._cliente._rpc_async("commit")
+        self._cliente._aplicar([("update", self, datos, False)])
+
+    async def delete(self):
+        await self._cliente._rpc_async("commit")
+        self._cliente._aplicar([("delete", self, None, False)])
+
+
+class ConsultaAsync(Consulta):
+    _referencia = ReferenciaAsync
+
+    async def stream(self, transaction=None):
+        await self._cliente._rpc_async("stream")
+        resultados = self._resultados()
+        self._cliente._contar("lecturas", max(1, len(resultados)))
+        demora = 0.0
+        for snapshot in resultados:
+            # La demora por documento se acumula: el bucle no duerme menos de ~1 ms
+            demora += self._cliente.latencia_por_documento
+            if demora >= 0.001:
+                await asyncio.sleep(demora)
+                demora = 0.0
+            yield snapshot
+
+    async def get(self, transaction=None):
+        return [snapshot async for snapshot in self.stream()]
+
+
+ConsultaAsync._consulta = ConsultaAsync
+
+
+class ColeccionAsync(ConsultaAsync, Coleccion):
+    async def add(self, datos, document_id=None):
+        referencia = self.document(document_id)
+        await referencia.set(datos)
+        return time.time(), referencia
+
+
+class BatchAsync(Batch):
+    async def commit(self):
+        if len(self._operaciones) > 500:
+            raise ErrorFalso("Un batch no puede tener más de 500 operaciones")
+        await self._cliente._rpc_async("commit")
+        self._cliente._aplicar(self._operaciones)
+        self._operaciones = []
+
+
+class ClienteAsyncFalso:
+    def __init__(self, cliente):
+        self.sincronico = cliente
+
+    def collection(self, nombre):
+        return ColeccionAsync(self.sincronico, nombre)
+
+    def document(self, ruta):
+        coleccion, id_doc = ruta.split("/", 1)
+        return ReferenciaAsync(self.sincronico, coleccion, id_doc)
+
+    def batch(self):
+        return BatchAsync(self.sincronico)
+
+    def close(self):
+        pass
+
+
+# Cliente configurado con variables de entorno (un único cliente por proceso)
+_compartido = None
+
+
+def cliente_compartido():
+    global _compartido
+    if _compartido is None:
+        _compartido = ClienteFalso(
+            latencia=float(os.environ.get("RESERVAS_LATENCIA_MS", "0")) / 1000,
+            fallos=float(os.environ.get("RESERVAS_FALLOS", "0")),
+            semilla=int(os.environ.get("RESERVAS_SEMILLA", "0")),
+        )
+        datos = os.environ.get("RESERVAS_DATOS_FALSOS")
+        if datos:
+            with open(datos, "r") as f:
+                cargar_reservas(_compartido, json.load(f))
+    return _compartido
+
+
+# Poblar el cliente con reservas en formato sala -> fecha -> hora -> usuario
+def cargar_reservas(cliente, reservas, coleccion="reservas"):
+    documentos = cliente._datos.setdefault(coleccion, {})
+    for sala, fechas in reservas.items():
+        if sala.startswith("_"):
+            continue
+        for fecha, horas in fechas.items():
+            for hora, usuario in horas.items():
+                datos = {"sala": sala, "fecha": fecha, "hora": hora, "usuario": usuario}
+                documentos[uuid.uuid4().hex[:20]] = (datos, next(cliente._versiones))
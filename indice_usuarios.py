@@ -0,0 +1,150 @@
+# Índice de usuarios para buscar por parte del nombre
+#
+# Los nombres se normalizan (minúsculas, sin tildes, espacios simples) y se
+# guardan en un trie, una vez desde cada palabra del nombre ("juan sanchez" y
+# "sanchez"; también separadas por - _ .), así que "san" encuentra a Juan
+# Sanchez. buscar() recorre el trie llevando la fila de distancias de
+# Levenshtein contra el texto buscado y corta las ramas que ya no pueden
+# quedar a `tolerancia` errores o menos: con pocas letras devuelve los que
+# empiezan así y tolera errores de tipeo.
+#
+# Se arma en una sola pasada sobre las reservas y se mantiene al día con
+# cambios.py (un usuario sale del índice cuando ya no tiene horas reservadas).
+import re
+import unicodedata
+from collections import Counter
+
+from cambios import suscribir
+
+LIMITE = 8  # Coincidencias que se muestran por búsqueda
+SEPARADORES = re.compile(r"[ \-_.]+")
+
+
+def normalizar(nombre):
+    sin_tildes = "".join(c for c in unicodedata.normalize("NFKD", nombre) if not unicodedata.combining(c))
+    return " ".join(sin_tildes.lower().split())
+
+
+# Errores de tipeo tolerados según el largo del texto buscado
+def tolerancia_para(texto):
+    return 0 if len(texto) <= 2 else 1 if len(texto) <= 5 else 2
+
+
+class _Nodo:
+    __slots__ = ("hijos", "usuarios")
+
+    def __init__(self):
+        self.hijos = {}
+        self.usuarios = set()  # Usuarios cuyo nombre (o una de sus palabras) termina aquí
+
+
+class IndiceUsuarios:
+    def __init__(self):
+        self.listo = False
+        self._limpiar()
+
+    def _limpiar(self):
+        self.raiz = _Nodo()
+        self.horas = Counter()  # usuario -> horas reservadas
+
+    # Construir el índice recorriendo las reservas una sola vez
+    def construir(self, reservas, salas):
+        self._limpiar()
+        self.horas.update(usuario for sala in salas
+                          for horas in reservas.get(sala, {}).values()
+                          for usuario in horas.values())
+        for usuario in self.horas:
+            self._insertar(usuario)
+        self.listo = True
+
+    def asegurar(self, reservas, salas):
+        if not self.listo:
+            self.construir(reservas, salas)
+
+    # Suscriptor de cambios.py
+    def actualizar(self, sala, fecha, hora, anterior, nuevo):
+        if sala is None:
+            self.listo = False  # Recarga completa: hay que reconstruir
+            return
+        if not self.listo:
+            return
+        if anterior is not None:
+            self.horas[anterior] -= 1
+            if self.horas[anterior] <= 0:
+                del self.horas[anterior]
+                self._quitar(anterior)
+        if nuevo is not None:
+            self.horas[nuevo] += 1
+            if self.horas[nuevo] == 1:
+                self._insertar(nuevo)
+
+    def _entradas(self, usuario):
+        nombre = normalizar(usuario)
+        inicios = [0] + [separador.end() for separador in SEPARADORES.finditer(nombre)]
+        return {nombre[inicio:] for inicio in inicios if inicio < len(nombre)}
+
+    def _insertar(self, usuario):
+        for entrada in self._entradas(usuario):
+            nodo = self.raiz
+            for letra in entrada:
+                nodo = nodo.hijos.setdefault(letra, _Nodo())
+            nodo.usuarios.add(usuario)
+
+    def _quitar(self, usuario):
+        for entrada in self._entradas(usuario):
+            nodo = self.raiz
+            for letra in entrada:
+                nodo = nodo.hijos.get(letra)
+                if nodo is None:
+                    break
+            else:
+                nodo.usuarios.discard(usuario)
+
+    # Hasta `cantidad` usuarios bajo `nodo`, en orden alfabético
+    def _debajo(self, nodo, cantidad, encontrados):
+        for usuario in sorted(nodo.usuarios):
+            if len(encontrados) >= cantidad:
+                return
+            if usuario not in encontrados:  # Puede estar también por otra de sus palabras
+                encontrados.append(usuario)
+        for letra in sorted(nodo.hijos):
+            if len(encontrados) >= cantidad:
+                return
+            self._debajo(nodo.hijos[letra], cantidad, encontrados)
+
+    # Usuarios cuyo nombre (o una palabra del nombre) empieza con `texto`,
+    # admitiendo hasta `tolerancia` errores. Los de menos errores primero.
+    # Sin texto devuelve todos, en orden alfabético y sin límite.
+    def buscar(self, texto, limite=LIMITE, tolerancia=None):
+        buscado = normalizar(texto)
+        if not buscado:
+            return sorted(self.horas)
+        if tolerancia is None:
+            tolerancia = tolerancia_para(buscado)
+        coincidencias = []  # (distancia, profundidad, nodo)
+        fila = list(range(len(buscado) + 1))
+        self._recorrer(self.raiz, buscado, fila, tolerancia, 0, coincidencias)
+        distancias = {}
+        for distancia, _, nodo in sorted(coincidencias, key=lambda c: (c[0], -c[1])):
+            encontrados = []
+            self._debajo(nodo, limite, encontrados)
+            for usuario in encontrados:
+                distancias.setdefault(usuario, distancia)
+        return sorted(distancias, key=lambda usuario: (distancias[usuario], usuario))[:limite]
+
+    def _recorrer(self, nodo, buscado, fila, tolerancia, profundidad, coincidencias):
+        if fila[-1] <= tolerancia:
+            coincidencias.append((fila[-1], profundidad, nodo))
+            if fila[-1] == 0:
+                return  # Lo de abajo ya está incluido sin errores
+        if min(fila) > tolerancia:
+            return
+        for letra, hijo in nodo.hijos.items():
+            siguiente = [fila[0] + 1]
+            for i, esperada in enumerate(buscado, 1):
+                siguiente.append(min(siguiente[i - 1] + 1, fila[i] + 1, fila[i - 1] + (letra != esperada)))
+            self._recorrer(hijo, buscado, siguiente, tolerancia, profundidad + 1, coincidencias)
+
+
+INDICE = IndiceUsuarios()
+suscribir(INDICE.actualizar)
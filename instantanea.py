@@ -0,0 +1,224 @@
+# Instantánea binaria de reservas6.json para arrancar sin leer el JSON
+#
+# Formato (little-endian):
+#   - cabecera (CABECERA): firma, versión, cantidades, posición de cada
+#     sección y tamaño y mtime del reservas6.json del que salió,
+#   - tabla de cadenas: posiciones (uint32, una más que cadenas) y los textos
+#     en UTF-8 seguidos; primero las horas, luego las salas y los usuarios,
+#   - índice: una entrada (sala, día, primer registro, fin) por sala y día
+#     con reservas, ordenado por (sala, día),
+#   - registros de ancho fijo (sala, día, hora, usuario) como en columnar.py,
+#     ordenados por (sala, día, hora),
+#   - extra: la lista de espera, en JSON.
+#
+# Instantanea mapea el archivo con mmap y responde reservas.get(sala).get(fecha)
+# con una búsqueda binaria en el índice y los registros de ese día: armar la
+# tabla de una semana lee cinco tramos del archivo y unos pocos nombres, sin
+# cargar el resto, así que el primer cuadro no depende del tamaño del
+# historial. Solo se usa si el tamaño y el mtime de reservas6.json coinciden
+# con los guardados (vigente()).
+#
+#   python instantanea.py a-binario reservas6.json reservas6.bin
+#   python instantanea.py a-json reservas6.bin reservas6.json
+import argparse
+import bisect
+import json
+import mmap
+import os
+import struct
+from datetime import date
+from itertools import groupby
+
+from columnar import AlmacenColumnar
+from lista_espera import CLAVE_ESPERA
+
+FIRMA = b"RSV6"
+VERSION = 1
+# firma, versión, horas, salas, cadenas, entradas del índice, registros,
+# posición de cadenas / índice / registros / extra, largo de extra, tamaño
+# y mtime (ns) del JSON
+CABECERA = struct.Struct("<4sHHIIIIIIIIIQQ")
+POSICION = struct.Struct("<I")
+INDICE = struct.Struct("<HIII")     # sala, día, primer registro, fin (excluido)
+CLAVE_INDICE = struct.Struct("<HI")
+REGISTRO = struct.Struct("<HIBI")   # sala, día, hora, usuario: 11 bytes
+
+
+# (tamaño, mtime en ns) de un archivo, o (0, 0) si no existe
+def firma_de(ruta):
+    try:
+        estado = os.stat(ruta)
+    except OSError:
+        return 0, 0
+    return estado.st_size, estado.st_mtime_ns
+
+
+# Escribir la instantánea de `reservas` (sala -> fecha -> hora -> usuario) en
+# `ruta`. `origen` es el JSON del que salen los datos, para saber después si
+# la instantánea sigue al día.
+def escribir(reservas, ruta, horas=(), origen=None):
+    # Las columnas ya quedan ordenadas por (sala, día, hora) y codificadas
+    columnas = AlmacenColumnar()
+    columnas.construir(reservas, [sala for sala in reservas if sala != CLAVE_ESPERA], horas)
+    codigos = columnas.codigos
+    indice = []
+    for (sala, dia), grupo in groupby(range(len(columnas)), key=lambda i: (columnas.sala[i], columnas.dia[i])):
+        inicio = fin = next(grupo)
+        for fin in grupo:
+            pass
+        indice.append(INDICE.pack(sala, dia, inicio, fin + 1))
+    cadenas = [texto.encode() for texto in codigos.horas + codigos.salas.nombres + codigos.usuarios.nombres]
+    posiciones, acumulado = [], 0
+    for texto in cadenas:
+        posiciones.append(acumulado)
+        acumulado += len(texto)
+    posiciones.append(acumulado)
+    extra = json.dumps({clave: valor for clave, valor in reservas.items() if clave == CLAVE_ESPERA}).encode()
+
+    seccion_cadenas = b"".join(POSICION.pack(posicion) for posicion in posiciones) + b"".join(cadenas)
+    seccion_indice = b"".join(indice)
+    seccion_registros = b"".join(REGISTRO.pack(*fila) for fila in zip(columnas.sala, columnas.dia, columnas.hora,
+                                                                      columnas.usuario))
+    inicio_cadenas = CABECERA.size
+    inicio_indice = inicio_cadenas + len(seccion_cadenas)
+    inicio_registros = inicio_indice + len(seccion_indice)
+    inicio_extra = inicio_registros + len(seccion_registros)
+    tamano, mtime = firma_de(origen) if origen else (0, 0)
+    cabecera = CABECERA.pack(FIRMA, VERSION, len(codigos.horas), len(codigos.salas), len(cadenas),
+                             len(indice), len(columnas), inicio_cadenas, inicio_indice, inicio_registros,
+                             inicio_extra, len(extra), tamano, mtime)
+
+    temporal = ruta + ".tmp"
+    with open(temporal, "wb") as f:
+        f.write(b"".join((cabecera, seccion_cadenas, seccion_indice, seccion_registros, extra)))
+    os.replace(temporal, ruta)
+
+
+# Horas reservadas de una sala en un día, leídas del archivo mapeado
+class _VistaSala:
+    __slots__ = ("instantanea", "sala")
+
+    def __init__(self, instantanea, sala):
+        self.instantanea = instantanea
+        self.sala = sala
+
+    def get(self, fecha, defecto=None):
+        return self.instantanea.dia(self.sala, fecha) or defecto
+
+
+class Instantanea:
+    def __init__(self, ruta):
+        with open(ruta, "rb") as f:
+            self.datos = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (firma, version, horas, salas, self.cantidad_cadenas, self.entradas, self.registros,
+             self.inicio_cadenas, self.inicio_indice, self.inicio_registros, self.inicio_extra,
+             self.largo_extra, *self.origen) = CABECERA.unpack_from(self.datos)
+        except struct.error:  # Más corto que la cabecera
+            firma = version = None
+        if firma != FIRMA or version != VERSION:
+            self.cerrar()
+            raise ValueError(f"{ruta} no es una instantánea de reservas")
+        self.origen = tuple(self.origen)
+        self._textos = self.inicio_cadenas + POSICION.size * (self.cantidad_cadenas + 1)
+        self._cadenas = {}  # índice -> texto, solo las que se leyeron
+        self.horas = [self.cadena(i) for i in range(horas)]
+        self.salas = {self.cadena(horas + i): i for i in range(salas)}
+        self.base_usuarios = horas + salas
+
+    def cerrar(self):
+        self.datos.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
+    def cadena(self, indice):
+        texto = self._cadenas.get(indice)
+        if texto is None:
+            inicio, fin = struct.unpack_from("<II", self.datos, self.inicio_cadenas + POSICION.size * indice)
+            texto = self._cadenas[indice] = self.datos[self._textos + inicio:self._textos + fin].decode()
+        return texto
+
+    def _clave_indice(self, posicion):
+        return CLAVE_INDICE.unpack_from(self.datos, self.inicio_indice + INDICE.size * posicion)
+
+    # {hora: usuario} de una sala y fecha (vacío si no hay reservas)
+    def dia(self, sala, fecha):
+        identificador = self.salas.get(sala)
+        if identificador is None:
+            return {}
+        clave = (identificador, date.fromisoformat(fecha).toordinal())
+        posicion = bisect.bisect_left(range(self.entradas), clave, key=self._clave_indice)
+        if posicion == self.entradas or self._clave_indice(posicion) != clave:
+            return {}
+        _, _, inicio, fin = INDICE.unpack_from(self.datos, self.inicio_indice + INDICE.size * posicion)
+        desde = self.inicio_registros + REGISTRO.size * inicio
+        horas = {}
+        for _, _, hora, usuario in REGISTRO.iter_unpack(self.datos[desde:desde + REGISTRO.size * (fin - inicio)]):
+            horas[self.horas[hora]] = self.cadena(self.base_usuarios + usuario)
+        return horas
+
+    # Como el diccionario anidado, para MotorTabla: reservas.get(sala, {}).get(fecha, {})
+    def get(self, sala, defecto=None):
+        return _VistaSala(self, sala) if sala in self.salas else defecto
+
+    # {sala: {fecha: {hora: usuario}}} solo con las fechas pedidas, como
+    # AlmacenColumnar.cuadricula
+    def cuadricula(self, sala, fechas):
+        return {sala: {fecha: horas for fecha in fechas if (horas := self.dia(sala, fecha))}}
+
+    # Todo el contenido como en reservas6.json (salas y lista de espera)
+    def a_anidado(self):
+        salas = {identificador: sala for sala, identificador in self.salas.items()}
+        reservas = {sala: {} for sala in self.salas}
+        fechas = {}
+        desde = self.inicio_registros
+        for sala, dia, hora, usuario in REGISTRO.iter_unpack(self.datos[desde:desde + REGISTRO.size * self.registros]):
+            fecha = fechas.get(dia)
+            if fecha is None:
+                fecha = fechas[dia] = date.fromordinal(dia).isoformat()
+            reservas[salas[sala]].setdefault(fecha, {})[self.horas[hora]] = self.cadena(self.base_usuarios + usuario)
+        reservas.update(json.loads(self.datos[self.inicio_extra:self.inicio_extra + self.largo_extra]))
+        return reservas
+
+
+# La instantánea de `ruta` si existe y se hizo desde la versión actual de
+# `origen`; si no, None
+def vigente(ruta, origen):
+    if not os.path.exists(ruta):
+        return None
+    try:
+        instantanea = Instantanea(ruta)
+    except (OSError, ValueError):
+        return None
+    if instantanea.origen != firma_de(origen):
+        instantanea.cerrar()
+        return None
+    return instantanea
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convertir reservas6.json a instantánea binaria y de vuelta")
+    parser.add_argument("sentido", choices=["a-binario", "a-json"])
+    parser.add_argument("entrada")
+    parser.add_argument("salida")
+    args = parser.parse_args()
+
+    if args.sentido == "a-binario":
+        with open(args.entrada) as f:
+            reservas = json.load(f)
+        horas = sorted({hora for sala, fechas in reservas.items() if sala != CLAVE_ESPERA
+                        for horas_dia in fechas.values() for hora in horas_dia})
+        escribir(reservas, args.salida, horas, origen=args.entrada)
+    else:
+        with Instantanea(args.entrada) as instantanea:
+            reservas = instantanea.a_anidado()
+        with open(args.salida, "w") as f:
+            json.dump(reservas, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
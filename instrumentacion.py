@@ -0,0 +1,141 @@
+# Instrumentación opcional de los caminos críticos
+#
+# Se activa con la variable de entorno RESERVAS_INSTRUMENTAR=1. Con la
+# instrumentación apagada, medido() devuelve la función original sin
+# envolver y tramo()/contar() vuelven de inmediato, así que el costo es
+# prácticamente nulo.
+#
+# Al salir se agrega un resumen de la sesión a metricas.jsonl y se escribe
+# metricas.prom (formato de texto de Prometheus) en el directorio indicado
+# por RESERVAS_METRICAS (por defecto, el directorio actual).
+import atexit
+import functools
+import json
+import os
+import subprocess
+import time
+from contextlib import contextmanager, nullcontext
+
+ACTIVO = os.environ.get("RESERVAS_INSTRUMENTAR") == "1"
+DIRECTORIO = os.environ.get("RESERVAS_METRICAS", ".")
+
+_NULO = nullcontext()
+_tramos = {}     # nombre -> [cantidad, segundos totales, máximo]
+_contadores = {}  # nombre -> valor
+_inicio_sesion = time.time()
+
+
+def _registrar_tramo(nombre, segundos):
+    datos = _tramos.get(nombre)
+    if datos is None:
+        _tramos[nombre] = [1, segundos, segundos]
+    else:
+        datos[0] += 1
+        datos[1] += segundos
+        if segundos > datos[2]:
+            datos[2] = segundos
+
+
+@contextmanager
+def _tramo_activo(nombre):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        _registrar_tramo(nombre, time.perf_counter() - inicio)
+
+
+# Medir un bloque: with tramo("guardar_datos"): ...
+def tramo(nombre):
+    if not ACTIVO:
+        return _NULO
+    return _tramo_activo(nombre)
+
+
+# Decorador que mide cada llamada a la función
+def medido(nombre=None):
+    def decorar(funcion):
+        if not ACTIVO:
+            return funcion
+        etiqueta = nombre or funcion.__name__
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                _registrar_tramo(etiqueta, time.perf_counter() - inicio)
+        return envoltura
+    return decorar
+
+
+# Sumar a un contador (documentos leídos, bytes serializados, ...)
+def contar(nombre, cantidad=1):
+    if ACTIVO:
+        _contadores[nombre] = _contadores.get(nombre, 0) + cantidad
+
+
+# subprocess.run que además cuenta procesos y su tiempo de pared
+def ejecutar(argumentos, **kwargs):
+    if not ACTIVO:
+        return subprocess.run(argumentos, **kwargs)
+    inicio = time.perf_counter()
+    try:
+        return subprocess.run(argumentos, **kwargs)
+    finally:
+        segundos = time.perf_counter() - inicio
+        contar("subprocesos")
+        contar("subprocesos_segundos", segundos)
+        _registrar_tramo("subproceso " + " ".join(argumentos[:2]), segundos)
+
+
+def resumen():
+    return {
+        "inicio": _inicio_sesion,
+        "duracion_s": round(time.time() - _inicio_sesion, 3),
+        "pid": os.getpid(),
+        "tramos": {
+            nombre: {"llamadas": c, "total_s": round(t, 6), "max_s": round(m, 6)}
+            for nombre, (c, t, m) in _tramos.items()
+        },
+        "contadores": {nombre: round(valor, 6) for nombre, valor in _contadores.items()},
+    }
+
+
+def _etiqueta(nombre):
+    return nombre.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def a_prometheus():
+    lineas = [
+        "# HELP reservas_tramo_llamadas_total Llamadas medidas por tramo",
+        "# TYPE reservas_tramo_llamadas_total counter",
+    ]
+    for nombre, (cantidad, _, _) in _tramos.items():
+        lineas.append(f'reservas_tramo_llamadas_total{{tramo="{_etiqueta(nombre)}"}} {cantidad}')
+    lineas += [
+        "# HELP reservas_tramo_segundos_total Tiempo total por tramo",
+        "# TYPE reservas_tramo_segundos_total counter",
+    ]
+    for nombre, (_, total, _) in _tramos.items():
+        lineas.append(f'reservas_tramo_segundos_total{{tramo="{_etiqueta(nombre)}"}} {total:.6f}')
+    lineas += [
+        "# HELP reservas_operaciones_total Contadores de almacenamiento y procesos",
+        "# TYPE reservas_operaciones_total counter",
+    ]
+    for nombre, valor in _contadores.items():
+        lineas.append(f'reservas_operaciones_total{{contador="{_etiqueta(nombre)}"}} {valor}')
+    return "\n".join(lineas) + "\n"
+
+
+def exportar(directorio=None):
+    directorio = directorio or DIRECTORIO
+    with open(os.path.join(directorio, "metricas.jsonl"), "a", encoding="utf-8") as f:
+        f.write(json.dumps(resumen(), ensure_ascii=False) + "\n")
+    with open(os.path.join(directorio, "metricas.prom"), "w", encoding="utf-8") as f:
+        f.write(a_prometheus())
+
+
+if ACTIVO:
+    atexit.register(exportar)
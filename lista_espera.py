@@ -0,0 +1,125 @@
+# Lista de espera por horario (sala, fecha, hora)
+#
+# Cada horario ocupado puede tener una cola de prioridad (heap) de usuarios
+# esperando. Se guarda dentro del mismo diccionario de reservas, bajo la
+# clave CLAVE_ESPERA, para que se persista junto con las reservas en la
+# misma escritura.
+import heapq
+import os
+import time
+
+from cambios import asignar
+
+CLAVE_ESPERA = "_lista_espera"
+
+# Prioridad por usuario (menor número = se atiende antes), configurable con
+# RESERVAS_PRIORIDADES, por ejemplo "JFL=1,MAC=5". Los usuarios que no
+# aparecen usan PRIORIDAD_NORMAL y se atienden en orden de llegada (FIFO).
+PRIORIDAD_NORMAL = 10
+
+
+def leer_prioridades(texto):
+    prioridades = {}
+    for par in texto.split(","):
+        if "=" in par:
+            usuario, prioridad = par.rsplit("=", 1)
+            prioridades[usuario.strip()] = int(prioridad)
+    return prioridades
+
+
+PRIORIDADES_USUARIO = leer_prioridades(os.environ.get("RESERVAS_PRIORIDADES", ""))
+
+# clave del horario -> (cola, usuarios en ella), para no recorrer la cola al
+# agregar. Se rehace si la cola se reemplazó o cambió por fuera de este módulo.
+_en_cola = {}
+
+
+def clave_horario(sala, fecha, hora):
+    return f"{sala}|{fecha}|{hora}"
+
+
+def separar_clave(clave):
+    sala, fecha, hora = clave.rsplit("|", 2)
+    return sala, fecha, hora
+
+
+def prioridad_de(usuario):
+    return PRIORIDADES_USUARIO.get(usuario, PRIORIDAD_NORMAL)
+
+
+def _usuarios_en(clave, cola):
+    guardado = _en_cola.get(clave)
+    if guardado is None or guardado[0] is not cola or len(guardado[1]) != len(cola):
+        guardado = _en_cola[clave] = (cola, {entrada[2] for entrada in cola})
+    return guardado[1]
+
+
+# Obtener (creando si no existe) el diccionario de colas dentro de reservas
+def obtener_esperas(reservas):
+    return reservas.setdefault(CLAVE_ESPERA, {})
+
+
+# Agregar un usuario a la cola de un horario. O(log n)
+def agregar_en_espera(reservas, sala, fecha, hora, usuario, prioridad=None):
+    if prioridad is None:
+        prioridad = prioridad_de(usuario)
+    clave = clave_horario(sala, fecha, hora)
+    cola = obtener_esperas(reservas).setdefault(clave, [])
+    usuarios = _usuarios_en(clave, cola)
+    if usuario in usuarios:
+        return False
+    # time_ns desempata por orden de llegada dentro de la misma prioridad
+    heapq.heappush(cola, [prioridad, time.time_ns(), usuario])
+    usuarios.add(usuario)
+    return True
+
+
+# Cantidad de usuarios esperando un horario. O(1)
+def profundidad(reservas, sala, fecha, hora):
+    return len(reservas.get(CLAVE_ESPERA, {}).get(clave_horario(sala, fecha, hora), []))
+
+
+# Sacar al primero de la cola de un horario. O(log n)
+def siguiente_en_espera(reservas, sala, fecha, hora):
+    esperas = reservas.get(CLAVE_ESPERA, {})
+    clave = clave_horario(sala, fecha, hora)
+    cola = esperas.get(clave)
+    if not cola:
+        return None
+    usuarios = _usuarios_en(clave, cola)
+    _, _, usuario = heapq.heappop(cola)
+    usuarios.discard(usuario)
+    if not cola:
+        del esperas[clave]
+        _en_cola.pop(clave, None)
+    return usuario
+
+
+# Quitar las colas de los horarios para los que descartar(sala, fecha, hora)
+# es verdadero (por ejemplo, fechas pasadas). Devuelve cuántas se quitaron.
+def podar(reservas, descartar):
+    esperas = reservas.get(CLAVE_ESPERA)
+    if not esperas:
+        return 0
+    quitadas = [clave for clave in esperas if descartar(*separar_clave(clave))]
+    for clave in quitadas:
+        del esperas[clave]
+        _en_cola.pop(clave, None)
+    if not esperas:
+        del reservas[CLAVE_ESPERA]
+    return len(quitadas)
+
+
+# Asignar el horario liberado al primero de la cola (si hay alguien).
+# Debe llamarse antes de guardar_datos para que la promoción quede en la
+# misma escritura que la liberación. Con `permitido`, los que esperan y ya no
+# pueden tomar el horario (por ejemplo, por cuota) salen de la cola.
+def promover(reservas, sala, fecha, hora, permitido=None):
+    if reservas.get(sala, {}).get(fecha, {}).get(hora):
+        return None
+    usuario = siguiente_en_espera(reservas, sala, fecha, hora)
+    while usuario and permitido and not permitido(usuario):
+        usuario = siguiente_en_espera(reservas, sala, fecha, hora)
+    if usuario:
+        asignar(reservas, sala, fecha, hora, usuario)
+    return usuario
@@ -0,0 +1,115 @@
+# Listados de reservas como generadores, de a una página
+#
+# IndiceReservas guarda, por sala, las fechas con reservas ordenadas y, por
+# usuario y sala, sus (fecha, hora) ordenados; se arma en una sola pasada y
+# se mantiene al día con cambios.py. Los listados recorren esos índices con
+# bisect desde la primera fecha pedida y mezclan las salas con heapq.merge,
+# así que los filtros de fecha y sala no recorren el resto de la historia y
+# la memoria no crece con ella: solo se arma la página que se muestra.
+import bisect
+import heapq
+import itertools
+
+from cambios import suscribir
+
+
+class IndiceReservas:
+    def __init__(self):
+        self.listo = False
+        self.por_sala = {}     # sala -> fechas ordenadas
+        self.por_usuario = {}  # usuario -> {sala: [(fecha, hora)] ordenado}
+
+    # Construir los índices recorriendo las reservas una sola vez
+    def construir(self, reservas, salas):
+        self.por_sala = {sala: sorted(fecha for fecha, horas in reservas.get(sala, {}).items() if horas)
+                         for sala in salas}
+        self.por_usuario = {}
+        for sala in salas:
+            for fecha, horas in reservas.get(sala, {}).items():
+                for hora, usuario in horas.items():
+                    self.por_usuario.setdefault(usuario, {}).setdefault(sala, []).append((fecha, hora))
+        for por_sala in self.por_usuario.values():
+            for entradas in por_sala.values():
+                entradas.sort()
+        self.listo = True
+
+    def asegurar(self, reservas, salas):
+        if not self.listo:
+            self.construir(reservas, salas)
+
+    # Suscriptor de cambios.py
+    def actualizar(self, sala, fecha, hora, anterior, nuevo):
+        if sala is None:
+            self.listo = False  # Recarga completa: hay que reconstruir
+            return
+        if not self.listo:
+            return
+        # Una fecha que queda sin reservas sigue en la lista hasta la próxima
+        # reconstrucción; el listado la salta
+        fechas = self.por_sala.setdefault(sala, [])
+        posicion = bisect.bisect_left(fechas, fecha)
+        if nuevo is not None and (posicion == len(fechas) or fechas[posicion] != fecha):
+            fechas.insert(posicion, fecha)
+        entrada = (fecha, hora)
+        if anterior is not None:
+            por_sala = self.por_usuario.get(anterior, {})
+            entradas = por_sala.get(sala, [])
+            posicion = bisect.bisect_left(entradas, entrada)
+            if posicion < len(entradas) and entradas[posicion] == entrada:
+                del entradas[posicion]
+            if not entradas:
+                por_sala.pop(sala, None)
+            if not por_sala:
+                self.por_usuario.pop(anterior, None)
+        if nuevo is not None:
+            bisect.insort(self.por_usuario.setdefault(nuevo, {}).setdefault(sala, []), entrada)
+
+    # (fecha, hora, sala, usuario) de una sala, en orden, desde `desde`
+    # (incluida) hasta `hasta` (excluida)
+    def _de_sala(self, reservas, sala, desde, hasta):
+        fechas = self.por_sala.get(sala, [])
+        posicion = bisect.bisect_left(fechas, desde) if desde else 0
+        while posicion < len(fechas) and (not hasta or fechas[posicion] < hasta):
+            fecha = fechas[posicion]
+            horas = reservas.get(sala, {}).get(fecha, {})
+            for hora in sorted(horas):
+                yield fecha, hora, sala, horas[hora]
+            posicion += 1
+
+    # Todas las reservas ordenadas por fecha, hora y sala
+    def listar(self, reservas, salas=None, desde=None, hasta=None):
+        salas = salas if salas is not None else sorted(self.por_sala)
+        return heapq.merge(*(self._de_sala(reservas, sala, desde, hasta) for sala in salas))
+
+    # (fecha, hora, sala, usuario) de un usuario en una sala, en orden
+    @staticmethod
+    def _de_usuario_sala(entradas, sala, usuario, desde, hasta):
+        inicio = bisect.bisect_left(entradas, (desde,)) if desde else 0
+        fin = bisect.bisect_left(entradas, (hasta,), inicio) if hasta else len(entradas)
+        for posicion in range(inicio, fin):
+            fecha, hora = entradas[posicion]
+            yield fecha, hora, sala, usuario
+
+    # Reservas de usuarios, agrupadas por usuario (en orden alfabético) y
+    # ordenadas por fecha dentro de cada uno. Solo se recorren las salas
+    # pedidas de cada usuario, y de cada una solo el rango de fechas.
+    def por_usuarios(self, usuarios=None, salas=None, desde=None, hasta=None):
+        for usuario in (usuarios if usuarios is not None else sorted(self.por_usuario)):
+            por_sala = self.por_usuario.get(usuario, {})
+            elegidas = por_sala if salas is None else [sala for sala in salas if sala in por_sala]
+            yield from heapq.merge(*(self._de_usuario_sala(por_sala[sala], sala, usuario, desde, hasta)
+                                     for sala in elegidas))
+
+
+# Cortar un generador en listas de hasta `tamano` elementos
+def paginas(elementos, tamano):
+    elementos = iter(elementos)
+    while True:
+        pagina = list(itertools.islice(elementos, tamano))
+        if not pagina:
+            return
+        yield pagina
+
+
+INDICE_RESERVAS = IndiceReservas()
+suscribir(INDICE_RESERVAS.actualizar)
@@ -0,0 +1,111 @@
+# Mapa de calor mensual: salas en filas, días en columnas
+#
+# La ocupación de cada (sala, fecha) sale de contadores por día que se
+# arman en una sola pasada y se mantienen al día con cambios.py, así que
+# dibujar el mapa no recorre las reservas. Solo se dibujan las salas y los
+# días que entran en la terminal; el resto se recorre con desplazamiento.
+import calendar
+import shutil
+from datetime import date
+
+from cambios import suscribir
+from pantalla import Pantalla
+
+# Sombreado según la fracción de horas ocupadas del día
+SOMBRAS = ["·", "░", "▒", "▓", "█"]
+COLOR_SOMBRAS = ["\033[2m", "\033[32m", "\033[33m", "\033[31m", "\033[1;31m"]
+COLOR_RESET = "\033[0m"
+ANCHO_NOMBRE = 16
+LINEAS_FIJAS = 7  # Título, cabeceras, leyenda y entrada
+MESES = ["ENERO", "FEBRERO", "MARZO", "ABRIL", "MAYO", "JUNIO", "JULIO",
+         "AGOSTO", "SEPTIEMBRE", "OCTUBRE", "NOVIEMBRE", "DICIEMBRE"]
+
+
+class ContadoresDiarios:
+    def __init__(self):
+        self.conteos = {}  # (sala, fecha) -> horas reservadas
+        self.listo = False
+
+    # Construir los contadores recorriendo las reservas una sola vez
+    def construir(self, reservas, salas):
+        self.conteos = {
+            (sala, fecha): len(horas)
+            for sala in salas
+            for fecha, horas in reservas.get(sala, {}).items()
+            if horas
+        }
+        self.listo = True
+
+    def actualizar(self, sala, fecha, hora, anterior, nuevo):
+        if sala is None:
+            self.listo = False  # Recarga completa: hay que reconstruir
+            return
+        delta = (nuevo is not None) - (anterior is not None)
+        if delta:
+            clave = (sala, fecha)
+            self.conteos[clave] = self.conteos.get(clave, 0) + delta
+
+    def cantidad(self, sala, fecha):
+        return self.conteos.get((sala, fecha), 0)
+
+
+CONTADORES = ContadoresDiarios()
+suscribir(CONTADORES.actualizar)
+
+
+def sombra(cantidad, total):
+    if not cantidad:
+        return 0
+    return min(len(SOMBRAS) - 1, 1 + (cantidad * (len(SOMBRAS) - 2)) // total)
+
+
+# Armar el cuadro visible: salas[desde:desde+filas] para el mes dado
+def dibujar(salas, horas, anio, mes, desde, filas, columnas):
+    dias_mes = calendar.monthrange(anio, mes)[1]
+    dias_visibles = min(dias_mes, max(1, (columnas - ANCHO_NOMBRE - 1) // 2))
+    fechas = [date(anio, mes, dia) for dia in range(1, dias_visibles + 1)]
+    claves = [fecha.isoformat() for fecha in fechas]
+
+    lineas = [f"\033[1;36m MAPA DE OCUPACIÓN - {MESES[mes - 1]} {anio} \033[0m"
+              f"  salas {desde + 1}-{min(desde + filas, len(salas))} de {len(salas)}"]
+    lineas.append(" " * ANCHO_NOMBRE + "".join(f"{fecha.day:>2}" for fecha in fechas))
+    lineas.append(" " * ANCHO_NOMBRE + "".join(" " + "LMMJVSD"[fecha.weekday()] for fecha in fechas))
+    total = len(horas)
+    for sala in salas[desde:desde + filas]:
+        celdas = []
+        for fecha, clave in zip(fechas, claves):
+            if fecha.weekday() >= 5:
+                celdas.append("  ")
+                continue
+            nivel = sombra(CONTADORES.cantidad(sala, clave), total)
+            celdas.append(f" {COLOR_SOMBRAS[nivel]}{SOMBRAS[nivel]}{COLOR_RESET}")
+        lineas.append(sala[:ANCHO_NOMBRE - 1].ljust(ANCHO_NOMBRE) + "".join(celdas))
+    leyenda = "  ".join(f"{COLOR_SOMBRAS[i]}{s}{COLOR_RESET}" for i, s in enumerate(SOMBRAS))
+    lineas.append(f"\nOcupación: {leyenda} (0% → 100%)")
+    lineas.append("[W]/[S] salas  [A]/[D] mes  [Q] volver")
+    return "\n".join(lineas) + "\n"
+
+
+# Vista interactiva del mapa
+def ver_mapa(reservas, salas, horas):
+    if not CONTADORES.listo:
+        CONTADORES.construir(reservas, salas)
+    hoy = date.today()
+    anio, mes = hoy.year, hoy.month
+    desde = 0
+    pantalla = Pantalla()
+    while True:
+        columnas, lineas = shutil.get_terminal_size()
+        filas = max(1, lineas - LINEAS_FIJAS)
+        pantalla.presentar(dibujar(salas, horas, anio, mes, desde, filas, columnas))
+        opcion = input("Opción: ").strip().lower()
+        if opcion == 'q':
+            return
+        elif opcion == 's':
+            desde = min(desde + filas, max(0, len(salas) - filas))
+        elif opcion == 'w':
+            desde = max(0, desde - filas)
+        elif opcion == 'd':
+            anio, mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+        elif opcion == 'a':
+            anio, mes = (anio - 1, 12) if mes == 1 else (anio, mes - 1)
@@ -0,0 +1,120 @@
+# Renderer diferencial para la terminal
+#
+# Guarda el cuadro anterior como una grilla de celdas (estilo ANSI + carácter)
+# y en cada cuadro nuevo emite solo las celdas que cambiaron, posicionando el
+# cursor con secuencias ANSI. Todo el cuadro se envía con una única escritura,
+# sin lanzar procesos (reemplaza a os.system('clear')).
+import io
+import os
+import re
+import sys
+from contextlib import contextmanager, redirect_stdout
+
+SGR = re.compile(r"\033\[[0-9;]*m")
+RESET = "\033[0m"
+INICIO = "\033[H"
+BORRAR_TODO = "\033[2J"
+BORRAR_LINEA = "\033[K"
+BORRAR_ABAJO = "\033[J"
+
+
+def mover(fila, columna):
+    return f"\033[{fila};{columna}H"
+
+
+# Convertir texto con colores ANSI en filas de celdas (estilo, carácter)
+def a_celdas(texto):
+    filas = []
+    for linea in texto.split("\n"):
+        fila = []
+        estilo = ""
+        pos = 0
+        for coincidencia in SGR.finditer(linea):
+            for caracter in linea[pos:coincidencia.start()]:
+                fila.append((estilo, caracter))
+            secuencia = coincidencia.group()
+            estilo = "" if secuencia in (RESET, "\033[m") else estilo + secuencia
+            pos = coincidencia.end()
+        for caracter in linea[pos:]:
+            fila.append((estilo, caracter))
+        filas.append(fila)
+    # Un salto de línea final no agrega una fila visible
+    if filas and not filas[-1]:
+        filas.pop()
+    return filas
+
+
+# Texto de un tramo de celdas, repitiendo el estilo solo cuando cambia
+def dibujar_tramo(celdas):
+    partes = []
+    estilo_actual = None
+    for estilo, caracter in celdas:
+        if estilo != estilo_actual:
+            partes.append(RESET + estilo)
+            estilo_actual = estilo
+        partes.append(caracter)
+    partes.append(RESET)
+    return "".join(partes)
+
+
+class Pantalla:
+    def __init__(self, salida=None):
+        self.salida = salida or sys.stdout
+        self.anterior = None  # None: el estado de la terminal es desconocido
+
+    # Forzar un redibujado completo (algo más escribió en la terminal)
+    def invalidar(self):
+        self.anterior = None
+
+    # Calcular las secuencias necesarias para pasar del cuadro anterior al nuevo
+    def diferencia(self, filas):
+        if self.anterior is None:
+            partes = [INICIO, BORRAR_TODO]
+            partes.extend(dibujar_tramo(fila) + "\r\n" for fila in filas)
+            return "".join(partes)
+
+        partes = []
+        for num, fila in enumerate(filas):
+            previa = self.anterior[num] if num < len(self.anterior) else []
+            col = 0
+            while col < len(fila):
+                if col < len(previa) and fila[col] == previa[col]:
+                    col += 1
+                    continue
+                # Tramo de celdas consecutivas que cambiaron
+                fin = col
+                while fin < len(fila) and (fin >= len(previa) or fila[fin] != previa[fin]):
+                    fin += 1
+                partes.append(mover(num + 1, col + 1) + dibujar_tramo(fila[col:fin]))
+                col = fin
+            if len(previa) > len(fila):
+                partes.append(mover(num + 1, len(fila) + 1) + BORRAR_LINEA)
+        for num in range(len(filas), len(self.anterior)):
+            partes.append(mover(num + 1, 1) + BORRAR_LINEA)
+        # Dejar el cursor debajo del cuadro y borrar lo que quedó de la entrada anterior
+        partes.append(mover(len(filas) + 1, 1) + BORRAR_ABAJO)
+        return "".join(partes)
+
+    # Presentar un cuadro completo con una sola escritura
+    def presentar(self, texto):
+        filas = a_celdas(texto)
+        datos = self.diferencia(filas).encode(getattr(self.salida, "encoding", None) or "utf-8")
+        self.anterior = filas
+        self.salida.flush()
+        try:
+            descriptor = self.salida.fileno()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            self.salida.write(datos.decode(getattr(self.salida, "encoding", None) or "utf-8"))
+            self.salida.flush()
+            return
+        while datos:
+            escritos = os.write(descriptor, datos)
+            datos = datos[escritos:]
+
+    # Capturar todo lo que se imprima dentro del bloque y presentarlo como un cuadro
+    @contextmanager
+    def capturar(self):
+        buffer = io.StringIO()
+        with redirect_stdout(buffer):
+            yield
+        self.presentar(buffer.getvalue())
@@ -1,13 +1,57 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import builtins
+import itertools
 import json
 import os
+import shutil
+import sys
 from datetime import datetime, time, timedelta
-from colorama import Fore, Back, Style, init
 
-# Inicializar colorama
-init(autoreset=True)
+
+# colorama se importa (e inicializa) recién al primer color que se usa, así
+# el arranque no paga la importación ni la inicialización de la consola. Sin
+# colorama se usan los mismos colores con códigos ANSI, y print/input cierran
+# el color al final de cada línea como hace autoreset=True.
+REINICIO = "\033[0m"
+
+
+class _Colorama(object):
+    ANSI = {"RED": 31, "GREEN": 32, "YELLOW": 33, "BLUE": 34, "MAGENTA": 35, "CYAN": 36}
+    modulo = None
+    sin_autoreset = False
+
+    def __getattr__(self, atributo):
+        if _Colorama.modulo is None:
+            try:
+                import colorama
+                colorama.init(autoreset=True)
+                _Colorama.modulo = colorama
+            except ImportError:
+                _Colorama.modulo = False
+                _Colorama.sin_autoreset = True
+        if _Colorama.modulo:
+            valor = getattr(_Colorama.modulo.Fore, atributo)
+        else:
+            valor = "\033[{0}m".format(self.ANSI[atributo])
+        setattr(self, atributo, valor)
+        return valor
+
+
+Fore = _Colorama()
+
+
+def print(*valores, **opciones):
+    if _Colorama.sin_autoreset:
+        opciones["end"] = REINICIO + opciones.get("end", "\n")
+    builtins.print(*valores, **opciones)
+
+
+def input(texto=""):
+    if _Colorama.sin_autoreset:
+        texto += REINICIO
+    return builtins.input(texto)
 
 # Constantes
 ARCHIVO_RESERVAS = "reservas.json"
@@ -21,14 +65,22 @@ SALAS = {
     "4": "Sala Piso 4 - Sala de Conferencias"
 }
 
+# Con __slots__ cada reserva no lleva su propio diccionario de atributos, y
+# las cadenas que se repiten (sala, persona, día, hora) se internan: todas las
+# reservas comparten una sola copia de cada una
 class Reserva:
+    __slots__ = ("sala", "persona", "dia", "hora_inicio", "duracion")
+
     def __init__(self, sala, persona, dia, hora_inicio, duracion):
-        self.sala = sala
-        self.persona = persona
-        self.dia = dia
-        self.hora_inicio = hora_inicio
+        self.sala = sys.intern(sala)
+        self.persona = sys.intern(persona)
+        self.dia = sys.intern(dia)
+        self.hora_inicio = sys.intern(hora_inicio)
         self.duracion = duracion
 
+    def a_dict(self):
+        return {campo: getattr(self, campo) for campo in self.__slots__}
+
 def cargar_reservas():
     if os.path.exists(ARCHIVO_RESERVAS):
         with open(ARCHIVO_RESERVAS, 'r', encoding='utf-8') as f:
@@ -38,7 +90,7 @@ def cargar_reservas():
 
 def guardar_reservas(reservas):
     with open(ARCHIVO_RESERVAS, 'w', encoding='utf-8') as f:
-        datos = [vars(reserva) for reserva in reservas]
+        datos = [reserva.a_dict() for reserva in reservas]
         json.dump(datos, f, ensure_ascii=False, indent=2)
 
 def mostrar_menu_principal():
@@ -195,7 +247,14 @@ def ver_disponibilidad(reservas):
     
     mostrar_disponibilidad(sala, dia, reservas)
 
-def ver_todas_reservas(reservas, mostrar_indices=False):
+# Reservas (con su ID) que cumplen los filtros, sin armar listas intermedias
+def iterar_reservas(reservas, sala=None, dia=None):
+    for idx, reserva in enumerate(reservas, 1):
+        if (sala is None or reserva.sala == sala) and (dia is None or reserva.dia == dia):
+            yield idx, reserva
+
+# Una línea por reserva, de a una página (Enter sigue, Q termina)
+def ver_todas_reservas(reservas, mostrar_indices=False, sala=None, dia=None):
     print(Fore.CYAN + "\n" + "="*50)
     print(Fore.YELLOW + " TODAS LAS RESERVAS ".center(50))
     print(Fore.CYAN + "="*50)
@@ -204,17 +263,38 @@ def ver_todas_reservas(reservas, mostrar_indices=False):
         print(Fore.MAGENTA + "\nNo hay reservas registradas")
         return
     
-    for idx, reserva in enumerate(reservas, 1):
-        print(Fore.YELLOW + "-"*50)
-        if mostrar_indices:
-            print(Fore.CYAN + "ID: {0}".format(idx))
-        print(Fore.GREEN + "Sala: {0}".format(SALAS[reserva.sala]))
-        print(Fore.GREEN + "Reservado por: {0}".format(reserva.persona))
-        print(Fore.GREEN + "Día: {0}".format(reserva.dia))
-        print(Fore.GREEN + "Hora: {0} por {1} horas".format(reserva.hora_inicio, reserva.duracion))
-    
+    por_pagina = max(5, shutil.get_terminal_size().lines - 8)
+    filas = iterar_reservas(reservas, sala, dia)
+    mostradas = 0
+    while True:
+        pagina = list(itertools.islice(filas, por_pagina))
+        for idx, reserva in pagina:
+            prefijo = "ID {0}: ".format(idx) if mostrar_indices else ""
+            print(Fore.GREEN + "{0}{1} | {2} | {3} {4} por {5} horas".format(
+                prefijo, SALAS[reserva.sala], reserva.persona, reserva.dia, reserva.hora_inicio, reserva.duracion))
+        mostradas += len(pagina)
+        if len(pagina) < por_pagina:
+            break
+        if input(Fore.CYAN + "Enter para ver más, [Q] para terminar: ").strip().lower() == 'q':
+            break
+    if not mostradas:
+        print(Fore.MAGENTA + "\nNo hay reservas con esos filtros")
     print(Fore.YELLOW + "-"*50)
 
+# Ver reservas filtrando por sala y día (Enter para no filtrar)
+def ver_reservas_filtradas(reservas):
+    sala = input(Fore.CYAN + "\nSala (4 o 5, Enter para todas): ").strip() or None
+    if sala is not None and sala not in SALAS:
+        print(Fore.RED + "Sala inválida")
+        return
+    mostrar_dias_disponibles()
+    texto = input(Fore.CYAN + "\nDía (1-5, Enter para todos): ").strip()
+    if texto and not (texto.isdigit() and 1 <= int(texto) <= len(DIAS_SEMANA)):
+        print(Fore.RED + "Día inválido")
+        return
+    dia = DIAS_SEMANA[int(texto) - 1] if texto else None
+    ver_todas_reservas(reservas, sala=sala, dia=dia)
+
 def seleccionar_reserva(reservas):
     ver_todas_reservas(reservas, mostrar_indices=True)
     try:
@@ -363,7 +443,7 @@ def main():
         elif opcion == "2":
             ver_disponibilidad(reservas)
         elif opcion == "3":
-            ver_todas_reservas(reservas)
+            ver_reservas_filtradas(reservas)
         elif opcion == "4":
             modificar_reserva(reservas)
         elif opcion == "5":
@@ -0,0 +1,179 @@
+# Sincronización del archivo de reservas con GitHub usando comandos de bajo
+# nivel de git (sin checkout, merge ni recorrer el directorio de trabajo)
+#
+#   - traer(): fetch de la rama de datos sola, a refs/remotes/<remoto>/<rama>.
+#   - leer_remoto(): commit, árbol y archivo remoto (y el HEAD local) en un
+#     solo cat-file --batch.
+#   - publicar(): si el hash del archivo es el del remoto no hace nada; si
+#     no, escribe el blob, arma el árbol del commit remoto con ese archivo
+#     reemplazado (mktree), crea el commit (commit-tree), lo publica (push) y
+#     mueve la rama remota local (update-ref). HEAD y el índice solo avanzan
+#     si HEAD era el commit remoto: el commit nuevo difiere de él solo en el
+#     archivo. Si no, quedan como estaban (el resto del repositorio se pone
+#     al día con git pull, como siempre).
+#   - actualizar_copia(): reemplaza solo el archivo local por el remoto
+#     cuando su hash es distinto, salvo que tenga cambios sin publicar (no es
+#     ninguno de los blobs que publicados() encontró antes de traer).
+#
+# El hash del contenido se calcula aquí (es el SHA-1 o SHA-256 de
+# "blob <largo>\0<contenido>"), así que saber si hay algo que publicar o
+# actualizar no lanza ningún proceso. El archivo está en la raíz del
+# repositorio, como lo suponían los scripts.
+import hashlib
+import os
+
+from instrumentacion import ejecutar
+
+REMOTO = os.environ.get("RESERVAS_REMOTO", "origin")
+RAMA = os.environ.get("RESERVAS_RAMA", "main")
+MODO_ARCHIVO = "100644"
+
+
+class ErrorGit(Exception):
+    pass
+
+
+# El archivo local no está publicado y actualizar_copia() lo pisaría
+class CambiosSinPublicar(Exception):
+    pass
+
+
+class Remoto:
+    def __init__(self, commit=None, entradas=None, blob=None, contenido=None, local=None):
+        self.commit = commit            # None si la rama remota todavía no existe
+        self.local = local              # Commit de HEAD (None si no hay)
+        self.entradas = entradas or {}  # nombre -> (modo, oid) del árbol raíz
+        self.blob = blob                # None si el remoto no tiene el archivo
+        self.contenido = contenido
+
+
+def referencia_remota():
+    return f"refs/remotes/{REMOTO}/{RAMA}"
+
+
+def git(*argumentos, entrada=None, verificar=True):
+    resultado = ejecutar(["git", *argumentos], input=entrada, capture_output=True)
+    if verificar and resultado.returncode != 0:
+        raise ErrorGit(f"git {argumentos[0]}: {resultado.stderr.decode(errors='replace').strip()}")
+    return resultado
+
+
+def hash_blob(contenido, largo=40):
+    algoritmo = hashlib.sha256 if largo == 64 else hashlib.sha1
+    return algoritmo(b"blob %d\0" % len(contenido) + contenido).hexdigest()
+
+
+# Traer solo la rama de datos; devuelve el resultado de git fetch
+def traer():
+    return git("fetch", "-q", "--no-tags", REMOTO, f"+refs/heads/{RAMA}:{referencia_remota()}", verificar=False)
+
+
+# Leer varios objetos con un solo proceso: {nombre: (oid, tipo, contenido)},
+# sin los que no existen
+def leer_objetos(*nombres):
+    salida = git("cat-file", "--batch", entrada="".join(f"{nombre}\n" for nombre in nombres).encode()).stdout
+    objetos, posicion = {}, 0
+    for nombre in nombres:
+        fin = salida.index(b"\n", posicion)
+        cabecera = salida[posicion:fin].decode().split()
+        posicion = fin + 1
+        if cabecera[-1] == "missing":
+            continue
+        oid, tipo, largo = cabecera[0], cabecera[1], int(cabecera[2])
+        objetos[nombre] = (oid, tipo, salida[posicion:posicion + largo])
+        posicion += largo + 1
+    return objetos
+
+
+# Entradas de un árbol en formato binario: modo SP nombre NUL oid
+def leer_arbol(datos, largo_oid):
+    entradas, posicion = {}, 0
+    bytes_oid = largo_oid // 2
+    while posicion < len(datos):
+        espacio = datos.index(b" ", posicion)
+        nulo = datos.index(b"\0", espacio)
+        modo, nombre = datos[posicion:espacio].decode(), datos[espacio + 1:nulo].decode()
+        entradas[nombre] = (modo, datos[nulo + 1:nulo + 1 + bytes_oid].hex())
+        posicion = nulo + 1 + bytes_oid
+    return entradas
+
+
+def leer_remoto(archivo):
+    rama = referencia_remota()
+    objetos = leer_objetos(rama, f"{rama}^{{tree}}", f"{rama}:{archivo}", "HEAD")
+    local = objetos["HEAD"][0] if "HEAD" in objetos else None
+    if rama not in objetos:
+        return Remoto(local=local)
+    commit = objetos[rama][0]
+    entradas = leer_arbol(objetos[f"{rama}^{{tree}}"][2], len(commit))
+    blob, _, contenido = objetos.get(f"{rama}:{archivo}", (None, None, None))
+    return Remoto(commit, entradas, blob, contenido, local)
+
+
+def _tipo(modo):
+    return "tree" if modo.startswith("4") else "commit" if modo == "160000" else "blob"
+
+
+# Publicar `contenido` (lo que ya está escrito en `archivo`) sobre el commit
+# remoto. Devuelve el commit publicado (el remoto si no había cambios) o None
+# si el push fue rechazado porque otro cliente publicó antes.
+def publicar(archivo, contenido, remoto, mensaje):
+    largo = len(remoto.commit) if remoto.commit else 40
+    blob = hash_blob(contenido, largo)
+    if blob == remoto.blob:
+        return remoto.commit  # Nada que publicar
+    # Si HEAD es el commit remoto, avanza junto con él: el índice se pone de
+    # acuerdo con el archivo. Si no, solo se escribe el blob.
+    avanzar = remoto.commit is not None and remoto.local == remoto.commit
+    if avanzar:
+        git("update-index", "--add", "--", archivo)
+    else:
+        git("hash-object", "-w", "--", archivo)
+    entradas = dict(remoto.entradas)
+    entradas[archivo] = (entradas.get(archivo, (MODO_ARCHIVO, None))[0], blob)
+    lista = "".join(f"{modo.zfill(6)} {_tipo(modo)} {oid}\t{nombre}\0"
+                    for nombre, (modo, oid) in sorted(entradas.items()))
+    arbol = git("mktree", "-z", entrada=lista.encode()).stdout.decode().strip()
+    padres = ["-p", remoto.commit] if remoto.commit else []
+    commit = git("commit-tree", arbol, *padres, "-m", mensaje).stdout.decode().strip()
+    if git("push", "-q", REMOTO, f"{commit}:refs/heads/{RAMA}", verificar=False).returncode != 0:
+        return None
+    actualizaciones = f"update {referencia_remota()} {commit}\n"
+    if avanzar:  # Solo si HEAD no se movió mientras tanto
+        actualizaciones += f"update HEAD {commit} {remoto.local}\n"
+    git("update-ref", "--stdin", entrada=actualizaciones.encode())
+    return commit
+
+
+# Blobs de `archivo` que ya están en GitHub según la copia local: el de la
+# rama remota (lo último publicado o traído) y el de HEAD. Se lee antes de
+# traer(), que mueve la rama remota.
+def publicados(archivo):
+    nombres = (f"{referencia_remota()}:{archivo}", f"HEAD:{archivo}")
+    salida = git("cat-file", "--batch-check", entrada="".join(f"{nombre}\n" for nombre in nombres).encode())
+    return {linea.split()[0] for linea in salida.stdout.decode().splitlines() if not linea.endswith("missing")}
+
+
+# Poner al día el archivo local con la rama remota, que traer() ya movió:
+# si su hash es distinto se reemplaza solo el archivo, sin checkout ni merge.
+# Si el archivo no es ni el remoto ni uno de `anteriores` (publicados() antes
+# de traer) tiene cambios que no llegaron a GitHub, y no se pisa. Devuelve
+# True si el archivo cambió.
+def actualizar_copia(archivo, anteriores):
+    remoto = leer_remoto(archivo)
+    if remoto.contenido is None:
+        return False
+    if os.path.exists(archivo):
+        with open(archivo, "rb") as f:
+            local = hash_blob(f.read(), len(remoto.blob))
+        if local == remoto.blob:
+            return False
+        if local not in anteriores:
+            raise CambiosSinPublicar(f"{archivo} tiene cambios que no se publicaron en GitHub")
+    temporal = archivo + ".tmp"
+    with open(temporal, "wb") as f:
+        f.write(remoto.contenido)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, archivo)
+    return True
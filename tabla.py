@@ -0,0 +1,140 @@
+# Motor único de tablas semanales (horas x días) con caché
+#
+# Los bordes y las celdas coloreadas se arman una sola vez. Cada tabla
+# dibujada se guarda por (variante, sala, fechas) junto con la versión de
+# los datos de esas fechas; solo se vuelve a dibujar cuando cambia un horario
+# de esa semana (ver cambios.py). La caché es LRU y acotada, y un hilo en
+# segundo plano puede precalcular las semanas vecinas (Precargador).
+#
+# Con un calendario de cierres (cierres.py) las horas bloqueadas y libres se
+# marcan con ▒: la máscara de cada día se aplica una vez al armar la tabla
+# (las celdas se dibujan igual) y es parte de la versión guardada en la caché.
+import queue
+import threading
+from collections import OrderedDict
+
+from cambios import suscribir
+
+MAX_TABLAS_CACHE = 64
+CERRADO = "\0"  # Valor de las horas bloqueadas al armar la tabla
+
+# Versión de cada (sala, fecha); se incrementa en cada cambio
+_versiones = {}
+_generacion = 0  # Cambia cuando se recargan todos los datos
+
+
+@suscribir
+def _registrar_cambio(sala, fecha, hora, anterior, nuevo):
+    global _generacion
+    if sala is None:
+        _generacion += 1
+        _versiones.clear()
+    else:
+        _versiones[(sala, fecha)] = _versiones.get((sala, fecha), 0) + 1
+
+
+def version_de(sala, fechas):
+    return (_generacion,) + tuple(_versiones.get((sala, fecha), 0) for fecha in fechas)
+
+
+class MotorTabla:
+    # Variantes de la tabla: ancho de la columna Hora y espacio antes de la hora
+    VARIANTES = {
+        "horarios": (8, " "),
+        "resumen": (7, ""),
+    }
+
+    def __init__(self, horas, dias, color_marco, color_celda, color_reset, max_cache=MAX_TABLAS_CACHE,
+                 cierres=None):
+        self.horas = horas
+        self.dias = dias
+        self.color_celda = color_celda
+        self.color_reset = color_reset
+        self.separador = f"{color_marco}│{color_reset}"
+        self.celda_vacia = f"   {self.separador}"
+        self.celdas = {CERRADO: f" {color_marco}▒{color_reset} {self.separador}"}  # inicial -> fragmento coloreado
+        self.cierres = cierres
+        self.plantillas = {}
+        for variante, (ancho, espacio) in self.VARIANTES.items():
+            cabecera = (
+                f"{color_marco}┌{'─' * ancho}{'┬───' * len(dias)}┐{color_reset}\n"
+                f"{color_marco}│{' Hora'.ljust(ancho)}│{''.join(dia + ' │' for dia in dias)}{color_reset}\n"
+                f"{color_marco}├{'─' * ancho}{'┼───' * len(dias)}┤{color_reset}\n"
+            )
+            filas = [
+                f"{color_marco}│{espacio}{color_reset}{hora.ljust(6)}{color_marco} │{color_reset}"
+                for hora in horas
+            ]
+            pie = f"{color_marco}└{'─' * ancho}{'┴───' * len(dias)}┘{color_reset}"
+            self.plantillas[variante] = (cabecera, filas, pie)
+        self.cache = OrderedDict()
+        self.max_cache = max_cache
+        self.candado = threading.Lock()  # La caché se comparte con el precargador
+
+    def celda(self, usuario):
+        inicial = usuario[:1]
+        fragmento = self.celdas.get(inicial)
+        if fragmento is None:
+            fragmento = f" {self.color_celda}{inicial}{self.color_reset} {self.separador}"
+            self.celdas[inicial] = fragmento
+        return fragmento
+
+    # Armar la tabla sin usar la caché
+    def construir(self, reservas, sala, fechas, variante, mascaras=()):
+        cabecera, filas, pie = self.plantillas[variante]
+        dias = [reservas.get(sala, {}).get(fecha, {}) for fecha in fechas]
+        for i, mascara in enumerate(mascaras):
+            if mascara:  # Las horas reservadas se siguen mostrando
+                dias[i] = {**dict.fromkeys(self.cierres.horas_de(mascara), CERRADO), **dias[i]}
+        partes = [cabecera]
+        for hora, prefijo in zip(self.horas, filas):
+            partes.append(prefijo)
+            for horas_dia in dias:
+                usuario = horas_dia.get(hora)
+                partes.append(self.celda(usuario) if usuario else self.celda_vacia)
+            partes.append("\n")
+        partes.append(pie)
+        return "".join(partes)
+
+    # Tabla de una sala para las fechas dadas (una por día), usando la caché
+    def dibujar(self, reservas, sala, fechas, variante="horarios"):
+        fechas = tuple(fechas)
+        clave = (variante, sala, fechas)
+        mascaras = tuple(self.cierres.mascara(sala, fecha) for fecha in fechas) if self.cierres else ()
+        version = version_de(sala, fechas) + mascaras
+        with self.candado:
+            guardada = self.cache.get(clave)
+            if guardada and guardada[0] == version:
+                self.cache.move_to_end(clave)
+                return guardada[1]
+        # Si los datos cambian mientras se arma, la versión guardada queda
+        # vieja y la próxima llamada la vuelve a armar
+        texto = self.construir(reservas, sala, fechas, variante, mascaras)
+        with self.candado:
+            self.cache[clave] = (version, texto)
+            self.cache.move_to_end(clave)
+            while len(self.cache) > self.max_cache:
+                self.cache.popitem(last=False)  # Descartar la menos usada
+        return texto
+
+
+# Precalcula tablas en un hilo de fondo para que cambiar de semana sea inmediato
+class Precargador:
+    def __init__(self, motor):
+        self.motor = motor
+        self.pendientes = queue.Queue()
+        self.hilo = threading.Thread(target=self._trabajar, daemon=True)
+        self.hilo.start()
+
+    # Encolar las tablas de una sala para cada lista de fechas (una por semana)
+    def solicitar(self, reservas, sala, semanas, variante="horarios"):
+        for fechas in semanas:
+            self.pendientes.put((reservas, sala, tuple(fechas), variante))
+
+    def _trabajar(self):
+        while True:
+            reservas, sala, fechas, variante = self.pendientes.get()
+            try:
+                self.motor.dibujar(reservas, sala, fechas, variante)
+            except RuntimeError:
+                pass  # Los datos cambiaron mientras se leían; se arma al mostrarla
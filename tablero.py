@@ -0,0 +1,148 @@
+# Tablero permanente para recepción (modo curses)
+#
+# Muestra el día actual de todas las salas: estado (libre / ocupada ahora),
+# próxima reserva y una franja con todas las horas. No consume CPU mientras
+# espera: duerme en select() hasta que cambian los datos (aviso por un pipe
+# desde cambios.py o desde un listener remoto), se presiona una tecla, cambia
+# el tamaño de la terminal o empieza un nuevo minuto.
+import curses
+import os
+import select
+import signal
+import time
+from datetime import datetime, timedelta
+
+from cambios import suscribir
+
+AVISO_DATOS = b"d"
+AVISO_TAMANO = b"r"
+
+_pipe_escritura = None
+
+
+@suscribir
+def _avisar_cambio(sala, fecha, hora, anterior, nuevo):
+    avisar()
+
+
+# Despertar al tablero (se puede llamar desde cualquier hilo)
+def avisar(motivo=AVISO_DATOS):
+    if _pipe_escritura is not None:
+        try:
+            os.write(_pipe_escritura, motivo)
+        except (BlockingIOError, OSError):
+            pass  # El pipe ya tiene avisos pendientes
+
+
+def segundos_al_proximo_minuto():
+    ahora = time.time()
+    return 60 - (ahora % 60) + 0.05
+
+
+# Estado de una sala en el día de hoy
+def estado_sala(reservas, sala, horas, ahora):
+    del_dia = reservas.get(sala, {}).get(ahora.strftime("%Y-%m-%d"), {})
+    actual = ahora.strftime("%H:00")
+    ocupante = del_dia.get(actual) if actual in horas else None
+    proxima = None
+    for hora in horas:
+        if hora > actual and del_dia.get(hora):
+            proxima = (hora, del_dia[hora])
+            break
+    return del_dia, actual, ocupante, proxima
+
+
+def _escribir(pantalla, fila, columna, texto, atributos=0):
+    alto, ancho = pantalla.getmaxyx()
+    if fila >= alto or columna >= ancho:
+        return
+    try:
+        pantalla.addstr(fila, columna, texto[:ancho - columna - 1], atributos)
+    except curses.error:
+        pass
+
+
+def dibujar(pantalla, reservas, salas, horas, colores):
+    pantalla.erase()
+    ahora = datetime.now()
+    _escribir(pantalla, 0, 0, f" SALAS DE REUNIÓN - {ahora.strftime('%d/%m/%Y %H:%M')} ", colores["titulo"])
+    _escribir(pantalla, 1, 0, " [Q] Salir", curses.A_DIM)
+
+    fila = 3
+    ancho_nombre = max(len(sala) for sala in salas) + 2
+    for sala in salas:
+        del_dia, actual, ocupante, proxima = estado_sala(reservas, sala, horas, ahora)
+        _escribir(pantalla, fila, 1, sala, curses.A_BOLD)
+        if ocupante:
+            fin = (datetime.strptime(actual, "%H:%M") + timedelta(hours=1)).strftime("%H:%M")
+            _escribir(pantalla, fila, ancho_nombre + 1, f"OCUPADA ({ocupante} hasta {fin})", colores["ocupado"])
+        else:
+            _escribir(pantalla, fila, ancho_nombre + 1, "LIBRE", colores["libre"])
+        texto_proxima = f"Próxima: {proxima[0]} {proxima[1]}" if proxima else "Sin más reservas hoy"
+        _escribir(pantalla, fila + 1, ancho_nombre + 1, texto_proxima)
+
+        # Franja con todas las horas del día
+        columna = ancho_nombre + 1
+        for hora in horas:
+            atributos = colores["ocupado"] if del_dia.get(hora) else colores["libre"]
+            if hora == actual:
+                atributos |= curses.A_REVERSE
+            _escribir(pantalla, fila + 2, columna, hora[:2], atributos)
+            columna += 3
+        fila += 4
+    pantalla.refresh()
+
+
+def _bucle(pantalla, reservas, salas, horas, recargar, lectura):
+    curses.curs_set(0)
+    pantalla.nodelay(True)
+    colores = {"titulo": curses.A_BOLD, "libre": 0, "ocupado": curses.A_BOLD}
+    if curses.has_colors():
+        curses.start_color()
+        curses.use_default_colors()
+        curses.init_pair(1, curses.COLOR_CYAN, -1)
+        curses.init_pair(2, curses.COLOR_GREEN, -1)
+        curses.init_pair(3, curses.COLOR_RED, -1)
+        colores = {
+            "titulo": curses.color_pair(1) | curses.A_BOLD,
+            "libre": curses.color_pair(2),
+            "ocupado": curses.color_pair(3) | curses.A_BOLD,
+        }
+
+    entrada = 0  # stdin
+    while True:
+        dibujar(pantalla, reservas, salas, horas, colores)
+        listos, _, _ = select.select([entrada, lectura], [], [], segundos_al_proximo_minuto())
+        if lectura in listos:
+            avisos = os.read(lectura, 1024)
+            if AVISO_TAMANO in avisos:
+                alto, ancho = os.get_terminal_size()
+                curses.resizeterm(alto, ancho)
+        if entrada in listos:
+            tecla = pantalla.getch()
+            if tecla in (ord('q'), ord('Q'), 27):
+                return
+            if tecla == curses.KEY_RESIZE:
+                curses.update_lines_cols()
+        if not listos and recargar:
+            recargar()  # Tic de minuto: revisar si hay datos nuevos
+
+
+# Ejecutar el tablero hasta que se presione Q.
+# recargar (opcional) se llama en cada tic de minuto para traer datos nuevos.
+def ejecutar(reservas, salas, horas, recargar=None):
+    global _pipe_escritura
+    lectura, escritura = os.pipe()
+    os.set_blocking(escritura, False)
+    _pipe_escritura = escritura
+    anterior = None
+    if hasattr(signal, "SIGWINCH"):
+        anterior = signal.signal(signal.SIGWINCH, lambda *_: avisar(AVISO_TAMANO))
+    try:
+        curses.wrapper(_bucle, reservas, salas, horas, recargar, lectura)
+    finally:
+        if hasattr(signal, "SIGWINCH"):
+            signal.signal(signal.SIGWINCH, anterior or signal.SIG_DFL)
+        _pipe_escritura = None
+        os.close(lectura)
+        os.close(escritura)